@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Author, Comment, Like, Post, FollowRequest, Follow, SiteSetting, InboxItem, Node
+from .models import Author, Comment, Like, Post, FollowRequest, Follow, SiteSetting, InboxItem, InboundActivity, Node, NodeHealth, OutboxItem, RemoteDirectoryState
 from django import forms
 from django.contrib import admin
 from .models import Node
@@ -43,7 +43,52 @@ class AuthorAdmin(admin.ModelAdmin):
 
 @admin.register(Node)
 class NodeAdmin(admin.ModelAdmin):
-    list_display = ('team_name', 'host', 'username', 'password', 'is_active')
+    list_display = ('team_name', 'host', 'username', 'password', 'is_active', 'supports_batch_inbox', 'embed_collections', 'circuit', 'error_rate', 'latency', 'last_success')
     search_fields = ('team_name', 'host')
-    list_filter = ('is_active',)
-    list_per_page = 50
\ No newline at end of file
+    list_filter = ('is_active', 'health__state')
+    list_select_related = ('health',)
+    list_per_page = 50
+
+    def _health(self, obj):
+        try:
+            return obj.health
+        except NodeHealth.DoesNotExist:
+            return None
+
+    @admin.display(description='Circuit')
+    def circuit(self, obj):
+        health = self._health(obj)
+        return health.get_state_display() if health else '-'
+
+    @admin.display(description='Error rate')
+    def error_rate(self, obj):
+        health = self._health(obj)
+        return f"{health.error_rate:.0%}" if health else '-'
+
+    @admin.display(description='Latency')
+    def latency(self, obj):
+        health = self._health(obj)
+        return f"{health.latency_ms:.0f} ms" if health and health.latency_ms is not None else '-'
+
+    @admin.display(description='Last success')
+    def last_success(self, obj):
+        health = self._health(obj)
+        return health.last_success_at if health else None
+
+@admin.register(OutboxItem)
+class OutboxItemAdmin(admin.ModelAdmin):
+    list_display = ('activity_type', 'url', 'node', 'status', 'attempts', 'next_attempt_at', 'created', 'delivered_at')
+    list_filter = ('status', 'activity_type', 'node')
+    search_fields = ('url',)
+    list_per_page = 50
+
+@admin.register(RemoteDirectoryState)
+class RemoteDirectoryStateAdmin(admin.ModelAdmin):
+    list_display = ('node', 'refreshed_at', 'ttl', 'author_count', 'etag')
+    list_per_page = 50
+
+@admin.register(InboundActivity)
+class InboundActivityAdmin(admin.ModelAdmin):
+    list_display = ('activity_type', 'recipient', 'received_from', 'status', 'result_status', 'attempts', 'created', 'processed_at')
+    list_filter = ('status', 'activity_type')
+    list_per_page = 50
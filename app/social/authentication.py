@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.authentication import BasicAuthentication
+import hashlib
+import hmac
+
+
+# Seconds a verified username/password pair is trusted without running the password hasher
+NODE_AUTH_CACHE_TTL = getattr(settings, 'NODE_AUTH_CACHE_TTL', 300)
+
+
+def credentials_key(userid, password):
+    """Cache key for a credential pair, an HMAC with SECRET_KEY so the cache holds no plaintext password."""
+    digest = hmac.new(settings.SECRET_KEY.encode(), f"{userid}\0{password}".encode(), hashlib.sha256).hexdigest()
+    return f"node_auth:{digest}"
+
+
+class NodeBasicAuthentication(BasicAuthentication):
+    """
+    HTTP Basic authentication that runs the password hasher only on the first
+    request with a given username and password. Later requests within
+    NODE_AUTH_CACHE_TTL cost one user lookup. The cached entry holds the user's
+    session auth hash, an HMAC of the password hash rather than the hash itself,
+    so changing the password or deactivating the user takes effect immediately.
+    """
+
+    def authenticate_credentials(self, userid, password, request=None):
+        key = credentials_key(userid, password)
+        cached = cache.get(key)
+        if cached is not None:
+            user_pk, auth_hash = cached
+            user = get_user_model().objects.filter(pk=user_pk, is_active=True).first()
+            if user is not None and hmac.compare_digest(user.get_session_auth_hash(), auth_hash):
+                return (user, None)
+            cache.delete(key)
+
+        user, auth = super().authenticate_credentials(userid, password, request)
+        cache.set(key, (user.pk, user.get_session_auth_hash()), NODE_AUTH_CACHE_TTL)
+        return (user, auth)
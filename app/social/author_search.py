@@ -0,0 +1,93 @@
+from django.db import OperationalError, connection
+from django.db.models.expressions import RawSQL
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# FTS5 trigram table mirroring social_author.search_text on SQLite. Rows are keyed by the
+# author's id in an UNINDEXED column, social_author's implicit rowid is not stable (VACUUM
+# and table rebuilds renumber it).
+SQLITE_SEARCH_TABLE = 'social_author_search'
+
+# The trigram tokenizer cannot match fewer characters than this
+TRIGRAM_LENGTH = 3
+
+
+def search_text_for(display_name, username):
+    """The lowercased text an author is found by."""
+    return ' '.join(part for part in (display_name, username) if part).lower()
+
+
+def install_search_index(db):
+    """
+    Create the search index over social_author.search_text for db's backend:
+    a pg_trgm GIN index on Postgres, an FTS5 trigram table kept in sync by
+    triggers on SQLite. Safe to run repeatedly, on SQLite it also refills the table.
+    """
+    with db.cursor() as cursor:
+        if db.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS social_author_search_trgm "
+                "ON social_author USING gin (search_text gin_trgm_ops)"
+            )
+        elif db.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_SEARCH_TABLE} "
+                    f"USING fts5(author_id UNINDEXED, search_text, tokenize='trigram')"
+                )
+            except OperationalError as e:
+                # SQLite built without FTS5 or older than 3.34, filter_authors falls back to LIKE
+                logger.warning(f"Author search index not available: {e}")
+                return
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {SQLITE_SEARCH_TABLE}_ai AFTER INSERT ON social_author BEGIN "
+                f"INSERT INTO {SQLITE_SEARCH_TABLE}(author_id, search_text) VALUES (new.id, new.search_text); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {SQLITE_SEARCH_TABLE}_ad AFTER DELETE ON social_author BEGIN "
+                f"DELETE FROM {SQLITE_SEARCH_TABLE} WHERE author_id = old.id; END"
+            )
+            # Saves write every column, only a changed search_text touches the index
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {SQLITE_SEARCH_TABLE}_au AFTER UPDATE OF search_text ON social_author "
+                f"WHEN old.search_text IS NOT new.search_text BEGIN "
+                f"UPDATE {SQLITE_SEARCH_TABLE} SET search_text = new.search_text WHERE author_id = old.id; END"
+            )
+            # Migrations that rebuild social_author drop the triggers, rows changed meanwhile are picked up here
+            cursor.execute(f"DELETE FROM {SQLITE_SEARCH_TABLE}")
+            cursor.execute(f"INSERT INTO {SQLITE_SEARCH_TABLE}(author_id, search_text) SELECT id, search_text FROM social_author")
+
+
+def uninstall_search_index(db):
+    with db.cursor() as cursor:
+        if db.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS social_author_search_trgm")
+        elif db.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {SQLITE_SEARCH_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {SQLITE_SEARCH_TABLE}")
+
+
+def has_sqlite_index():
+    return SQLITE_SEARCH_TABLE in connection.introspection.table_names()
+
+
+def filter_authors(queryset, query):
+    """
+    Narrow an Author queryset to authors whose display name or username
+    contains query, using the backend's search index.
+    """
+    needle = query.lower()
+    if connection.vendor == 'sqlite' and len(needle) >= TRIGRAM_LENGTH and has_sqlite_index():
+        phrase = '"' + needle.replace('"', '""') + '"'
+        matches = RawSQL(
+            f"SELECT author_id FROM {SQLITE_SEARCH_TABLE} WHERE {SQLITE_SEARCH_TABLE} MATCH %s",
+            (phrase,),
+        )
+        return queryset.filter(id__in=matches)
+
+    # search_text is already lowercase, so a plain LIKE can use the pg_trgm index
+    return queryset.filter(search_text__contains=needle)
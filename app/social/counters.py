@@ -0,0 +1,49 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F, OuterRef, Value
+from django.db.models.functions import Greatest
+from .models import Comment, Post
+from .queries import count_subquery, like_count_subquery
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def adjust(model, pk, field, delta):
+    """Atomically add delta to a counter column, never going below zero."""
+    model.objects.filter(pk=pk).update(**{field: Greatest(F(field) + delta, Value(0))})
+
+
+def adjust_like_count(like, delta):
+    """Apply delta to the like_count of whatever like points at."""
+    model = ContentType.objects.get_for_id(like.content_type_id).model_class()
+    if model in (Post, Comment):
+        adjust(model, like.object_id, 'like_count', delta)
+
+
+def adjust_comment_count(comment, delta):
+    adjust(Post, comment.post_id, 'comment_count', delta)
+
+
+def recount_likes(obj):
+    """Re-derive the like_count of a Post or Comment after its likes were changed in bulk, which sends no signals."""
+    model = type(obj)
+    model.objects.filter(pk=obj.pk).update(like_count=like_count_subquery(model))
+
+
+def reconcile_counters():
+    """
+    Recompute every counter from the Like and Comment tables in bulk,
+    one UPDATE per counter. Returns the number of rows that had drifted.
+    """
+    post_likes = like_count_subquery(Post)
+    post_comments = count_subquery(Comment.objects.filter(post=OuterRef('pk')), 'post')
+    comment_likes = like_count_subquery(Comment)
+
+    drifted = (
+        Post.objects.annotate(actual=post_likes).exclude(like_count=F('actual')).update(like_count=post_likes) +
+        Post.objects.annotate(actual=post_comments).exclude(comment_count=F('actual')).update(comment_count=post_comments) +
+        Comment.objects.annotate(actual=comment_likes).exclude(like_count=F('actual')).update(like_count=comment_likes)
+    )
+    logger.info(f"Reconciled {drifted} drifted counters")
+    return drifted
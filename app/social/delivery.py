@@ -0,0 +1,42 @@
+from collections import defaultdict
+from .models import Author, Node
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_host(host):
+    return str(host or '').rstrip('/')
+
+
+def node_index():
+    """Active nodes keyed by their normalized host."""
+    return {normalize_host(node.host): node for node in Node.objects.filter(is_active=True)}
+
+
+def node_for(author, index=None):
+    """The active node hosting author, or None for local and unknown authors."""
+    if index is None:
+        index = node_index()
+    return index.get(normalize_host(author.host))
+
+
+def plan_deliveries(recipients, index=None):
+    """
+    Group recipient authors by the active node that hosts them.
+    Returns {node: [author, ...]}, authors on no known node are left out.
+    """
+    if index is None:
+        index = node_index()
+    plan = defaultdict(list)
+    for author in recipients:
+        node = index.get(normalize_host(author.host))
+        if node is not None:
+            plan[node].append(author)
+    return dict(plan)
+
+
+def remote_followers(author):
+    """Authors following author from other nodes, with just the fields delivery needs."""
+    return Author.objects.filter(following__following=author, user__isnull=True).only('id', 'fqid', 'host').distinct()
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+from itertools import islice
+from .models import Follow, InboxFanoutJob, InboxItem
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+INBOX_FANOUT_BATCH_SIZE = getattr(settings, 'INBOX_FANOUT_BATCH_SIZE', 1000)
+# Followers above which the fan-out is queued for the worker, None always writes in the request
+INBOX_FANOUT_ASYNC_THRESHOLD = getattr(settings, 'INBOX_FANOUT_ASYNC_THRESHOLD', None)
+
+
+def follower_ids(author_id):
+    return Follow.objects.filter(following_id=author_id).values_list('user_id', flat=True)
+
+
+def write_post_inbox_items(post, batch_size=INBOX_FANOUT_BATCH_SIZE):
+    """
+    Insert an InboxItem for post into every follower's inbox with chunked
+    bulk_create in one transaction. Followers who already have it, because the
+    post was edited, keep their item. Returns the number of followers.
+    """
+    content_type = ContentType.objects.get_for_model(post)
+    recipients = follower_ids(post.author_id).iterator(chunk_size=batch_size)
+    written = 0
+
+    with transaction.atomic():
+        while chunk := list(islice(recipients, batch_size)):
+            InboxItem.objects.bulk_create([
+                InboxItem(recipient_id=recipient_id, sender_id=post.author_id, content_type=content_type, object_id=post.id)
+                for recipient_id in chunk
+            ], ignore_conflicts=True)
+            written += len(chunk)
+
+    logger.info(f"Wrote {written} inbox items for post {post.id}")
+    return written
+
+
+def fan_out_post(post):
+    """
+    Deliver post to its author's local followers, or queue an InboxFanoutJob
+    when the author has more than INBOX_FANOUT_ASYNC_THRESHOLD followers.
+    """
+    threshold = INBOX_FANOUT_ASYNC_THRESHOLD
+    if threshold is not None and follower_ids(post.author_id).count() > threshold:
+        InboxFanoutJob.objects.create(post=post)
+        logger.info(f"Queued inbox fan-out for post {post.id}")
+        return 0
+    return write_post_inbox_items(post)
+
+
+def run_pending_fanouts(limit=10):
+    """Process up to limit queued fan-out jobs. Returns the number processed."""
+    processed = 0
+    pending = InboxFanoutJob.objects.filter(completed_at__isnull=True).order_by('created')
+    for job_id in list(pending.values_list('id', flat=True)[:limit]):
+        with transaction.atomic():
+            # skip_locked lets several workers share the jobs on Postgres, it is ignored on SQLite
+            job = pending.select_for_update(skip_locked=True).select_related('post').filter(id=job_id).first()
+            if job is None:
+                continue
+            write_post_inbox_items(job.post)
+            job.completed_at = timezone.now()
+            job.save(update_fields=['completed_at'])
+        processed += 1
+    return processed
@@ -0,0 +1,238 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from .models import Author, InboxItem, ReceivedActivity
+from .serializers import SingleCommentSerializer, SingleFollowRequestSerializer, SingleLikeSerializer, SinglePostSerializer
+from .utils import get_object_by_fqid
+import hashlib
+import json
+import logging
+import math
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+# Most activities accepted in one batch request
+INBOX_BATCH_MAX_ITEMS = getattr(settings, 'INBOX_BATCH_MAX_ITEMS', 500)
+NDJSON_CONTENT_TYPES = {'application/x-ndjson', 'application/ndjson', 'application/jsonl'}
+# Activities that carry the FQID of their object. Follow requests have none and are never deduplicated.
+DEDUPLICATED_TYPES = {'post', 'comment', 'like'}
+
+
+def add_inbox_item(recipient, sender, instance):
+    """recipient's inbox item for instance, created unless an edit or resend already put it there."""
+    item, created = InboxItem.objects.get_or_create(
+        recipient=recipient,
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.id,
+        defaults={'sender': sender},
+    )
+    return item
+
+
+def activity_key(data):
+    """The FQID a resend of data would carry again, or None if data is not deduplicated."""
+    if not isinstance(data, dict) or data.get('type') not in DEDUPLICATED_TYPES:
+        return None
+    fqid = data.get('id')
+    if not isinstance(fqid, str) or not fqid or len(fqid) > ReceivedActivity._meta.get_field('activity_id').max_length:
+        return None
+    return fqid
+
+
+def content_hash(data):
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def is_duplicate(author, data):
+    """True if author's inbox already accepted exactly this activity. One indexed lookup."""
+    key = activity_key(data)
+    return key is not None and ReceivedActivity.objects.filter(
+        recipient=author, activity_id=key, content_hash=content_hash(data),
+    ).exists()
+
+
+def record_received(author, data):
+    key = activity_key(data)
+    if key is not None:
+        ReceivedActivity.objects.update_or_create(
+            recipient=author,
+            activity_id=key,
+            defaults={'content_hash': content_hash(data), 'received_at': timezone.now()},
+        )
+
+
+def process_inbox_activity(author, data, request=None):
+    """
+    Store one activity POSTed to author's inbox unless the inbox already
+    accepted exactly this version of it, in which case nothing is touched.
+    Returns (status code, response body) for the caller to send back.
+    """
+    if is_duplicate(author, data):
+        return status.HTTP_200_OK, {"message": "Already received"}
+
+    response_status, body = store_inbox_activity(author, data, request)
+    if response_status < 400:
+        record_received(author, data)
+    return response_status, body
+
+
+def store_inbox_activity(author, data, request=None):
+    """
+    Store one activity for author and add it to the inbox.
+    Returns (status code, response body).
+    """
+    activity_type = data.get('type') if isinstance(data, dict) else None
+
+    # "if the type is "comment" then add that comment to AUTHOR_SERIAL's inbox"
+    if activity_type == 'comment':
+
+        logger.info(f"Comment data send_inbox: {data}")
+        serializer = SingleCommentSerializer(data=data, context={'request': request})
+
+        if serializer.is_valid():
+            comment = serializer.save()
+            logger.info(f"Comment data send_inbox: Valid data")
+
+            # Add the comment to the author's inbox
+            add_inbox_item(author, comment.author, comment)
+            return status.HTTP_201_CREATED, {"message": "Comment added to Inbox"}
+
+        logger.error(f"Validation errors: {serializer.errors}")
+        return status.HTTP_400_BAD_REQUEST, {"error": "Invalid Comment type"}
+
+    # "if the type is "Like" then add that like to AUTHOR_SERIAL's inbox"
+    elif activity_type == 'like':
+
+        # Extract the object being liked from the like data
+        object_fqid = data.get('object')
+        if not object_fqid:
+            return status.HTTP_400_BAD_REQUEST, {"error": "Missing 'object' field in Like"}
+
+        # Find the target object (Post or Comment)
+        target_object, content_type = get_object_by_fqid(object_fqid)
+        if not target_object:
+            return status.HTTP_404_NOT_FOUND, {"error": f"Object with fqid '{object_fqid}' not found"}
+
+        # Add object info to the data
+        data = data.copy()
+        data['object_id'] = target_object.id
+        data['content_type'] = content_type.model
+
+        serializer = SingleLikeSerializer(data=data)
+        if serializer.is_valid():
+            like = serializer.save()
+
+            # Add the like to the author's inbox
+            add_inbox_item(author, like.author, like)
+            return status.HTTP_201_CREATED, {"message": "Like added to Inbox"}
+
+        logger.error(f"Validation errors: {serializer.errors}")
+        return status.HTTP_400_BAD_REQUEST, {"error": "Invalid Like type"}
+
+    # "if the type is "follow" then add that follow is added to AUTHOR_SERIAL's inbox to approve later"
+    elif activity_type == 'follow':
+        serializer = SingleFollowRequestSerializer(data=data)
+        if serializer.is_valid():
+            follow_request = serializer.save()
+
+            # Add the follow request to the author's inbox
+            add_inbox_item(follow_request.object, follow_request.actor, follow_request)
+            return status.HTTP_201_CREATED, {"message": "Follow request added to Inbox"}
+
+        logger.error(f"Validation errors: {serializer.errors}")
+        return status.HTTP_400_BAD_REQUEST, {"error": "Invalid Follow type"}
+
+    # "if the type is "post" then add that post to AUTHOR_SERIAL's inbox"
+    elif activity_type == 'post':
+
+        logger.info(f"Post data send_inbox: {data}")
+        serializer = SinglePostSerializer(data=data, context={'request': request})
+        if serializer.is_valid():
+            post = serializer.save()
+
+            # Add the post to the author's inbox
+            add_inbox_item(author, post.author, post)
+            return status.HTTP_201_CREATED, {"message": "Post added to Inbox"}
+
+        logger.error(f"Post Validation errors: {serializer.errors}")
+        return status.HTTP_400_BAD_REQUEST, {"error": "Invalid Post type"}
+
+    return status.HTTP_400_BAD_REQUEST, {"error": "Invalid type"}
+
+
+def parse_inbox_batch(request):
+    """
+    The envelopes of a batch inbox request, each {"recipient": ..., "activity": {...}}.
+    The body is a JSON array, or one envelope per line for NDJSON. Raises ValueError.
+    """
+    if request.content_type.split(';')[0].strip() in NDJSON_CONTENT_TYPES:
+        lines = request.body.decode('utf-8').splitlines()
+        return [json.loads(line) for line in lines if line.strip()]
+
+    envelopes = request.data
+    if not isinstance(envelopes, list):
+        raise ValueError("Expected a JSON array of activities")
+    return envelopes
+
+
+def recipient_serial(recipient):
+    """The author serial in a recipient given as a serial, author FQID or inbox URL."""
+    parts = str(recipient or '').rstrip('/').split('/')
+    if parts[-1] == 'inbox':
+        parts = parts[:-1]
+    return uuid.UUID(parts[-1])
+
+
+def resolve_recipients(envelopes):
+    """The local recipient Author of each envelope, None where it is missing or unknown. One query."""
+    serials = []
+    for envelope in envelopes:
+        try:
+            serials.append(recipient_serial(envelope.get('recipient')))
+        except (AttributeError, ValueError):
+            serials.append(None)
+    authors = Author.objects.in_bulk({serial for serial in serials if serial is not None})
+    return [authors.get(serial) for serial in serials]
+
+
+def throttled_result(index, throttle):
+    return {
+        'index': index,
+        'status': status.HTTP_429_TOO_MANY_REQUESTS,
+        'error': "Too many activities for this recipient",
+        'retry_after': math.ceil(throttle.wait() or 1),
+    }
+
+
+def process_inbox_batch(envelopes, request=None, throttle=None):
+    """
+    Process every envelope in one transaction, each under its own savepoint
+    so one bad activity does not undo the others. Returns one result per envelope.
+    throttle, a RecipientInboxThrottle, charges each recipient's bucket, envelopes over it get 429.
+    """
+    recipients = resolve_recipients(envelopes)
+
+    results = []
+    with transaction.atomic():
+        for index, envelope in enumerate(envelopes):
+            author = recipients[index]
+            if author is None:
+                results.append({'index': index, 'status': status.HTTP_404_NOT_FOUND, 'error': "Unknown recipient"})
+                continue
+            if throttle is not None and not throttle.allow_recipient(author):
+                results.append(throttled_result(index, throttle))
+                continue
+            try:
+                with transaction.atomic():
+                    response_status, body = process_inbox_activity(author, envelope.get('activity'), request)
+            except Exception as e:
+                logger.exception(f"Error processing batch item {index} for {author.id}")
+                response_status, body = status.HTTP_500_INTERNAL_SERVER_ERROR, {'error': str(e)}
+            results.append({'index': index, 'status': response_status, **body})
+    return results
@@ -0,0 +1,199 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from .inbox_processing import activity_key, content_hash, is_duplicate, process_inbox_activity, resolve_recipients, throttled_result
+from .models import InboundActivity
+import json
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Answer inbox POSTs with 202 and apply them in run_inbox_worker
+INBOX_ASYNC_INGEST = getattr(settings, 'INBOX_ASYNC_INGEST', False)
+# Seconds a claimed activity may stay PROCESSING before another worker takes it over
+INBOX_CLAIM_TIMEOUT = getattr(settings, 'INBOX_CLAIM_TIMEOUT', 300)
+# Likes and comments can arrive before the post they refer to, those are retried this often
+INBOX_MAX_ATTEMPTS = getattr(settings, 'INBOX_MAX_ATTEMPTS', 3)
+INBOX_RETRY_DELAY = getattr(settings, 'INBOX_RETRY_DELAY', 60)
+# Outcomes retried up to INBOX_MAX_ATTEMPTS: a missing object, and transient database errors
+# (a locked database, or a race with a concurrent insert of the same row)
+RETRYABLE_RESULTS = {status.HTTP_404_NOT_FOUND, status.HTTP_503_SERVICE_UNAVAILABLE}
+# Pending activities at which new ones are refused with 503 until the worker catches up
+INBOX_QUEUE_SHED_DEPTH = getattr(settings, 'INBOX_QUEUE_SHED_DEPTH', 10000)
+INBOX_SHED_RETRY_AFTER = getattr(settings, 'INBOX_SHED_RETRY_AFTER', 30)
+# Seconds the queue depth is cached, so shedding costs no query per request
+QUEUE_DEPTH_CACHE_TTL = 5
+
+ACTIVITY_TYPES = {'post', 'comment', 'like', 'follow'}
+
+
+def queue_depth():
+    """Pending activities, counted at most every QUEUE_DEPTH_CACHE_TTL seconds."""
+    return cache.get_or_set(
+        'inbox_queue_depth',
+        lambda: InboundActivity.objects.filter(status='PENDING').count(),
+        QUEUE_DEPTH_CACHE_TTL,
+    )
+
+
+def is_overloaded():
+    return INBOX_QUEUE_SHED_DEPTH is not None and queue_depth() >= INBOX_QUEUE_SHED_DEPTH
+
+
+def check_envelope(data):
+    """An error message if data is not a queueable activity, else None. Nothing beyond the type is validated."""
+    if not isinstance(data, dict):
+        return "Activity must be a JSON object"
+    if data.get('type') not in ACTIVITY_TYPES:
+        return "Invalid type"
+    return None
+
+
+def queued_activity(author, data, received_from=''):
+    key = activity_key(data)
+    return InboundActivity(
+        recipient=author,
+        activity_type=data['type'],
+        body=json.dumps(data, cls=DjangoJSONEncoder),
+        received_from=received_from,
+        activity_id=key or '',
+        content_hash=content_hash(data) if key else '',
+    )
+
+
+def is_queued(author, data):
+    """True if exactly this activity for author is already waiting for the worker."""
+    key = activity_key(data)
+    return key is not None and InboundActivity.objects.filter(
+        recipient=author, activity_id=key, content_hash=content_hash(data), status__in=['PENDING', 'PROCESSING'],
+    ).exists()
+
+
+def is_repeat(author, data):
+    """True if author's inbox accepted exactly this activity, or has it queued. A resend is not queued again."""
+    return is_duplicate(author, data) or is_queued(author, data)
+
+
+def enqueue(author, data, received_from=''):
+    """Store data for author's inbox as received. Returns the InboundActivity."""
+    activity = queued_activity(author, data, received_from)
+    activity.save()
+    return activity
+
+
+def enqueue_batch(envelopes, received_from='', throttle=None):
+    """
+    Queue every valid envelope of a batch inbox request with one insert.
+    Returns one result per envelope, 202 for the queued ones and 200 for repeats.
+    throttle, a RecipientInboxThrottle, charges each recipient's bucket, envelopes over it get 429.
+    """
+    results = []
+    activities = []
+    queued = set()
+    for index, (envelope, author) in enumerate(zip(envelopes, resolve_recipients(envelopes))):
+        if author is None:
+            results.append({'index': index, 'status': status.HTTP_404_NOT_FOUND, 'error': "Unknown recipient"})
+            continue
+        error = check_envelope(envelope.get('activity'))
+        if error:
+            results.append({'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'error': error})
+            continue
+        activity = queued_activity(author, envelope['activity'], received_from)
+        key = (author.id, activity.activity_id, activity.content_hash)
+        if (activity.activity_id and key in queued) or is_repeat(author, envelope['activity']):
+            results.append({'index': index, 'status': status.HTTP_200_OK, 'message': "Already received"})
+            continue
+        if throttle is not None and not throttle.allow_recipient(author):
+            results.append(throttled_result(index, throttle))
+            continue
+        queued.add(key)
+        activities.append(activity)
+        results.append({'index': index, 'status': status.HTTP_202_ACCEPTED, 'message': "Activity queued"})
+
+    InboundActivity.objects.bulk_create(activities)
+    return results
+
+
+def claim_batch(limit):
+    """
+    Mark up to limit due activities as PROCESSING and return them.
+    Activities left PROCESSING by a crashed worker are released first.
+    """
+    now = timezone.now()
+    InboundActivity.objects.filter(status='PROCESSING', claimed_at__lt=now - timedelta(seconds=INBOX_CLAIM_TIMEOUT)).update(status='PENDING')
+
+    with transaction.atomic():
+        # skip_locked lets several workers share the queue on Postgres, it is ignored on SQLite
+        ids = list(
+            InboundActivity.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('created')
+            .values_list('id', flat=True)[:limit]
+        )
+        InboundActivity.objects.filter(id__in=ids).update(status='PROCESSING', claimed_at=now)
+
+    return list(InboundActivity.objects.filter(id__in=ids).select_related('recipient').order_by('created'))
+
+
+def apply(activity):
+    """Run one queued activity through the inbox and record the outcome. Returns True when it was stored."""
+    activity.attempts += 1
+    try:
+        with transaction.atomic():
+            result_status, body = process_inbox_activity(activity.recipient, json.loads(activity.body))
+    except (IntegrityError, OperationalError) as e:
+        logger.warning(f"Database error applying {activity.activity_type} for {activity.recipient_id}: {e}")
+        result_status, body = status.HTTP_503_SERVICE_UNAVAILABLE, {'error': str(e)}
+    except Exception as e:
+        logger.exception(f"Error applying {activity.activity_type} for {activity.recipient_id}")
+        result_status, body = status.HTTP_500_INTERNAL_SERVER_ERROR, {'error': str(e)}
+
+    activity.result_status = result_status
+    activity.processed_at = timezone.now()
+    if result_status < 400:
+        activity.status = 'DONE'
+        activity.last_error = ''
+    elif result_status in RETRYABLE_RESULTS and activity.attempts < INBOX_MAX_ATTEMPTS:
+        # The liked or commented object may still be on its way, or the database was busy
+        activity.status = 'PENDING'
+        activity.next_attempt_at = timezone.now() + timedelta(seconds=INBOX_RETRY_DELAY)
+        activity.last_error = body.get('error', '')
+    else:
+        activity.status = 'FAILED'
+        activity.last_error = body.get('error', '')
+        logger.error(f"Inbound {activity.activity_type} for {activity.recipient_id} failed with {result_status}: {activity.last_error}")
+
+    activity.save(update_fields=['status', 'attempts', 'result_status', 'last_error', 'next_attempt_at', 'processed_at'])
+    return activity.status == 'DONE'
+
+
+def _apply_in_thread(activity):
+    try:
+        return apply(activity)
+    finally:
+        # Worker threads get their own DB connection, do not leak it
+        connection.close()
+
+
+def run_worker(concurrency=4, batch_size=100, poll_interval=1.0, once=False):
+    """
+    Apply queued inbound activities with `concurrency` threads.
+    With once=True, drain what is currently queued and return the number applied.
+    """
+    applied = 0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='inbox') as executor:
+        while True:
+            activities = claim_batch(batch_size)
+            if activities:
+                applied += sum(executor.map(_apply_in_thread, activities))
+                continue
+            if once:
+                return applied
+            time.sleep(poll_interval)
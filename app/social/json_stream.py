@@ -0,0 +1,78 @@
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# Bytes collected before a piece of the response is handed to the server
+STREAM_BUFFER_SIZE = 64 * 1024
+
+# Same compact output as DRF's JSONRenderer
+_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+class FileString:
+    """A JSON string value read from a file that holds it already JSON-safe, such as base64 text, after an optional prefix."""
+
+    def __init__(self, path, prefix=''):
+        self.path = path
+        self.prefix = prefix
+
+    def chunks(self):
+        if self.prefix:
+            yield encode_scalar(self.prefix)[1:-1]
+        with open(self.path, 'rb') as f:
+            yield from iter(lambda: f.read(STREAM_BUFFER_SIZE), b'')
+
+
+def encode_scalar(value):
+    # Like JSONRenderer, escape the two line separators JSON allows but JavaScript does not
+    return _encoder.encode(value).replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode('utf-8')
+
+
+def _pieces(value):
+    if isinstance(value, FileString):
+        yield b'"'
+        yield from value.chunks()
+        yield b'"'
+    elif isinstance(value, dict):
+        yield b'{'
+        for index, (key, item) in enumerate(value.items()):
+            yield (b',' if index else b'') + encode_scalar(str(key)) + b':'
+            yield from _pieces(item)
+        yield b'}'
+    elif isinstance(value, (list, tuple)):
+        yield b'['
+        for index, item in enumerate(value):
+            if index:
+                yield b','
+            yield from _pieces(item)
+        yield b']'
+    else:
+        yield encode_scalar(value)
+
+
+def iter_json(data):
+    """
+    data encoded as JSON, in pieces of about STREAM_BUFFER_SIZE bytes.
+    FileString values are copied from their file while the response is written.
+    """
+    buffer = bytearray()
+    for piece in _pieces(data):
+        buffer += piece
+        if len(buffer) >= STREAM_BUFFER_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def accepts_json(request):
+    """True if the negotiated renderer of a DRF request is plain JSON."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer is not None and renderer.format == 'json'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """A JSON response written piece by piece, so large FileString values never sit in memory."""
+
+    def __init__(self, data, status=200, **kwargs):
+        super().__init__(iter_json(data), content_type='application/json', status=status, **kwargs)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from social.timeline import rebuild_timelines, TIMELINE_BACKFILL_LIMIT
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized dashboard timelines of every local author"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=TIMELINE_BACKFILL_LIMIT, help="Newest posts to keep per timeline")
+
+    def handle(self, *args, **options):
+        count = rebuild_timelines(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt timelines for {count} authors"))
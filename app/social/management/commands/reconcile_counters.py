@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from social.counters import reconcile_counters
+
+class Command(BaseCommand):
+    help = "Recompute denormalized like and comment counters from the Like and Comment tables"
+
+    def handle(self, *args, **kwargs):
+        drifted = reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled counters, {drifted} rows had drifted"))
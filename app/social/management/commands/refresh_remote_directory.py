@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from social.remote_authors import refresh_directory
+import time
+
+class Command(BaseCommand):
+    help = "Refresh the local cache of remote authors from every node whose TTL has expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Refresh every active node regardless of TTL")
+        parser.add_argument('--interval', type=float, default=0, help="Keep running, checking for stale nodes every this many seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            written = refresh_directory(force=options['force'])
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} remote authors"))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from social.models import Node
+from social.outbox import replay_dead_letters
+
+class Command(BaseCommand):
+    help = "Requeue deliveries that ran out of attempts, spaced out so a recovered node is not flooded"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--node', help="Only replay deliveries to this node (team name or host)")
+        parser.add_argument('--spacing', type=float, default=1.0, help="Seconds between consecutive replays")
+        parser.add_argument('--limit', type=int, default=None, help="Replay at most this many deliveries")
+
+    def handle(self, *args, **options):
+        node = None
+        if options['node']:
+            node = Node.objects.filter(Q(team_name=options['node']) | Q(host=options['node'])).first()
+            if node is None:
+                raise CommandError(f"No node matching {options['node']}")
+
+        requeued = replay_dead_letters(node=node, spacing=options['spacing'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Requeued {requeued} dead letters"))
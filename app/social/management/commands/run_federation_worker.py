@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from social.outbox import run_worker
+
+class Command(BaseCommand):
+    help = "Deliver queued posts, likes, comments and follows to remote inboxes and run queued local inbox fan-outs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Maximum deliveries in flight")
+        parser.add_argument('--batch-size', type=int, default=50, help="Items claimed from the outbox at a time")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to wait when the outbox is empty")
+        parser.add_argument('--once', action='store_true', help="Drain the outbox and exit")
+
+    def handle(self, *args, **options):
+        delivered = run_worker(
+            concurrency=options['concurrency'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            once=options['once'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Delivered {delivered} queued activities"))
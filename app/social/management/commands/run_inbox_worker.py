@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from social.inbox_queue import run_worker
+
+class Command(BaseCommand):
+    help = "Apply posts, likes, comments and follows queued by the inbox when INBOX_ASYNC_INGEST is on"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Activities applied in parallel")
+        parser.add_argument('--batch-size', type=int, default=100, help="Activities claimed from the queue at a time")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit")
+
+    def handle(self, *args, **options):
+        applied = run_worker(
+            concurrency=options['concurrency'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            once=options['once'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Applied {applied} inbound activities"))
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from urllib.parse import quote
+import mimetypes
+import os
+import re
+
+
+# '' streams files from Python. 'x-accel-redirect' or 'x-sendfile' leave that to the
+# front end: the response only names the file, see the Caddyfile.
+MEDIA_SENDFILE = getattr(settings, 'MEDIA_SENDFILE', '')
+
+# URL the front end serves MEDIA_ROOT under, prefixed to X-Accel-Redirect paths
+MEDIA_ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_PREFIX', settings.MEDIA_URL)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """
+    length bytes of an open file from start. fileno() lets the WSGI server send it
+    with sendfile, which starts at the current offset and stops at Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(stat):
+    return quote_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+
+
+def byte_range(request, size, etag, last_modified):
+    """
+    The (start, end) bytes, end inclusive, asked for by request's Range header,
+    None to send the whole file, or False if the range cannot be satisfied.
+    Only single ranges are honoured, others get the whole file.
+    """
+    match = RANGE_RE.match(request.META.get('HTTP_RANGE', '').strip())
+    if not match or not any(match.groups()):
+        return None
+
+    # A Range that depends on an outdated If-Range gets the whole, current file
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        return None
+
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def sendfile_response(path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if MEDIA_SENDFILE == 'x-accel-redirect':
+        relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = quote(MEDIA_ACCEL_PREFIX + relative)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def file_response(request, path, content_type=None):
+    """
+    Serve the file at path with ETag and Last-Modified, answering conditional
+    requests with 304 and Range requests with 206. In a MEDIA_SENDFILE mode the
+    front end reads the file, Python never does.
+    """
+    content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if MEDIA_SENDFILE:
+        # The front end handles conditional and Range requests itself
+        return sendfile_response(path, content_type)
+
+    file = open(path, 'rb')
+    stat = os.fstat(file.fileno())
+    etag, last_modified = file_etag(stat), int(stat.st_mtime)
+    headers = {'ETag': etag, 'Last-Modified': http_date(last_modified), 'Accept-Ranges': 'bytes'}
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        file.close()
+        for header, value in headers.items():
+            conditional[header] = value
+        return conditional
+
+    requested = byte_range(request, stat.st_size, etag, last_modified) if request.method in ('GET', 'HEAD') else None
+    if requested is False:
+        file.close()
+        return HttpResponse(status=416, headers={'Content-Range': f"bytes */{stat.st_size}", **headers})
+    if requested is None:
+        return FileResponse(file, content_type=content_type, headers=headers)
+
+    start, end = requested
+    response = FileResponse(FileRange(file, start, end - start + 1), status=206, content_type=content_type, headers=headers)
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f"bytes {start}-{end}/{stat.st_size}"
+    return response
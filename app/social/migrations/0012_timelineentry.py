@@ -0,0 +1,53 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_timelines(apps, schema_editor):
+    """Build the initial timeline of every local author from the existing posts."""
+    Author = apps.get_model('social', 'Author')
+    Follow = apps.get_model('social', 'Follow')
+    Post = apps.get_model('social', 'Post')
+    TimelineEntry = apps.get_model('social', 'TimelineEntry')
+
+    for viewer in Author.objects.filter(user__isnull=False):
+        following = set(Follow.objects.filter(user=viewer).values_list('following', flat=True))
+        followers = set(Follow.objects.filter(following=viewer).values_list('user', flat=True))
+        posts = Post.objects.filter(
+            models.Q(visibility='PUBLIC') |
+            models.Q(visibility='FRIENDS', author__in=following & followers) |
+            models.Q(visibility='UNLISTED', author__in=following)
+        ).order_by('-published').only('id', 'published')[:1000]
+
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(viewer=viewer, post=post, published=post.published) for post in posts],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0010_alter_post_contenttype'),
+        ('social', '0011_alter_author_profile_image_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('published', models.DateTimeField(verbose_name='date published')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='social.post')),
+                ('viewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='social.author')),
+            ],
+            options={
+                'ordering': ['-published'],
+                'indexes': [models.Index(fields=['viewer', '-published'], name='timeline_viewer_published')],
+                'constraints': [models.UniqueConstraint(fields=('viewer', 'post'), name='unique_timeline_entry')],
+            },
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:16
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, group_field):
+    counts = queryset.order_by().values(group_field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    """Initialize the counters from the existing Like and Comment rows."""
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Comment = apps.get_model('social', 'Comment')
+    Like = apps.get_model('social', 'Like')
+    Post = apps.get_model('social', 'Post')
+
+    for model in (Post, Comment):
+        content_type = ContentType.objects.filter(app_label='social', model=model._meta.model_name).first()
+        if content_type is not None:
+            likes = Like.objects.filter(content_type=content_type, object_id=OuterRef('pk'))
+            model.objects.update(like_count=count_subquery(likes, 'object_id'))
+
+    Post.objects.update(comment_count=count_subquery(Comment.objects.filter(post=OuterRef('pk')), 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('social', '0012_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0014_outboxitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemoteDirectoryState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=255)),
+                ('ttl', models.PositiveIntegerField(default=600)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('author_count', models.PositiveIntegerField(default=0)),
+                ('node', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='directory_state', to='social.node')),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:40
+
+from django.db import migrations, models
+from social.author_search import install_search_index, search_text_for, uninstall_search_index
+
+
+def backfill_search_fields(apps, schema_editor):
+    """Compute search_text and the account flags for existing authors."""
+    Author = apps.get_model('social', 'Author')
+
+    authors = []
+    for author in Author.objects.select_related('user').iterator(chunk_size=2000):
+        username = author.user.username if author.user_id else ''
+        author.search_text = search_text_for(author.display_name, username)
+        author.is_api_account = 'api' in username.lower()
+        author.is_test_account = 'test-' in username.lower()
+        authors.append(author)
+    Author.objects.bulk_update(authors, ['search_text', 'is_api_account', 'is_test_account'], batch_size=2000)
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0015_remotedirectorystate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='is_api_account',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='is_test_account',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='search_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(backfill_search_fields, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0016_author_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxFanoutJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fanout_jobs', to='social.post')),
+            ],
+            options={
+                'ordering': ['created'],
+            },
+        ),
+    ]
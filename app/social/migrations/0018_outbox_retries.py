@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def failed_to_dead(apps, schema_editor):
+    """Items that failed under the old single-attempt delivery become dead letters."""
+    OutboxItem = apps.get_model('social', 'OutboxItem')
+    OutboxItem.objects.filter(status='FAILED').update(status='DEAD')
+
+
+def dead_to_failed(apps, schema_editor):
+    OutboxItem = apps.get_model('social', 'OutboxItem')
+    OutboxItem.objects.filter(status='DEAD').update(status='FAILED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0017_inboxfanoutjob'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboxitem',
+            name='outbox_status_created',
+        ),
+        migrations.AddField(
+            model_name='outboxitem',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='outboxitem',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('DELIVERED', 'Delivered'), ('DEAD', 'Dead letter')], default='PENDING', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='outboxitem',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_attempt'),
+        ),
+        migrations.RunPython(failed_to_dead, dead_to_failed),
+    ]
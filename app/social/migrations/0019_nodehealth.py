@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0018_outbox_retries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NodeHealth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(choices=[('CLOSED', 'Closed'), ('OPEN', 'Open'), ('HALF_OPEN', 'Half open')], default='CLOSED', max_length=20)),
+                ('consecutive_failures', models.PositiveIntegerField(default=0)),
+                ('latency_ms', models.FloatField(blank=True, null=True)),
+                ('error_rate', models.FloatField(default=0.0)),
+                ('last_error', models.TextField(blank=True)),
+                ('last_success_at', models.DateTimeField(blank=True, null=True)),
+                ('last_failure_at', models.DateTimeField(blank=True, null=True)),
+                ('node', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='health', to='social.node')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0019_nodehealth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='supports_batch_inbox',
+            field=models.BooleanField(default=False),
+        ),
+    ]
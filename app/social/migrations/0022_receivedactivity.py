@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('social', '0021_inboundactivity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceivedActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_id', models.URLField(max_length=255)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='inboxitem',
+            index=models.Index(fields=['recipient', 'content_type', 'object_id'], name='inbox_item_object'),
+        ),
+        migrations.AddField(
+            model_name='receivedactivity',
+            name='recipient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='received_activities', to='social.author'),
+        ),
+        migrations.AddConstraint(
+            model_name='receivedactivity',
+            constraint=models.UniqueConstraint(fields=('recipient', 'activity_id'), name='unique_received_activity'),
+        ),
+    ]
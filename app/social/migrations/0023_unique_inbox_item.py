@@ -0,0 +1,52 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:56
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def delete_duplicate_inbox_items(apps, schema_editor):
+    """Keep the earliest inbox item of each recipient and object, edits used to add another."""
+    InboxItem = apps.get_model('social', 'InboxItem')
+    duplicated = (
+        InboxItem.objects.order_by().values('recipient', 'content_type', 'object_id')
+        .annotate(items=Count('pk')).filter(items__gt=1)
+    )
+    for group in duplicated:
+        items = InboxItem.objects.filter(
+            recipient=group['recipient'], content_type=group['content_type'], object_id=group['object_id'],
+        ).order_by('published', 'pk')
+        InboxItem.objects.filter(pk__in=list(items.values_list('pk', flat=True)[1:])).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('social', '0022_receivedactivity'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='inboxitem',
+            name='inbox_item_object',
+        ),
+        migrations.AddField(
+            model_name='inboundactivity',
+            name='activity_id',
+            field=models.URLField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='inboundactivity',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='inboundactivity',
+            index=models.Index(fields=['recipient', 'activity_id'], name='inbound_recipient_activity'),
+        ),
+        migrations.RunPython(delete_duplicate_inbox_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='inboxitem',
+            constraint=models.UniqueConstraint(fields=('recipient', 'content_type', 'object_id'), name='unique_inbox_item'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0023_unique_inbox_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='batch_inbox_url',
+            field=models.URLField(blank=True, max_length=500),
+        ),
+    ]
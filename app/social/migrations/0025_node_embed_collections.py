@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0024_node_batch_inbox_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='embed_collections',
+            field=models.BooleanField(default=True),
+        ),
+    ]
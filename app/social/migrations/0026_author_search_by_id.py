@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:58
+
+from django.db import migrations
+from social.author_search import install_search_index, uninstall_search_index
+
+
+def rebuild_search_index(apps, schema_editor):
+    """Replace the SQLite FTS table keyed on social_author's rowid with one keyed on the author id."""
+    uninstall_search_index(schema_editor.connection)
+    install_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0025_node_embed_collections'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
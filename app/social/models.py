@@ -1,6 +1,6 @@
 import uuid
 from django.db import models
-from datetime import datetime
+from datetime import datetime, timedelta
 from django.utils import timezone
 from django.contrib.auth.models import User
 import os
@@ -15,6 +15,7 @@ from django.contrib.auth.hashers import make_password, check_password
 import base64
 from django.utils.html import strip_tags
 import logging
+from .author_search import search_text_for
 
 logger = logging.getLogger(__name__)
 
@@ -75,6 +76,9 @@ class Node(models.Model):
     username = models.CharField(max_length=255)
     password = models.CharField(max_length=255)  # Hashed password
     is_active = models.BooleanField(default=True)
+    supports_batch_inbox = models.BooleanField(default=False)  # Accepts batch inbox POSTs, set when the node advertises it
+    batch_inbox_url = models.URLField(max_length=500, blank=True)  # From the node's X-Inbox-Batch header, {host}inbox/batch/ when blank
+    embed_collections = models.BooleanField(default=True)  # Pushed posts and comments embed their comments and likes, off for peers that fetch them
 
     def __str__(self):
         return self.team_name
@@ -100,6 +104,11 @@ class Author(models.Model):
     # New Field: Admin Approval
     is_approved = models.BooleanField(default=False)  # Default to False (pending approval) 
 
+    # Derived in save() so search and listings never join auth_user
+    search_text = models.TextField(blank=True, default='')  # Lowercased display name and username, see author_search.py
+    is_api_account = models.BooleanField(default=False, db_index=True)  # Username contains "api", node credentials
+    is_test_account = models.BooleanField(default=False, db_index=True)  # Username contains "test-"
+
     def save(self, *args, **kwargs):
 
         # Check if user exists before accessing is_superuser
@@ -123,7 +132,16 @@ class Author(models.Model):
         if not self.fqid_encoded:
             self.fqid_encoded = quote(self.fqid)
 
+        self.refresh_search_fields()
+
         super().save(*args, **kwargs)
+
+    def refresh_search_fields(self):
+        """Recompute search_text and the account flags from the display name and username."""
+        username = self.user.username if self.user_id and self.user else ''
+        self.search_text = search_text_for(self.display_name, username)
+        self.is_api_account = 'api' in username.lower()
+        self.is_test_account = 'test-' in username.lower()
     
     def get_details_dict(self):
         return {
@@ -202,7 +220,24 @@ def validate_video_duration(value):
     except Exception:
         raise ValidationError("Invalid video file.")
 
-class Post(models.Model):
+class CounterFieldsMixin:
+    """
+    Counter columns are written only by the F() updates in social.counters. Saving an
+    existing row leaves them out, so an instance loaded before a like or comment
+    arrived cannot write its stale counts back.
+    """
+    COUNTER_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class Post(CounterFieldsMixin, models.Model):
 
     CONTENT_TYPE_CHOICES = [
         ('text/plain', 'Plain Text'),
@@ -246,6 +281,11 @@ class Post(models.Model):
     fqid = models.URLField(max_length=255, blank=True, unique=True)
     fqid_encoded = models.CharField(max_length=255, blank=True)
 
+    # Denormalized counters, kept current by signals (see social.counters)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    COUNTER_FIELDS = ('like_count', 'comment_count')
+
     def save(self, *args, **kwargs):
 
         # For bisque group only
@@ -281,7 +321,7 @@ class Post(models.Model):
         ordering = ['-published']
 
   
-class Comment(models.Model):
+class Comment(CounterFieldsMixin, models.Model):
     CONTENT_TYPE_CHOICES = [
         ('text/plain', 'Plain Text'),
         ('text/markdown', 'Markdown'),
@@ -297,6 +337,8 @@ class Comment(models.Model):
     fqid_encoded = models.CharField(max_length=255, blank=True)  # Fully Qualified ID Encoded
     likes = GenericRelation('Like', related_query_name='comment_likes', related_name = 'comment_likes_set')
     inbox = GenericRelation('InboxItem', related_query_name='inbox_items')
+    like_count = models.PositiveIntegerField(default=0)  # Denormalized, see social.counters
+    COUNTER_FIELDS = ('like_count',)
 
     def __str__(self):
         return self.comment
@@ -360,4 +402,174 @@ class InboxItem(models.Model):
     visibility = models.CharField(max_length=20, choices=VISIBILITY_CHOICES, default='UNREAD')
 
     class Meta:
-        ordering = ['-published']
\ No newline at end of file
+        ordering = ['-published']
+        constraints = [
+            # Edits and resends reuse the item, a recipient never sees the same object twice
+            models.UniqueConstraint(fields=['recipient', 'content_type', 'object_id'], name='unique_inbox_item'),
+        ]
+
+class TimelineEntry(models.Model):
+    """
+    Materialized stream row: post is visible on viewer's dashboard.
+    Filled on write (see social.timeline) so the stream is a single range scan.
+    """
+    viewer = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    published = models.DateTimeField("date published")  # Copied from post.published for ordering
+
+    class Meta:
+        ordering = ['-published']
+        constraints = [
+            models.UniqueConstraint(fields=['viewer', 'post'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['viewer', '-published'], name='timeline_viewer_published'),
+        ]
+
+
+class OutboxItem(models.Model):
+    """
+    One activity waiting to be POSTed to a remote inbox.
+    Written by the web request, delivered by the run_federation_worker command.
+    """
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
+        ('DELIVERED', 'Delivered'),
+        ('DEAD', 'Dead letter'),  # Out of attempts, see the replay_dead_letters command
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    node = models.ForeignKey(Node, on_delete=models.CASCADE, related_name='outbox_items')
+    url = models.URLField(max_length=500)  # Remote inbox URL
+    activity_type = models.CharField(max_length=20)  # post, like, comment or follow
+    body = models.TextField()  # JSON encoded activity
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(default=timezone.now)
+    next_attempt_at = models.DateTimeField(default=timezone.now)  # Pushed back after each failed attempt
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_attempt'),
+        ]
+
+    def __str__(self):
+        return f"{self.activity_type} to {self.url} ({self.status})"
+
+
+class RemoteDirectoryState(models.Model):
+    """
+    Bookkeeping for the locally cached copy of a node's author list.
+    The cached authors themselves are ordinary Author rows.
+    """
+    node = models.OneToOneField(Node, on_delete=models.CASCADE, related_name='directory_state')
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=255, blank=True)
+    ttl = models.PositiveIntegerField(default=600)  # Seconds before the author list is fetched again
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    author_count = models.PositiveIntegerField(default=0)
+
+    def is_stale(self, now=None):
+        if self.refreshed_at is None:
+            return True
+        return (now or timezone.now()) >= self.refreshed_at + timedelta(seconds=self.ttl)
+
+    def __str__(self):
+        return f"Author directory of {self.node}"
+
+
+class InboxFanoutJob(models.Model):
+    """A post whose followers' inbox rows are written by run_federation_worker instead of the request."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='fanout_jobs')
+    created = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created']
+
+    def __str__(self):
+        return f"Inbox fan-out of {self.post_id}"
+
+
+class NodeHealth(models.Model):
+    """Last reported circuit breaker state of a node, written by the federation workers (see node_client.py)."""
+
+    STATE_CHOICES = [
+        ('CLOSED', 'Closed'),
+        ('OPEN', 'Open'),
+        ('HALF_OPEN', 'Half open'),
+    ]
+
+    node = models.OneToOneField(Node, on_delete=models.CASCADE, related_name='health')
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default='CLOSED')
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    latency_ms = models.FloatField(null=True, blank=True)  # Rolling average
+    error_rate = models.FloatField(default=0.0)  # Rolling share of failed requests, 0 to 1
+    last_error = models.TextField(blank=True)
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    last_failure_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.node} ({self.state})"
+
+
+class InboundActivity(models.Model):
+    """
+    An activity POSTed to a local inbox, stored as received when INBOX_ASYNC_INGEST is on.
+    Applied by the run_inbox_worker command.
+    """
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PROCESSING', 'Processing'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipient = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='inbound_activities')
+    activity_type = models.CharField(max_length=20)  # post, like, comment or follow
+    body = models.TextField()  # JSON encoded activity as received
+    received_from = models.CharField(max_length=150, blank=True)  # Username the sender authenticated as
+    activity_id = models.URLField(max_length=255, blank=True)  # FQID of a post, comment or like, for deduplication
+    content_hash = models.CharField(max_length=64, blank=True)  # See inbox_processing.content_hash
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    result_status = models.PositiveIntegerField(null=True, blank=True)  # HTTP status the synchronous inbox would have answered
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(default=timezone.now)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='inbound_status_next_attempt'),
+            models.Index(fields=['recipient', 'activity_id'], name='inbound_recipient_activity'),
+        ]
+
+
+class ReceivedActivity(models.Model):
+    """
+    The version of a post, comment or like a local inbox last accepted, so that
+    resending the same version is acknowledged without processing it again (see inbox_processing.py).
+    """
+    recipient = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='received_activities')
+    activity_id = models.URLField(max_length=255)  # FQID of the post, comment or like
+    content_hash = models.CharField(max_length=64)  # SHA-256 of the activity as received
+    received_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipient', 'activity_id'], name='unique_received_activity'),
+        ]
+
+    def __str__(self):
+        return f"{self.activity_id} for {self.recipient_id}"
@@ -0,0 +1,216 @@
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from .models import Node, NodeHealth
+import logging
+import requests
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+NODE_REQUEST_TIMEOUT = getattr(settings, 'NODE_REQUEST_TIMEOUT', 10)
+# Keep-alive connections kept open per host
+NODE_POOL_MAXSIZE = getattr(settings, 'NODE_POOL_MAXSIZE', 10)
+# Consecutive failures that open a node's circuit
+NODE_BREAKER_THRESHOLD = getattr(settings, 'NODE_BREAKER_THRESHOLD', 5)
+# Seconds an open circuit short-circuits calls before letting one trial request through
+NODE_BREAKER_RESET_TIMEOUT = getattr(settings, 'NODE_BREAKER_RESET_TIMEOUT', 60)
+# Weight of the newest request in the rolling latency and error rate
+NODE_HEALTH_SMOOTHING = 0.2
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling a node whose circuit is open."""
+
+    def __init__(self, node, retry_in):
+        super().__init__(f"Circuit open for {node.host}, retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Per-node health in this process: rolling latency and error rate plus a
+    closed/open/half-open circuit. Network errors and 5xx responses count as
+    failures, any other response proves the node is up.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'CLOSED', 'OPEN', 'HALF_OPEN'
+
+    def __init__(self, threshold=NODE_BREAKER_THRESHOLD, reset_timeout=NODE_BREAKER_RESET_TIMEOUT):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.latency_ms = None
+        self.error_rate = 0.0
+        self.last_error = ''
+        self.last_success_at = None
+        self.last_failure_at = None
+        self.lock = threading.Lock()
+
+    def before_request(self, node):
+        """Raise CircuitOpenError unless a request to node may go out now."""
+        with self.lock:
+            if self.state == self.OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(node, remaining)
+                self.state = self.HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self.trial_in_flight:
+                    raise CircuitOpenError(node, self.reset_timeout)
+                self.trial_in_flight = True
+
+    def record(self, ok, latency_ms=None, error=''):
+        with self.lock:
+            self.error_rate += NODE_HEALTH_SMOOTHING * ((0.0 if ok else 1.0) - self.error_rate)
+            if latency_ms is not None:
+                if self.latency_ms is None:
+                    self.latency_ms = latency_ms
+                else:
+                    self.latency_ms += NODE_HEALTH_SMOOTHING * (latency_ms - self.latency_ms)
+
+            self.trial_in_flight = False
+            if ok:
+                self.state = self.CLOSED
+                self.consecutive_failures = 0
+                self.last_success_at = timezone.now()
+                return
+
+            self.consecutive_failures += 1
+            self.last_error = error
+            self.last_failure_at = timezone.now()
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'latency_ms': self.latency_ms,
+                'error_rate': self.error_rate,
+                'last_error': self.last_error,
+                'last_success_at': self.last_success_at,
+                'last_failure_at': self.last_failure_at,
+            }
+
+
+def build_session(pool_maxsize=NODE_POOL_MAXSIZE):
+    """A requests session whose adapters keep connections alive between calls."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, pool_block=False)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.verify = False  # Peers commonly run with self-signed certificates
+    return session
+
+
+class NodeClient:
+    """
+    HTTP client for one remote node. Reuses pooled connections and
+    applies the node's credentials and the default timeout.
+    """
+
+    def __init__(self, node, breaker=None):
+        self.node = node
+        self.base_url = node.host.rstrip('/')
+        self.auth = (node.username, node.password)
+        self.session = build_session()
+        self.key = self.cache_key(node)
+        self.breaker = breaker or CircuitBreaker()
+
+    @staticmethod
+    def cache_key(node):
+        return (node.host, node.username, node.password)
+
+    def url(self, path):
+        """Absolute URL for path, which may already be absolute."""
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, authenticate=True, **kwargs):
+        """Send a request unless the node's circuit is open, and record how it went."""
+        kwargs.setdefault('timeout', NODE_REQUEST_TIMEOUT)
+        if authenticate:
+            kwargs.setdefault('auth', self.auth)
+
+        self.breaker.before_request(self.node)
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, self.url(path), **kwargs)
+        except Exception as e:
+            # Any error ends the request, a half-open trial included, or the circuit would never close again
+            self.breaker.record(False, error=str(e))
+            raise
+        latency_ms = (time.monotonic() - started) * 1000
+        if response.status_code >= 500:
+            self.breaker.record(False, latency_ms, f"HTTP {response.status_code}")
+        else:
+            self.breaker.record(True, latency_ms)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_shared_session = None
+
+
+def get_node_client(node):
+    """
+    The process-wide client for node, rebuilt when its host or credentials change.
+    """
+    with _clients_lock:
+        client = _clients.get(node.pk)
+        if client is None or client.key != NodeClient.cache_key(node):
+            if client is not None:
+                client.close()
+            # Health belongs to the node, it survives a credentials change
+            client = NodeClient(node, breaker=client.breaker if client else None)
+            _clients[node.pk] = client
+            logger.info(f"Opened connection pool for node {node.team_name} ({client.base_url})")
+        return client
+
+
+def close_node_clients():
+    """Close and forget every node client, health included."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def get_http_session():
+    """Pooled session for fetching arbitrary URLs that do not belong to a known node."""
+    global _shared_session
+    with _clients_lock:
+        if _shared_session is None:
+            _shared_session = build_session()
+        return _shared_session
+
+
+def save_node_health():
+    """
+    Write each node's in-process health to NodeHealth for the admin.
+    Call from the main thread of a worker, not from request-sending threads.
+    """
+    with _clients_lock:
+        snapshots = {node_id: client.breaker.snapshot() for node_id, client in _clients.items()}
+    for node_id in Node.objects.filter(id__in=snapshots).values_list('id', flat=True):
+        NodeHealth.objects.update_or_create(node_id=node_id, defaults=snapshots[node_id])
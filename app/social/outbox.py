@@ -0,0 +1,301 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from .inbox_fanout import run_pending_fanouts
+from .models import Node, OutboxItem
+from .node_client import CircuitOpenError, get_node_client, save_node_health
+from urllib.parse import urljoin, urlsplit
+import json
+import logging
+import random
+import requests
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds a claimed item may stay SENDING before another worker takes it over
+OUTBOX_CLAIM_TIMEOUT = getattr(settings, 'OUTBOX_CLAIM_TIMEOUT', 300)
+OUTBOX_REQUEST_TIMEOUT = getattr(settings, 'OUTBOX_REQUEST_TIMEOUT', 10)
+# Attempts before an item becomes a dead letter
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+# Seconds before the first retry, doubled after every further failure up to OUTBOX_RETRY_MAX
+OUTBOX_RETRY_BASE = getattr(settings, 'OUTBOX_RETRY_BASE', 30)
+OUTBOX_RETRY_MAX = getattr(settings, 'OUTBOX_RETRY_MAX', 6 * 60 * 60)
+
+# Client errors that may succeed later, every other 4xx is dead on arrival
+RETRYABLE_CLIENT_ERRORS = {408, 425, 429}
+# Answers to a batch request meaning the node no longer has a batch endpoint
+BATCH_UNSUPPORTED_STATUSES = {404, 405, 501}
+
+
+def inbox_url(node, author):
+    """The remote inbox of author on node."""
+    author_serial = author.fqid.rstrip('/').split('/')[-1]
+    return f"{node.host.rstrip('/')}/authors/{author_serial}/inbox"
+
+
+def enqueue(node, author, activity_type, activity):
+    """Queue activity for delivery to author's inbox on node. Does no network I/O."""
+    return enqueue_many({node: [author]}, activity_type, activity)[0]
+
+
+def enqueue_many(plan, activity_type, activity):
+    """
+    Queue activity for every author in plan, a {node: [author, ...]} mapping.
+    The activity is encoded once and every item shares the same body.
+    """
+    body = json.dumps(activity, cls=DjangoJSONEncoder)
+    items = OutboxItem.objects.bulk_create([
+        OutboxItem(node=node, url=inbox_url(node, author), activity_type=activity_type, body=body)
+        for node, authors in plan.items()
+        for author in authors
+    ])
+    logger.info(f"Queued {activity_type} for {len(items)} remote inboxes")
+    return items
+
+
+def claim_batch(limit):
+    """
+    Mark up to limit pending items as SENDING and return them.
+    Items left SENDING by a crashed worker are released first.
+    """
+    now = timezone.now()
+    OutboxItem.objects.filter(status='SENDING', claimed_at__lt=now - timedelta(seconds=OUTBOX_CLAIM_TIMEOUT)).update(status='PENDING')
+
+    with transaction.atomic():
+        # skip_locked lets several workers share the queue on Postgres, it is ignored on SQLite
+        ids = list(
+            OutboxItem.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        OutboxItem.objects.filter(id__in=ids).update(status='SENDING', claimed_at=now)
+
+    return list(OutboxItem.objects.filter(id__in=ids).select_related('node').order_by('next_attempt_at'))
+
+
+def retry_delay(attempts):
+    """
+    Seconds to wait after the given number of failed attempts: exponential,
+    capped, with half of it randomized so a recovering node is not hit in lockstep.
+    """
+    delay = min(OUTBOX_RETRY_BASE * 2 ** (attempts - 1), OUTBOX_RETRY_MAX)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def status_is_retryable(status_code):
+    if status_code in RETRYABLE_CLIENT_ERRORS:
+        return True
+    return not 400 <= status_code < 500
+
+
+def is_retryable(error):
+    response = getattr(error, 'response', None)
+    return response is None or status_is_retryable(response.status_code)
+
+
+def record_success(item):
+    item.status = 'DELIVERED'
+    item.delivered_at = timezone.now()
+    item.last_error = ''
+    item.save(update_fields=['status', 'attempts', 'last_error', 'delivered_at'])
+
+
+def record_failure(item, error, retryable):
+    """Schedule the next attempt of item with backoff, or make it a dead letter."""
+    item.last_error = str(error)
+    if item.attempts < OUTBOX_MAX_ATTEMPTS and retryable:
+        item.status = 'PENDING'
+        item.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(item.attempts))
+        logger.warning(f"Error delivering {item.activity_type} to {item.url} (attempt {item.attempts}), retrying at {item.next_attempt_at}: {error}")
+    else:
+        item.status = 'DEAD'
+        logger.error(f"Gave up delivering {item.activity_type} to {item.url} after {item.attempts} attempts: {error}")
+    item.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
+
+
+def postpone(items, error):
+    """Requeue items that were not sent because the node's circuit is open, without using an attempt."""
+    OutboxItem.objects.filter(id__in=[item.id for item in items]).update(
+        status='PENDING',
+        next_attempt_at=timezone.now() + timedelta(seconds=error.retry_in),
+    )
+
+
+def deliver(item):
+    """POST one claimed item to its remote inbox and record the outcome."""
+    client = get_node_client(item.node)
+    item.attempts += 1
+    try:
+        response = client.post(
+            item.url,
+            data=item.body.encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            timeout=OUTBOX_REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+    except CircuitOpenError as e:
+        postpone([item], e)
+        return False
+    except requests.exceptions.RequestException as e:
+        record_failure(item, e, is_retryable(e))
+        return False
+
+    record_success(item)
+    advertised = response.headers.get('X-Inbox-Batch')
+    batch_url = advertised and advertised_batch_url(item.node, item.url, advertised)
+    if batch_url:
+        # The peer advertised a batch endpoint, later deliveries use deliver_batch
+        if not item.node.supports_batch_inbox or item.node.batch_inbox_url != batch_url:
+            Node.objects.filter(pk=item.node.pk).update(supports_batch_inbox=True, batch_inbox_url=batch_url)
+            logger.info(f"Node {item.node.team_name} supports batch inbox delivery at {batch_url}")
+    return True
+
+
+def advertised_batch_url(node, item_url, advertised):
+    """
+    The batch endpoint a node advertised in X-Inbox-Batch, resolved against the inbox
+    it answered for. None unless it is on the node's own scheme and host, so a peer
+    cannot point our batches, and its credentials, at another server.
+    """
+    batch_url = urljoin(item_url, advertised)
+    if urlsplit(batch_url)[:2] != urlsplit(node.host)[:2]:
+        logger.warning(f"Ignoring batch inbox URL {batch_url} advertised by node {node.team_name}, it is not on {node.host}")
+        return None
+    return batch_url
+
+
+def drop_batch_support(node, items):
+    """
+    Stop batching for node, whose batch endpoint is gone, and requeue items without
+    using an attempt so that deliver() sends them one by one.
+    """
+    Node.objects.filter(pk=node.pk).update(supports_batch_inbox=False, batch_inbox_url='')
+    OutboxItem.objects.filter(id__in=[item.id for item in items]).update(status='PENDING', next_attempt_at=timezone.now())
+    logger.warning(f"Node {node.team_name} no longer accepts batch inbox delivery, sending items one by one")
+
+
+def batch_body(items):
+    """A batch inbox request body built from the items' stored JSON without re-encoding it."""
+    return '[' + ','.join(f'{{"recipient": {json.dumps(item.url)}, "activity": {item.body}}}' for item in items) + ']'
+
+
+def deliver_batch(node, items):
+    """
+    POST items, all bound for node, to its batch inbox endpoint in one request
+    and record each item's outcome. Returns the number delivered.
+    """
+    client = get_node_client(node)
+    for item in items:
+        item.attempts += 1
+    try:
+        response = client.post(
+            node.batch_inbox_url or 'inbox/batch/',
+            data=batch_body(items).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            timeout=OUTBOX_REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        results = response.json()['results']
+    except CircuitOpenError as e:
+        postpone(items, e)
+        return 0
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code in BATCH_UNSUPPORTED_STATUSES:
+            drop_batch_support(node, items)
+            return 0
+        for item in items:
+            record_failure(item, e, is_retryable(e))
+        return 0
+    except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+        retryable = is_retryable(e) if isinstance(e, requests.exceptions.RequestException) else True
+        for item in items:
+            record_failure(item, e, retryable)
+        return 0
+
+    delivered = 0
+    for index, item in enumerate(items):
+        result = results[index] if index < len(results) and isinstance(results[index], dict) else {}
+        result_status = result.get('status', 500)
+        if 200 <= result_status < 300:
+            record_success(item)
+            delivered += 1
+        else:
+            record_failure(item, f"HTTP {result_status}: {result.get('error', 'no result')}", status_is_retryable(result_status))
+    return delivered
+
+
+def replay_dead_letters(node=None, spacing=1.0, limit=None):
+    """
+    Queue dead letters, optionally only node's, for a fresh set of attempts.
+    Replays are spaced `spacing` seconds apart so the node gets a steady trickle.
+    Returns the number requeued.
+    """
+    dead = OutboxItem.objects.filter(status='DEAD').order_by('created')
+    if node is not None:
+        dead = dead.filter(node=node)
+    ids = list(dead.values_list('id', flat=True)[:limit])
+
+    now = timezone.now()
+    with transaction.atomic():
+        for position, item_id in enumerate(ids):
+            OutboxItem.objects.filter(id=item_id, status='DEAD').update(
+                status='PENDING',
+                attempts=0,
+                next_attempt_at=now + timedelta(seconds=position * spacing),
+            )
+    logger.info(f"Requeued {len(ids)} dead letters{f' for {node}' if node else ''}")
+    return len(ids)
+
+
+def _in_thread(function, *args):
+    try:
+        return function(*args)
+    finally:
+        # Worker threads get their own DB connection, do not leak it
+        connection.close()
+
+
+def deliver_claimed(executor, items):
+    """
+    Deliver claimed items on executor: one batch request per node that
+    supports batch inboxes, one request per item otherwise.
+    """
+    batches = defaultdict(list)
+    futures = []
+    for item in items:
+        if item.node.supports_batch_inbox:
+            batches[item.node].append(item)
+        else:
+            futures.append(executor.submit(_in_thread, deliver, item))
+    for node, node_items in batches.items():
+        futures.append(executor.submit(_in_thread, deliver_batch, node, node_items))
+    return sum(int(future.result()) for future in futures)
+
+
+def run_worker(concurrency=4, batch_size=50, poll_interval=2.0, once=False):
+    """
+    Deliver queued items with at most `concurrency` requests in flight,
+    and write the inbox rows of queued local fan-outs.
+    With once=True, drain what is currently queued and return the number delivered.
+    """
+    delivered = 0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='federation') as executor:
+        while True:
+            fanouts = run_pending_fanouts()
+            items = claim_batch(batch_size)
+            if items:
+                delivered += deliver_claimed(executor, items)
+                save_node_health()
+                continue
+            if fanouts:
+                continue
+            if once:
+                return delivered
+            time.sleep(poll_interval)
@@ -0,0 +1,59 @@
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+import base64
+import binascii
+import uuid
+
+
+# Posts rendered per page of the HTML streams
+STREAM_PAGE_SIZE = getattr(settings, 'STREAM_PAGE_SIZE', 20)
+
+
+def encode_cursor(published, item_id):
+    """Opaque cursor pointing just after the (published, id) row."""
+    raw = f"{published.isoformat()}|{item_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns (published, id) for a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        published, item_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        return datetime.fromisoformat(published), uuid.UUID(item_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def paginate_by_cursor(queryset, cursor, page_size=STREAM_PAGE_SIZE, published_field='published', id_field='id'):
+    """
+    Keyset pagination over (published, id), newest first.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    The cost of a page does not depend on how deep into the feed it is.
+    """
+    queryset = queryset.order_by(f'-{published_field}', f'-{id_field}')
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        published, last_id = position
+        queryset = queryset.filter(
+            Q(**{f'{published_field}__lt': published}) |
+            Q(**{published_field: published, f'{id_field}__lt': last_id})
+        )
+
+    # Fetch one extra row to know whether there is a next page
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, published_field), getattr(last, id_field))
+
+    return items, next_cursor
+
+
+def is_fragment_request(request):
+    """True for the htmx requests that load the next page of a stream."""
+    return request.headers.get('HX-Request') == 'true'
@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from .json_stream import accepts_json
+from .post_images import image_file
+from .serializers import SinglePostSerializer, embedded_collections, query_params
+import hashlib
+import json
+import uuid
+
+
+# Seconds a serialized post is kept. Saves, likes and comments retire it sooner (see signals.py).
+POST_CACHE_TTL = getattr(settings, 'POST_CACHE_TTL', 300)
+
+# Cached public bodies are served without an access check, so every process, the
+# run_inbox_worker and run_federation_worker commands included, must see every invalidation.
+# A per-process local-memory cache cannot promise that, the post cache is off with it.
+POST_CACHE_ENABLED = getattr(settings, 'POST_CACHE_ENABLED', not isinstance(caches['default'], LocMemCache))
+
+# Query parameters that change what a post serializes to, requests using them bypass the cache
+REPRESENTATION_PARAMS = ('include', 'embed', 'fields', 'omit')
+
+
+def version_key(post_id):
+    return f"post_repr_version:{post_id}"
+
+
+def fqid_key(fqid):
+    return f"post_repr_fqid:{hashlib.sha256(fqid.encode('utf-8')).hexdigest()}"
+
+
+def invalidate(*post_ids):
+    """
+    Retire the cached representations of post_ids by giving them a new version.
+    The old entries are never read again and expire on their own.
+    """
+    if post_ids and POST_CACHE_ENABLED:
+        cache.set_many({version_key(post_id): uuid.uuid4().hex for post_id in post_ids}, None)
+
+
+def cached(post_id):
+    """The cached entry of post_id, a dict of its visibility, author_id, fqid and JSON body, or None."""
+    if not POST_CACHE_ENABLED:
+        return None
+    version = cache.get(version_key(post_id))
+    if version is None:
+        return None
+    return cache.get(f"post_repr:{post_id}:{version}")
+
+
+def cached_public(post_id=None, fqid=None):
+    """The cached entry of a public post given its id or FQID, or None. Costs no database query."""
+    if post_id is None:
+        post_id = cache.get(fqid_key(fqid))
+        if post_id is None:
+            return None
+    entry = cached(post_id)
+    if entry is None or entry['visibility'] != 'PUBLIC' or (fqid is not None and entry['fqid'] != fqid):
+        return None
+    return entry
+
+
+def store(post, request):
+    if not POST_CACHE_ENABLED:
+        return serialized(post, request)
+
+    # The version is read before serializing, so an edit made meanwhile leaves this entry unreachable
+    key = version_key(post.id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+
+    entry = serialized(post, request)
+    # Image posts would fill the cache with their base64 bodies, they are streamed instead
+    if image_file(post) is None:
+        cache.set_many({f"post_repr:{post.id}:{version}": entry, fqid_key(post.fqid): post.id}, POST_CACHE_TTL)
+    return entry
+
+
+def serialized(post, request):
+    data = SinglePostSerializer(post, context={'request': request}).data
+    return {
+        'visibility': post.visibility,
+        'author_id': str(post.author_id),
+        'fqid': post.fqid,
+        'body': JSONRenderer().render(data),
+    }
+
+
+def representation(post, request):
+    """The JSON bytes of post's default representation, serialized at most once per version."""
+    entry = cached(post.id)
+    if entry is None:
+        entry = store(post, request)
+    return entry['body']
+
+
+def data(post, request):
+    """post's default representation as a dict, for callers that embed it in a larger response."""
+    return json.loads(representation(post, request))
+
+
+def is_default_representation(request):
+    """True if request asks for the representation that is cached: slim, all fields."""
+    params = query_params(request)
+    return not embedded_collections({}) and not any(param in params for param in REPRESENTATION_PARAMS)
+
+
+def can_serve(request):
+    """True if the cached JSON bytes can be the response to request as they are."""
+    return accepts_json(request) and is_default_representation(request)
+
+
+def response(body):
+    return HttpResponse(body, content_type='application/json')
@@ -0,0 +1,97 @@
+from contextlib import suppress
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from .json_stream import FileString
+import base64
+import logging
+import os
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CONTENT_TYPES = ('image/png;base64', 'image/jpeg;base64', 'application/base64')
+
+# 'inline' puts the base64 body of image posts into their JSON, as peers expect.
+# 'reference' sends the URL of the image instead.
+POST_IMAGE_CONTENT = getattr(settings, 'POST_IMAGE_CONTENT', 'inline')
+
+# Bytes encoded per step, a multiple of 3 so the encoded pieces join without padding
+ENCODE_CHUNK_SIZE = 3 * 64 * 1024
+
+
+def image_file(post):
+    """Full path of the media file an image post's content points to, or None if the post holds its image inline."""
+    content = post.content or ''
+    if post.contentType not in IMAGE_CONTENT_TYPES or content.startswith('data:'):
+        return None
+    if not (content.startswith('/media/') or content.startswith('media/') or '/' in content):
+        return None
+
+    file_path = content.replace("%20", "_").replace(" ", "_")
+    if file_path.startswith('/media/'):
+        file_path = file_path[len('/media/'):]
+    elif file_path.startswith('media/'):
+        file_path = file_path[len('media/'):]
+
+    # Content comes from peers too, it must not point outside MEDIA_ROOT
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, file_path)
+    except SuspiciousFileOperation:
+        logger.warning(f"Image path outside MEDIA_ROOT: {content}")
+        return None
+    if not os.path.isfile(full_path):
+        logger.error(f"Image file not found: {full_path}")
+        return None
+    return full_path
+
+
+def encoded_file(path):
+    """
+    Path of the stored base64 encoding of the image at path. It is written next to
+    the image on first use and again when the image changes. None if it cannot be written.
+    """
+    encoded = f"{path}.b64"
+    with suppress(OSError):
+        if os.path.getmtime(encoded) >= os.path.getmtime(path):
+            return encoded
+
+    partial = f"{encoded}.{uuid.uuid4().hex}.partial"
+    try:
+        with open(path, 'rb') as source, open(partial, 'wb') as target:
+            for chunk in iter(lambda: source.read(ENCODE_CHUNK_SIZE), b''):
+                target.write(base64.b64encode(chunk))
+        os.replace(partial, encoded)
+    except OSError as e:
+        logger.error(f"Could not store the base64 encoding of {path}: {e}")
+        with suppress(OSError):
+            os.remove(partial)
+        return None
+    return encoded
+
+
+def image_content(post, context):
+    """
+    What the content of an image post stored as a media file serializes to, or None
+    for other posts. That is the image URL in reference mode, else its base64 body:
+    a FileString to be streamed when context['stream_images'] is set, else a str.
+    """
+    path = image_file(post)
+    if path is None:
+        return None
+
+    if POST_IMAGE_CONTENT == 'reference':
+        url = settings.MEDIA_URL + os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        request = context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    encoded = encoded_file(path)
+    if encoded is None:
+        # The media directory is read-only, encode in memory
+        with open(path, 'rb') as image:
+            return base64.b64encode(image.read()).decode('ascii')
+    if context.get('stream_images'):
+        return FileString(encoded)
+    with open(encoded, 'r', encoding='ascii') as f:
+        return f.read()
@@ -0,0 +1,29 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from .models import Comment, Like, Post
+
+
+def count_subquery(queryset, group_field):
+    """Correlated COUNT(*) subquery over queryset grouped by group_field, 0 when empty."""
+    counts = queryset.order_by().values(group_field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def like_count_subquery(model):
+    """Number of likes on the outer row of model (Post or Comment)."""
+    content_type = ContentType.objects.get_for_model(model)
+    return count_subquery(Like.objects.filter(content_type=content_type, object_id=OuterRef('pk')), 'object_id')
+
+
+def post_cards(queryset=None):
+    """
+    Everything a post card template needs, in a fixed number of queries:
+    the author is joined and comments are prefetched with their authors.
+    Like and comment counts are the denormalized columns on Post and Comment.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+
+    comments = Comment.objects.select_related('author')
+    return queryset.select_related('author').prefetch_related(Prefetch('post_comments', queryset=comments))
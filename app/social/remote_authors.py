@@ -0,0 +1,179 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from urllib.parse import quote
+from .models import Author, Node, RemoteDirectoryState, clean_url
+from .node_client import get_node_client, save_node_health
+import logging
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+# Total seconds one directory refresh may spend waiting on remote nodes
+REMOTE_DIRECTORY_BUDGET = getattr(settings, 'REMOTE_DIRECTORY_BUDGET', 30.0)
+REMOTE_SEARCH_WORKERS = getattr(settings, 'REMOTE_SEARCH_WORKERS', 8)
+
+# Author columns a refresh overwrites on authors that are already cached
+DIRECTORY_FIELDS = ['display_name', 'profile_image_url', 'host', 'github', 'profile_url', 'search_text']
+
+# Shared so concurrent refreshes cannot spawn unbounded threads
+_executor = ThreadPoolExecutor(max_workers=REMOTE_SEARCH_WORKERS, thread_name_prefix='remote-search')
+
+# not_modified is True when the node answered 304 to a conditional GET
+Listing = namedtuple('Listing', ['not_modified', 'authors', 'etag', 'last_modified'])
+
+
+def authors_request(node):
+    """(path, kwargs) of the author listing request each peer expects."""
+    if node.team_name == "dodger-blue":
+        return 'authors', {'authenticate': False}
+    if node.team_name == "salmon":
+        return 'authors/', {'authenticate': False}
+    if node.team_name == "bisque":
+        return 'authors/?size=100', {'authenticate': False}
+    return 'authors/', {}
+
+
+def fetch_node_authors(node, timeout, etag='', last_modified=''):
+    """
+    The Listing of node's authors, or None if the node could not be read.
+    Runs on a worker thread so it only does HTTP and JSON decoding, never database access.
+    """
+    path, kwargs = authors_request(node)
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    client = get_node_client(node)
+    logger.info(f"node_url = {client.url(path)}")
+    try:
+        response = client.get(path, timeout=timeout, headers=headers, **kwargs)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Request error from {node.host}: {e}")
+        return None
+
+    if response.status_code == 304:
+        return Listing(True, [], etag, last_modified)
+    if response.status_code != 200:
+        logger.error(f"Author listing of {node.host} returned {response.status_code}")
+        return None
+
+    try:
+        data = response.json() if response.content.strip() else {}
+    except ValueError as e:
+        logger.error(f"Invalid JSON response from {node.host}: {e}")
+        return None
+
+    authors = data.get('authors', []) if isinstance(data, dict) else []
+    return Listing(
+        False,
+        [author for author in authors if isinstance(author, dict)],
+        response.headers.get('ETag', ''),
+        response.headers.get('Last-Modified', ''),
+    )
+
+
+def fetch_remote_authors(states, budget=None):
+    """
+    Fetch the listings of every state's node concurrently and return
+    (state, listing) pairs for the nodes that answered within budget seconds.
+    Slower nodes are skipped and picked up by the next refresh.
+    """
+    if budget is None:
+        budget = REMOTE_DIRECTORY_BUDGET
+    futures = {
+        _executor.submit(fetch_node_authors, state.node, budget, state.etag, state.last_modified): state
+        for state in states
+    }
+    done, not_done = wait(futures, timeout=budget)
+
+    for future in not_done:
+        future.cancel()
+        logger.warning(f"Skipped {futures[future].node.host}: no answer within {budget}s")
+
+    results = []
+    for future in done:
+        state = futures[future]
+        try:
+            listing = future.result()
+        except Exception as e:
+            logger.error(f"Error fetching authors from {state.node.host}: {e}")
+            continue
+        if listing is not None:
+            results.append((state, listing))
+    return results
+
+
+def directory_author(author_data):
+    """An unsaved Author for one entry of a remote listing, or None if it has no id."""
+    fqid = author_data.get('id')
+    if not fqid or not isinstance(fqid, str):
+        return None
+
+    # bulk_create bypasses Author.save(), so fill in what it would derive
+    author = Author(
+        fqid=fqid,
+        fqid_encoded=quote(fqid),
+        display_name=author_data.get('displayName'),
+        profile_image_url=clean_url(author_data.get('profileImage') or ''),
+        host=author_data.get('host') or '',
+        github=author_data.get('github') or None,
+        profile_url=author_data.get('page') or author_data.get('profile_url'),
+    )
+    if not author.profile_url:
+        author.profile_url = f"{author.host}authors/{author.id}/".replace('api/', '')
+    author.refresh_search_fields()
+    return author
+
+
+def upsert_authors(author_dicts):
+    """Insert or update the listed authors with one bulk statement. Returns the number written."""
+    local_host = f"http://{settings.CURRENT_DOMAIN}/api/"
+
+    # One row per fqid, a conflicting upsert may not touch the same row twice
+    authors = {}
+    for author_data in author_dicts:
+        author = directory_author(author_data)
+        if author is not None and author.host != local_host:
+            authors[author.fqid] = author
+
+    Author.objects.bulk_create(
+        authors.values(),
+        update_conflicts=True,
+        unique_fields=['fqid'],
+        update_fields=DIRECTORY_FIELDS,
+        batch_size=500,
+    )
+    return len(authors)
+
+
+def refresh_directory(force=False, budget=None):
+    """
+    Refresh the cached author list of every active node whose TTL has run out,
+    or of every active node with force=True. Returns the number of authors written.
+    """
+    now = timezone.now()
+    states = []
+    for node in Node.objects.filter(is_active=True):
+        state, _ = RemoteDirectoryState.objects.get_or_create(node=node)
+        if force or state.is_stale(now):
+            states.append(state)
+
+    written = 0
+    for state, listing in fetch_remote_authors(states, budget):
+        with transaction.atomic():
+            if not listing.not_modified:
+                state.author_count = upsert_authors(listing.authors)
+                written += state.author_count
+                state.etag = listing.etag
+                state.last_modified = listing.last_modified
+            state.refreshed_at = timezone.now()
+            state.save()
+        logger.info(f"Refreshed author directory of {state.node.host} ({'not modified' if listing.not_modified else state.author_count})")
+    save_node_health()
+    return written
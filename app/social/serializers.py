@@ -1,9 +1,14 @@
+from collections import defaultdict
 from rest_framework import serializers
 from .models import Author, Post, FollowRequest, Comment, Like
+from .counters import recount_likes
+from .post_images import IMAGE_CONTENT_TYPES, image_content
 from markdown import markdown
 from django.conf import settings
 from rest_framework.pagination import PageNumberPagination
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 import os
 from django.core.files import File
 from django.utils.html import strip_tags
@@ -17,6 +22,48 @@ from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Posts carry only references and counts for their comments and likes unless the client
+# asks for them with ?include=comments,likes. Set to False to always embed both.
+# Pushes to peers follow the node's embed_collections flag, see federation_context.
+SLIM_POST_PAYLOADS = getattr(settings, 'SLIM_POST_PAYLOADS', True)
+EMBEDDABLE_COLLECTIONS = {'comments', 'likes'}
+
+def embedded_collections(context):
+    """The collections (comments, likes) to serialize in full, from context['include'] or ?include= (alias ?embed=)."""
+    if 'include' in context:
+        return set(context['include'])
+    params = query_params(context.get('request'))
+    for param in ('include', 'embed'):
+        if param in params:
+            return set(split_param(params[param])) & EMBEDDABLE_COLLECTIONS
+    return set() if SLIM_POST_PAYLOADS else set(EMBEDDABLE_COLLECTIONS)
+
+def query_params(request):
+    return getattr(request, 'query_params', None) or getattr(request, 'GET', None) or {}
+
+def split_param(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+def sparse_fieldsets(request):
+    """The fields= and omit= of request as keyword arguments for a SparseFieldsMixin serializer."""
+    params = query_params(request)
+    return {name: split_param(params[name]) for name in ('fields', 'omit') if params.get(name)}
+
+def collection_reference(obj, name, count):
+    """A comments or likes object that points to the collection of obj instead of embedding it."""
+    return {'type': name, 'id': f"{obj.fqid}/{name}", 'count': count}
+
+def is_embedded(collection):
+    """True if a received comments or likes object lists its items, False for a reference to them."""
+    return isinstance(collection, dict) and 'src' in collection
+
+def federation_context(request, node):
+    """
+    Serializer context for activities pushed to node. Comments and likes are embedded
+    unless the node fetches the referenced collections itself (embed_collections off).
+    """
+    return {'request': request, 'include': EMBEDDABLE_COLLECTIONS if node.embed_collections else set()}
+
 def get_default_profile_image():
     """Return the path to the default profile image"""
     return 'static/images/default-profile.png'
@@ -47,6 +94,82 @@ def clean_url(url):
     
     return url
 
+class IdentityMap:
+    """
+    Objects and page slices resolved while serializing one response. Nested
+    serializers share it through their context, so a post, comment or like
+    page is fetched once however many serializers need it.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.pages = {}
+
+    def add(self, obj):
+        self.objects[(ContentType.objects.get_for_model(obj).id, obj.pk)] = obj
+        return obj
+
+    def get(self, content_type_id, pk):
+        """The object of that type and pk, fetched only if nothing in this response resolved it yet."""
+        key = (content_type_id, pk)
+        if key not in self.objects:
+            self.objects[key] = ContentType.objects.get_for_id(content_type_id).get_object_for_this_type(pk=pk)
+        return self.objects[key]
+
+    def paginate(self, key, queryset, request):
+        """(page of queryset, page number) for request, evaluated once per key."""
+        if key not in self.pages:
+            paginator = SrcPagination()
+            page = paginator.paginate_queryset(queryset, request)
+            for obj in page or ():
+                self.add(obj)
+            self.pages[key] = (page, paginator.page.number if page is not None else 1)
+        return self.pages[key]
+
+    def prefetch_likes(self, objects, page_number, request):
+        """
+        Load the likes page of every one of objects, all of one model, with one query
+        and store it where MultiLikeSerializer looks for it. Each object's likes are
+        numbered in SQL so only the rows of the requested page are fetched.
+        """
+        if not objects:
+            return
+        content_type = ContentType.objects.get_for_model(objects[0])
+        size = SrcPagination().get_page_size(request)
+        start = (page_number - 1) * size
+        page = (
+            Like.objects.filter(content_type=content_type, object_id__in=[obj.pk for obj in objects])
+            .annotate(row=Window(RowNumber(), partition_by=F('object_id'), order_by=F('published').desc()))
+            .filter(row__gt=start, row__lte=start + size)
+            .select_related('author')
+        )
+        likes = defaultdict(list)
+        for like in page:
+            likes[like.object_id].append(like)
+
+        for obj in objects:
+            self.pages.setdefault(('likes', content_type.id, obj.pk), (likes[obj.pk], page_number))
+
+
+def identity_map(context):
+    return context.setdefault('identity_map', IdentityMap())
+
+
+class SparseFieldsMixin:
+    """
+    Lets a serializer be narrowed to fields= or have omit= fields left out.
+    Only the top level serializer is narrowed. Left out fields are never
+    evaluated, so their queries and encoding are skipped as well.
+    """
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in omit or ():
+            self.fields.pop(name, None)
+
 class ReadWriteSerializerField(serializers.Field):
     """Custom field that handles both read and write operations with different serializers"""
     
@@ -254,7 +377,7 @@ class SingleAuthorSerializer(serializers.ModelSerializer):
         return author
 
 
-class SingleLikeSerializer(serializers.ModelSerializer):
+class SingleLikeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     id = serializers.CharField(source='fqid')
     object = serializers.SerializerMethodField()
     type = serializers.SerializerMethodField()
@@ -279,10 +402,8 @@ class SingleLikeSerializer(serializers.ModelSerializer):
         return "like"
 
     def get_object(self, obj):
-        # Get the content type and looked up the related model
-        content_type = ContentType.objects.get_for_id(obj.content_type_id)
-        # Get the actual object instance (Post or Comment)
-        liked_object = content_type.get_object_for_this_type(id=obj.object_id)
+        # The liked Post or Comment, usually already resolved by the serializer listing the likes
+        liked_object = identity_map(self.context).get(obj.content_type_id, obj.object_id)
         # Return the fqid of that object
         return liked_object.fqid
     
@@ -408,7 +529,7 @@ class SingleFollowRequestSerializer(serializers.ModelSerializer):
 
 
 # Multi Serializers
-class MultiLikeSerializer(serializers.ModelSerializer):
+class MultiLikeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     id = serializers.CharField(source='fqid')
     type = serializers.SerializerMethodField()
     page = serializers.CharField(source='fqid')
@@ -433,12 +554,15 @@ class MultiLikeSerializer(serializers.ModelSerializer):
     def get_type(self, obj):
         return "likes"
 
+    def like_page(self, obj):
+        content_type = ContentType.objects.get_for_model(obj)
+        likes = Like.objects.filter(object_id=obj.id, content_type=content_type).select_related('author')
+        objects = identity_map(self.context)
+        objects.add(obj)
+        return objects.paginate(('likes', content_type.id, obj.pk), likes, self.context.get('request'))
+
     def get_page_number(self, obj):
-        request = self.context.get('request')
-        paginator = SrcPagination()
-        likes = Like.objects.filter(object_id=obj.id, content_type=ContentType.objects.get_for_model(obj))
-        page = paginator.paginate_queryset(likes, request)
-        return paginator.page.number if page is not None else 1
+        return self.like_page(obj)[1]
 
     def get_size(self, obj):
         request = self.context.get('request')
@@ -446,15 +570,15 @@ class MultiLikeSerializer(serializers.ModelSerializer):
         return paginator.get_page_size(request)
 
     def get_count(self, obj):
+        # Posts and comments carry a denormalized counter
+        if isinstance(obj, (Post, Comment)):
+            return obj.like_count
         likes = Like.objects.filter(object_id=obj.id, content_type=ContentType.objects.get_for_model(obj))
         return likes.count()
 
     def get_src(self, obj):
-        request = self.context.get('request')
-        paginator = SrcPagination()
-        likes = Like.objects.filter(object_id=obj.id, content_type=ContentType.objects.get_for_model(obj))
-        page = paginator.paginate_queryset(likes, request)
-        serializer = SingleLikeSerializer(page, many=True)
+        page = self.like_page(obj)[0]
+        serializer = SingleLikeSerializer(page, many=True, context=self.context)
         return serializer.data
     
     def is_valid(self, raise_exception=False, skip_validation=False):
@@ -491,7 +615,7 @@ class MultiLikeSerializer(serializers.ModelSerializer):
     
 
 
-class SingleCommentSerializer(serializers.ModelSerializer):
+class SingleCommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializes a list of comments, paginated.
     Includes the author, and likes for each comment.
@@ -527,7 +651,9 @@ class SingleCommentSerializer(serializers.ModelSerializer):
         return "comment"
 
     def get_likes(self, obj):
-        comment = get_object_or_404(Comment, fqid=obj.fqid)
+        if 'likes' not in embedded_collections(self.context):
+            return collection_reference(obj, 'likes', obj.like_count)
+        comment = obj if isinstance(obj, Comment) else get_object_or_404(Comment, fqid=obj.fqid)
         likes_serializer = MultiLikeSerializer(comment, context=self.context)
         return likes_serializer.data
 
@@ -586,11 +712,15 @@ class SingleCommentSerializer(serializers.ModelSerializer):
 
         likes_data = validated_data.get('likes', {})
 
+        # A reference says nothing about which likes exist, keep the ones stored
+        if not is_embedded(likes_data):
+            return comment
 
         likes_serializer = MultiLikeSerializer(data=likes_data, context={'request': self.context['request'], 'parent_object': comment})
         if likes_serializer.is_valid(skip_validation=True):
             likes = likes_serializer.save()
             comment.likes.set(likes)
+            recount_likes(comment)
         else:
             logger.error("Invalid data SingleCommentSerializer -> MultiLikeSerializer: ",likes_serializer.errors)
 
@@ -605,7 +735,7 @@ class SingleCommentDeSerializer(serializers.ModelSerializer):
 
 
 
-class MultiCommentSerializer(serializers.ModelSerializer):
+class MultiCommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializes a list of comments, paginated.
     Includes the author, and likes for each comment.
@@ -644,18 +774,21 @@ class MultiCommentSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri()
         return None
 
+    def comment_page(self, obj):
+        if isinstance(obj, Author):
+            comments = Comment.objects.filter(author=obj)
+        elif isinstance(obj, Post):
+            comments = Comment.objects.filter(post=obj)
+        else:
+            comments = Comment.objects.none()
+        comments = comments.select_related('author', 'post')
+        key = ('comments', type(obj).__name__, getattr(obj, 'pk', None))
+        return identity_map(self.context).paginate(key, comments, self.context['request'])
+
     def get_page_number(self, obj):
         request = self.context.get('request', None)
         if request:
-            paginator = SrcPagination()
-            if isinstance(obj, Author):
-                comments = Comment.objects.filter(author=obj)
-            elif isinstance(obj, Post):
-                comments = Comment.objects.filter(post=obj)
-            else:
-                comments = Comment.objects.none()
-            page = paginator.paginate_queryset(comments, request)
-            return paginator.page.number if page is not None else 1
+            return self.comment_page(obj)[1]
         return None
 
     def get_size(self, obj):
@@ -666,10 +799,10 @@ class MultiCommentSerializer(serializers.ModelSerializer):
         return None
 
     def get_count(self, obj):
+        if isinstance(obj, Post):
+            return obj.comment_count
         if isinstance(obj, Author):
             comments = Comment.objects.filter(author=obj)
-        elif isinstance(obj, Post):
-            comments = Comment.objects.filter(post=obj)
         else:
             comments = Comment.objects.none()
         return comments.count()
@@ -677,15 +810,11 @@ class MultiCommentSerializer(serializers.ModelSerializer):
     def get_src(self, obj):
         request = self.context.get('request', None)
         if request:
-            paginator = SrcPagination()
-            if isinstance(obj, Author):
-                comments = Comment.objects.filter(author=obj)
-            elif isinstance(obj, Post):
-                comments = Comment.objects.filter(post=obj)
-            else:
-                comments = Comment.objects.none()
-            page = paginator.paginate_queryset(comments, request)
-            serializer = SingleCommentSerializer(page, many=True, context={'request': request})
+            page, page_number = self.comment_page(obj)
+            if 'likes' in embedded_collections(self.context):
+                # One query for the likes of the whole page instead of one per comment
+                identity_map(self.context).prefetch_likes(page, page_number, request)
+            serializer = SingleCommentSerializer(page, many=True, context=self.context)
             return serializer.data
         return None
     
@@ -716,7 +845,7 @@ class MultiCommentSerializer(serializers.ModelSerializer):
 
 
 
-class SinglePostSerializer(serializers.ModelSerializer):
+class SinglePostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     id = serializers.CharField(source='fqid')
     page = serializers.CharField(source='post_url')
     type = serializers.SerializerMethodField()
@@ -752,84 +881,39 @@ class SinglePostSerializer(serializers.ModelSerializer):
         # Get the default serialized data
         data = super().to_representation(instance)
 
-        
+        # Sparse fieldsets may leave the content out, then there is no image to read
+        if 'content' not in data:
+            return data
 
         # If the content type is text/markdown, strip HTML tags from the content
         if instance.contentType == 'text/markdown':
             data['content'] = strip_tags(instance.content)
         
 
-        # Got the rest of this function from chat GPT
-        # Handle all image types
-        elif instance.contentType in ['image/png;base64', 'image/jpeg;base64', 'application/base64']:
-
-            # Only process if content appears to be a file path and not already base64
-            if (instance.content.startswith('/media/') or 
-                instance.content.startswith('media/') or 
-                '/' in instance.content) and not instance.content.startswith('data:'):
-                
-                try:
-                    # Get file path
-                    file_path = instance.content.replace("%20", "_").replace(" ", "_")
-                    if file_path.startswith('/media/'):
-                        file_path = file_path[len('/media/'):]
-                    elif file_path.startswith('media/'):
-                        file_path = file_path[len('media/'):]
-                    
-                    # Construct full path
-                    full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-                    
-                    # Determine MIME type
-                    if instance.contentType == 'image/png;base64':
-                        mime_type = 'image/png'
-                    elif instance.contentType == 'image/jpeg;base64':
-                        mime_type = 'image/jpeg'
-                    else:  # application/base64
-                        # Try to determine from file extension
-                        _, ext = os.path.splitext(full_path)
-                        if ext.lower() in ['.png']:
-                            mime_type = 'image/png'
-                        elif ext.lower() in ['.jpg', '.jpeg']:
-                            mime_type = 'image/jpeg'
-                        else:
-                            mime_type = 'application/octet-stream'
-                    
-                    # Check if file exists
-                    if os.path.exists(full_path):
-                        with open(full_path, 'rb') as image_file:
-                            binary_data = image_file.read()
-                            base64_data = base64.b64encode(binary_data).decode('utf-8')
-                            #data['content'] = f"data:{mime_type};base64,{base64_data}"
-                            data['content'] = f"{base64_data}"
-                    else:
-                        # Log that file wasn't found
-                        import logging
-                        logger = logging.getLogger(__name__)
-                        logger.error(f"Image file not found: {full_path}")
-                
-                except Exception as e:
-                    # Log the error but don't break serialization
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.error(f"Error converting image to base64: {str(e)}")
-                    # Keep original content if conversion fails
+        # Image posts stored as media files carry their base64 body, read from the stored encoding
+        elif instance.contentType in IMAGE_CONTENT_TYPES:
+            content = image_content(instance, self.context)
+            if content is not None:
+                data['content'] = content
         
         return data
 
     # Queries local Comments and includes comments from the JSON input
     def get_comments(self, obj):
-        request = self.context.get('request')
-        post = get_object_or_404(Post, fqid=obj.fqid)
-        serialized_comments = MultiCommentSerializer(post, context={'request': request}).data
+        if 'comments' not in embedded_collections(self.context):
+            return collection_reference(obj, 'comments', obj.comment_count)
+        post = obj if isinstance(obj, Post) else get_object_or_404(Post, fqid=obj.fqid)
+        serialized_comments = MultiCommentSerializer(post, context=self.context).data
         if hasattr(obj, 'comments_data'):
             serialized_comments.extend(obj.comments_data)
         return serialized_comments
 
     # Queries local PostLikes and includes likes from the JSON input
     def get_likes(self, obj):
-        request = self.context.get('request')
-        post = get_object_or_404(Post, fqid=obj.fqid)
-        serialized_likes = MultiLikeSerializer(post, context={'request': request}).data
+        if 'likes' not in embedded_collections(self.context):
+            return collection_reference(obj, 'likes', obj.like_count)
+        post = obj if isinstance(obj, Post) else get_object_or_404(Post, fqid=obj.fqid)
+        serialized_likes = MultiLikeSerializer(post, context=self.context).data
         if hasattr(obj, 'likes_data'):
             serialized_likes.extend(obj.likes_data)
         return serialized_likes
@@ -875,14 +959,18 @@ class SinglePostSerializer(serializers.ModelSerializer):
         comments_raw_data = validated_data.get('comments', {})
         likes_raw_data = validated_data.get('likes', {})
 
-        comments = MultiCommentSerializer(data=comments_raw_data, context={'request': self.context['request']})
-        if comments.is_valid(skip_validation=True):
-            comments = comments.save()
-
-        likes = MultiLikeSerializer(data=likes_raw_data, context={'request': self.context['request'], 'parent_object': post})
-        if likes.is_valid(skip_validation=True):
-            likes = likes.save()
-            post.likes.set(likes)
+        # Slim payloads carry references instead of the collections, those leave the stored ones alone
+        if is_embedded(comments_raw_data):
+            comments = MultiCommentSerializer(data=comments_raw_data, context={'request': self.context['request']})
+            if comments.is_valid(skip_validation=True):
+                comments = comments.save()
+
+        if is_embedded(likes_raw_data):
+            likes = MultiLikeSerializer(data=likes_raw_data, context={'request': self.context['request'], 'parent_object': post})
+            if likes.is_valid(skip_validation=True):
+                likes = likes.save()
+                post.likes.set(likes)
+                recount_likes(post)
 
         post.save()
 
@@ -1,9 +1,14 @@
 from .models import *
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save, post_delete
+from django.db import connections
+from django.db.models.signals import post_init, post_save, post_delete, post_migrate
 from django.dispatch import receiver
 from django.apps import AppConfig
+from .timeline import fanout_post, refresh_viewer_for_author, backfill_timeline
+from .counters import adjust_like_count, adjust_comment_count
+from .author_search import install_search_index
+from . import post_cache
 
 
 
@@ -32,8 +37,24 @@ def create_user_author(sender, instance, created, **kwargs):
 
         
 @receiver(post_save, sender=User)
-def save_user_author(sender, instance, **kwargs):
-    instance.author.save
+def save_user_author(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the author's search fields in step with the username."""
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    try:
+        author = instance.author
+    except Author.DoesNotExist:
+        return
+    author.refresh_search_fields()
+    author.save(update_fields=['search_text', 'is_api_account', 'is_test_account'])
+
+
+@receiver(post_migrate)
+def install_author_search_index(sender, using, **kwargs):
+    """Re-create the SQLite search triggers, which rebuilding social_author in a migration drops."""
+    db = connections[using]
+    if sender.name == 'social' and 'social_author' in db.introspection.table_names():
+        install_search_index(db)
 
 
 @receiver(post_delete, sender=Like)
@@ -45,4 +66,106 @@ def delete_related_inbox_items(sender, instance, **kwargs):
     Simulates cascade on delete for InboxItems GenericForeignKey
     """
     content_type = ContentType.objects.get_for_model(instance)
-    InboxItem.objects.filter(content_type=content_type, object_id=instance.id).delete()
\ No newline at end of file
+    InboxItem.objects.filter(content_type=content_type, object_id=instance.id).delete()
+
+
+@receiver(post_init, sender=Post)
+def remember_timeline_state(sender, instance, **kwargs):
+    """Snapshot the fields that decide where a post shows up in streams."""
+    # Read from __dict__ so deferred-field instances do not trigger a query
+    instance._timeline_state = (instance.__dict__.get('visibility'), instance.__dict__.get('published'))
+
+
+@receiver(post_save, sender=Post)
+def update_post_timelines(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Fan a created or edited post out to its audience's timelines.
+    Saves that do not touch visibility or published are skipped.
+    """
+    if update_fields is not None and not {'visibility', 'published', 'author'} & set(update_fields):
+        return
+
+    state = (instance.visibility, instance.published)
+    if not created and state == getattr(instance, '_timeline_state', None):
+        return
+
+    fanout_post(instance)
+    instance._timeline_state = state
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def update_follow_timelines(sender, instance, created=False, **kwargs):
+    """
+    A follow changes unlisted visibility for the follower and friends-only
+    visibility in both directions.
+    """
+    if kwargs.get('signal') is post_save and not created:
+        return
+
+    try:
+        follower, followed = instance.user, instance.following
+    except Author.DoesNotExist:
+        # One side is being cascade deleted, its timeline goes with it
+        return
+
+    refresh_viewer_for_author(follower, followed)
+    refresh_viewer_for_author(followed, follower)
+
+
+@receiver(post_save, sender=Author)
+def create_author_timeline(sender, instance, created, **kwargs):
+    """Give new local authors a stream before their first post or follow."""
+    if created and instance.user_id is not None:
+        backfill_timeline(instance)
+
+
+
+@receiver(post_save, sender=Like)
+def increment_like_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_like_count(instance, 1)
+
+
+@receiver(post_delete, sender=Like)
+def decrement_like_count(sender, instance, **kwargs):
+    adjust_like_count(instance, -1)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_comment_count(instance, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    adjust_comment_count(instance, -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_representation(sender, instance, **kwargs):
+    """Edits, visibility changes included, and deletes retire the cached representation."""
+    post_cache.invalidate(instance.id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post_representation(sender, instance, **kwargs):
+    post_cache.invalidate(instance.post_id)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def invalidate_liked_post_representation(sender, instance, **kwargs):
+    # Likes on comments do not change the cached slim representation of the post
+    if instance.content_type_id == ContentType.objects.get_for_model(Post).id:
+        post_cache.invalidate(instance.object_id)
+
+
+@receiver(post_save, sender=Author)
+def invalidate_author_post_representations(sender, instance, created, **kwargs):
+    """Posts embed their author, a renamed author or new profile image retires them all."""
+    if not created:
+        post_cache.invalidate(*Post.objects.filter(author=instance).values_list('id', flat=True))
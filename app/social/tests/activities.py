@@ -0,0 +1,45 @@
+# Activities as a remote node sends them, shared by the inbox, serializer and counter tests
+
+REMOTE_HOST = 'http://remote.example/api/'
+PUBLISHED = '2026-10-18T12:00:00Z'
+
+
+def remote_actor(serial):
+    return {
+        'type': 'author',
+        'id': f'{REMOTE_HOST}authors/{serial}',
+        'host': REMOTE_HOST,
+        'displayName': f'Remote {serial}',
+        'github': '',
+        'profileImage': f'http://remote.example/{serial}.png',
+        'page': f'http://remote.example/authors/{serial}',
+    }
+
+
+def remote_like(serial, object_fqid, published=PUBLISHED):
+    return {
+        'type': 'like',
+        'author': remote_actor(serial),
+        'object': object_fqid,
+        'published': published,
+        'id': f'{REMOTE_HOST}authors/{serial}/liked/1',
+    }
+
+
+def remote_post(serial, liked_by=()):
+    """A public post by remote author serial with comments and likes embedded."""
+    fqid = f'{REMOTE_HOST}authors/{serial}/posts/p1'
+    return {
+        'type': 'post',
+        'title': 'Remote Post',
+        'id': fqid,
+        'page': f'http://remote.example/authors/{serial}/posts/p1',
+        'description': '',
+        'contentType': 'text/plain',
+        'content': 'x',
+        'author': remote_actor(serial),
+        'published': PUBLISHED,
+        'visibility': 'PUBLIC',
+        'comments': {'type': 'comments', 'src': []},
+        'likes': {'type': 'likes', 'src': [remote_like(liker, fqid) for liker in liked_by]},
+    }
@@ -1,7 +1,11 @@
+from unittest import mock
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
+from ..authentication import credentials_key
+import base64
 
 # LOGIN / REGISTER TESTS
 
@@ -49,4 +53,40 @@ class UserLoginTests(APITestCase):
         self.assertEqual(response.status_code, 200)
 
         # Verify that the user is logged in
-        self.assertTrue('_auth_user_id' in self.client.session)  # Check session
\ No newline at end of file
+        self.assertTrue('_auth_user_id' in self.client.session)  # Check session
+
+class NodeBasicAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='remote-node', password='testpassword123')
+        self.url = reverse('inbox_batch')
+
+    def post_with(self, password):
+        self.client.credentials(HTTP_AUTHORIZATION='Basic ' + base64.b64encode(f'remote-node:{password}'.encode()).decode())
+        return self.client.post(self.url, [], format='json')
+
+    def test_password_is_hashed_once_per_ttl(self):
+        with mock.patch.object(User, 'check_password', autospec=True, side_effect=User.check_password) as check_password:
+            for _ in range(3):
+                self.assertEqual(self.post_with('testpassword123').status_code, 200)
+        self.assertEqual(check_password.call_count, 1)
+
+    def test_password_hash_is_not_cached(self):
+        self.post_with('testpassword123')
+        cached = cache.get(credentials_key('remote-node', 'testpassword123'))
+        self.assertEqual(cached, (self.user.pk, self.user.get_session_auth_hash()))
+        self.assertNotIn(self.user.password, cached)
+
+    def test_wrong_password_is_not_cached(self):
+        self.assertEqual(self.post_with('wrong').status_code, 401)
+        self.assertEqual(self.post_with('wrong').status_code, 401)
+
+    def test_password_change_and_deactivation_take_effect_immediately(self):
+        self.assertEqual(self.post_with('testpassword123').status_code, 200)
+        self.user.set_password('rotated-password')
+        self.user.save()
+        self.assertEqual(self.post_with('testpassword123').status_code, 401)
+        self.assertEqual(self.post_with('rotated-password').status_code, 200)
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.post_with('rotated-password').status_code, 401)
@@ -0,0 +1,66 @@
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from django.urls import reverse
+from ..counters import reconcile_counters
+from ..inbox_processing import process_inbox_activity
+from ..models import Author, Comment, Like, Post
+from .activities import remote_post
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.author = Author.objects.get(user=self.user)
+        self.client.login(username='testuser', password='testpassword123')
+
+        self.post = Post.objects.create(author=self.author, title='Test Post', content='x', contentType='text/plain', visibility='PUBLIC')
+
+    def test_like_view_increments_post_counter(self):
+        self.client.post(reverse('like_item', kwargs={'item_uuid': self.post.id}))
+        self.client.post(reverse('like_item', kwargs={'item_uuid': self.post.id}))
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+    def test_comment_and_comment_like_counters(self):
+        comment = Comment.objects.create(author=self.author, post=self.post, comment='Nice', content_type='text/plain')
+        like = Like.objects.create(author=self.author, content_type=ContentType.objects.get_for_model(Comment), object_id=comment.id)
+
+        self.post.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(comment.like_count, 1)
+
+        like.delete()
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        Like.objects.create(author=self.author, content_type=ContentType.objects.get_for_model(Post), object_id=self.post.id)
+        Post.objects.filter(id=self.post.id).update(like_count=7, comment_count=3)
+
+        self.assertEqual(reconcile_counters(), 2)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 0))
+        self.assertEqual(reconcile_counters(), 0)
+
+    def test_inbound_post_with_likes_keeps_counter(self):
+        post = remote_post('r1', liked_by=['r1'])
+
+        status_code, _ = process_inbox_activity(self.author, post)
+
+        self.assertEqual(status_code, 201)
+        post = Post.objects.get(fqid=post['id'])
+        self.assertEqual((post.likes.count(), post.like_count), (1, 1))
+
+    def test_saving_a_stale_instance_keeps_counters(self):
+        stale = Post.objects.get(id=self.post.id)
+        Like.objects.create(author=self.author, content_type=ContentType.objects.get_for_model(Post), object_id=self.post.id)
+
+        stale.title = 'Edited'
+        stale.save()
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.like_count), ('Edited', 1))
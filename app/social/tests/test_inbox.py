@@ -0,0 +1,304 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from ..models import Author, FollowRequest, InboundActivity, InboxItem, Like, Node, OutboxItem, Post, ReceivedActivity
+from ..node_client import close_node_clients
+from ..throttling import RecipientInboxThrottle, TokenBucketThrottle
+from .. import inbox_processing, inbox_queue, outbox
+from .activities import remote_actor, remote_like
+import json
+import requests
+import time
+
+
+class InboxTestCase(APITestCase):
+    def setUp(self):
+        self.node_user = User.objects.create_user(username='remote-node', password='testpassword123')
+        self.alice = Author.objects.get(user=User.objects.create_user(username='alice', password='testpassword123'))
+        self.bob = Author.objects.get(user=User.objects.create_user(username='bob', password='testpassword123'))
+        self.client.login(username='remote-node', password='testpassword123')
+
+    def follow(self, serial, target):
+        return {'type': 'follow', 'summary': 'follow', 'actor': remote_actor(serial), 'object': {
+            'type': 'author', 'id': target.fqid, 'host': target.host, 'displayName': target.display_name,
+            'github': '', 'profileImage': '', 'page': target.profile_url,
+        }}
+
+
+class BatchInboxTests(InboxTestCase):
+    def test_json_array_gets_per_item_results(self):
+        envelopes = [
+            {'recipient': self.alice.fqid, 'activity': self.follow('a1', self.alice)},
+            {'recipient': f'{self.bob.fqid}/inbox', 'activity': self.follow('a2', self.bob)},
+            {'recipient': self.bob.fqid, 'activity': {'type': 'unknown'}},
+            {'recipient': 'http://nowhere.example/api/authors/00000000-0000-0000-0000-000000000000', 'activity': {}},
+        ]
+        response = self.client.post(reverse('inbox_batch'), envelopes, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 201, 400, 404])
+        self.assertEqual(FollowRequest.objects.count(), 2)
+        self.assertEqual(InboxItem.objects.filter(recipient=self.bob).count(), 1)
+
+    def test_ndjson_body(self):
+        body = '\n'.join(json.dumps({'recipient': str(self.alice.id), 'activity': self.follow(f'n{i}', self.alice)}) for i in range(3))
+        response = self.client.post(reverse('inbox_batch'), body, content_type='application/x-ndjson')
+
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 201, 201])
+        self.assertEqual(InboxItem.objects.filter(recipient=self.alice).count(), 3)
+
+    def test_single_inbox_advertises_batch_endpoint(self):
+        response = self.client.post(reverse('send_inbox', kwargs={'author_serial': self.alice.id}), self.follow('s1', self.alice), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['X-Inbox-Batch'], reverse('inbox_batch'))
+
+
+class InboxDedupTests(InboxTestCase):
+    def setUp(self):
+        super().setUp()
+        self.post = Post.objects.create(author=self.alice, title='Liked', content='x', visibility='PUBLIC')
+        self.url = reverse('send_inbox', kwargs={'author_serial': self.alice.id})
+
+    def like(self, published='2026-10-18T12:00:00Z'):
+        return remote_like('d1', self.post.fqid, published)
+
+    def test_exact_resend_skips_serializers(self):
+        self.assertEqual(self.client.post(self.url, self.like(), format='json').status_code, 201)
+
+        with mock.patch.object(inbox_processing, 'SingleLikeSerializer') as serializer:
+            response = self.client.post(self.url, self.like(), format='json')
+        self.assertEqual(response.status_code, 200)
+        serializer.assert_not_called()
+        self.assertEqual(InboxItem.objects.filter(recipient=self.alice).count(), 1)
+
+    def test_changed_activity_is_applied_without_second_inbox_item(self):
+        self.client.post(self.url, self.like(), format='json')
+        response = self.client.post(self.url, self.like(published='2026-10-19T12:00:00Z'), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Like.objects.get().published.day, 19)
+        self.assertEqual(InboxItem.objects.filter(recipient=self.alice).count(), 1)
+        self.assertEqual(ReceivedActivity.objects.count(), 1)
+
+    @mock.patch.object(inbox_queue, 'INBOX_ASYNC_INGEST', True)
+    def test_resend_is_not_queued_again(self):
+        inbox_processing.process_inbox_activity(self.alice, self.like())
+        envelopes = [{'recipient': self.alice.fqid, 'activity': self.like()}]
+
+        response = self.client.post(reverse('inbox_batch'), envelopes, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], [200])
+        self.assertEqual(self.client.post(self.url, self.like(), format='json').status_code, 200)
+        self.assertFalse(InboundActivity.objects.exists())
+
+
+    @mock.patch.object(inbox_queue, 'INBOX_ASYNC_INGEST', True)
+    def test_resend_before_worker_runs_is_not_queued_again(self):
+        self.assertEqual(self.client.post(self.url, self.like(), format='json').status_code, 202)
+        self.assertEqual(self.client.post(self.url, self.like(), format='json').status_code, 200)
+
+        envelopes = [{'recipient': self.alice.fqid, 'activity': self.like(published='2026-10-19T12:00:00Z')}] * 2
+        response = self.client.post(reverse('inbox_batch'), envelopes, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], [202, 200])
+        self.assertEqual(InboundActivity.objects.count(), 2)
+
+
+@mock.patch.object(inbox_queue, 'INBOX_ASYNC_INGEST', True)
+class AsyncIngestTests(InboxTestCase):
+    def test_inbox_accepts_with_202_and_worker_applies(self):
+        response = self.client.post(reverse('send_inbox', kwargs={'author_serial': self.alice.id}), self.follow('q1', self.alice), format='json')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(FollowRequest.objects.exists())
+
+        activities = inbox_queue.claim_batch(10)
+        self.assertEqual([activity.received_from for activity in activities], ['remote-node'])
+        self.assertTrue(inbox_queue.apply(activities[0]))
+        self.assertEqual(InboundActivity.objects.get().status, 'DONE')
+        self.assertEqual(InboxItem.objects.filter(recipient=self.alice).count(), 1)
+
+    def test_envelope_is_checked_before_queueing(self):
+        response = self.client.post(reverse('send_inbox', kwargs={'author_serial': self.alice.id}), {'type': 'unknown'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(InboundActivity.objects.exists())
+
+    def test_batch_is_queued(self):
+        envelopes = [
+            {'recipient': self.alice.fqid, 'activity': self.follow('b1', self.alice)},
+            {'recipient': self.bob.fqid, 'activity': {'type': 'unknown'}},
+        ]
+        response = self.client.post(reverse('inbox_batch'), envelopes, format='json')
+
+        self.assertEqual([result['status'] for result in response.data['results']], [202, 400])
+        self.assertEqual(InboundActivity.objects.count(), 1)
+
+    def test_like_for_unknown_object_is_retried(self):
+        like = remote_like('l1', 'http://remote.example/api/authors/x/posts/missing')
+        inbox_queue.enqueue(self.alice, like)
+
+        self.assertFalse(inbox_queue.apply(inbox_queue.claim_batch(10)[0]))
+        activity = InboundActivity.objects.get()
+        self.assertEqual((activity.status, activity.result_status), ('PENDING', 404))
+        self.assertEqual(inbox_queue.claim_batch(10), [])
+
+
+    def test_transient_database_error_is_retried(self):
+        inbox_queue.enqueue(self.alice, self.follow('f1', self.alice))
+
+        with mock.patch.object(inbox_queue, 'process_inbox_activity', side_effect=inbox_queue.OperationalError('database is locked')):
+            self.assertFalse(inbox_queue.apply(inbox_queue.claim_batch(10)[0]))
+        activity = InboundActivity.objects.get()
+        self.assertEqual((activity.status, activity.result_status, activity.attempts), ('PENDING', 503, 1))
+
+        InboundActivity.objects.update(next_attempt_at=timezone.now())
+        self.assertTrue(inbox_queue.apply(inbox_queue.claim_batch(10)[0]))
+
+        with mock.patch.object(inbox_queue, 'INBOX_MAX_ATTEMPTS', 1):
+            inbox_queue.enqueue(self.bob, self.follow('f2', self.bob))
+            with mock.patch.object(inbox_queue, 'process_inbox_activity', side_effect=inbox_queue.IntegrityError('UNIQUE constraint failed')):
+                inbox_queue.apply(inbox_queue.claim_batch(10)[0])
+        self.assertEqual(InboundActivity.objects.get(recipient=self.bob).status, 'FAILED')
+
+
+class InboxThrottleTests(InboxTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def send(self, target, serial):
+        return self.client.post(reverse('send_inbox', kwargs={'author_serial': target.id}), self.follow(serial, target), format='json')
+
+    @mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {'inbox_node': '2/min', 'inbox_recipient': '100/min'})
+    def test_node_bucket_returns_429_with_retry_after(self):
+        self.assertEqual([self.send(self.alice, f't{i}').status_code for i in range(2)], [201, 201])
+
+        response = self.send(self.bob, 't3')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    @mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {'inbox_node': '100/min', 'inbox_recipient': '1/min'})
+    def test_recipient_bucket_is_per_author(self):
+        self.assertEqual(self.send(self.alice, 'r1').status_code, 201)
+        self.assertEqual(self.send(self.alice, 'r2').status_code, 429)
+        self.assertEqual(self.send(self.bob, 'r3').status_code, 201)
+
+    @mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {'inbox_node': '3/min', 'inbox_recipient': '100/min'})
+    def test_batch_costs_one_token_per_activity(self):
+        envelopes = [{'recipient': self.alice.fqid, 'activity': self.follow(f'c{i}', self.alice)} for i in range(2)]
+
+        self.assertEqual(self.client.post(reverse('inbox_batch'), envelopes, format='json').status_code, 200)
+        self.assertEqual(self.client.post(reverse('inbox_batch'), envelopes, format='json').status_code, 429)
+
+    @mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {'inbox_node': '100/min', 'inbox_recipient': '2/min'})
+    def test_batch_charges_each_recipient(self):
+        envelopes = [{'recipient': self.alice.fqid, 'activity': self.follow(f'b{i}', self.alice)} for i in range(3)]
+        envelopes.append({'recipient': self.bob.fqid, 'activity': self.follow('b3', self.bob)})
+
+        response = self.client.post(reverse('inbox_batch'), envelopes, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 201, 429, 201])
+        self.assertGreaterEqual(response.data['results'][2]['retry_after'], 1)
+        self.assertEqual(self.send(self.alice, 'b4').status_code, 429)
+
+        with mock.patch.object(inbox_queue, 'INBOX_ASYNC_INGEST', True):
+            response = self.client.post(reverse('inbox_batch'), envelopes[3:], format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], [202])
+
+    @mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {'inbox_recipient': '5/min'})
+    def test_concurrent_takes_do_not_overspend(self):
+        throttle = RecipientInboxThrottle()
+        window_start = time.time() // 60 * 60
+        throttle.timer = lambda: window_start
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            allowed = list(executor.map(lambda _: throttle.take('bucket', 1), range(20)))
+        self.assertEqual(allowed.count(True), 5)
+
+        # Half a minute into the next window half of the spent tokens are back
+        throttle.timer = lambda: window_start + 90
+        self.assertEqual([throttle.take('bucket', 1) for _ in range(3)], [True, True, False])
+        self.assertGreater(throttle.wait(), 0)
+
+    @mock.patch.object(inbox_queue, 'INBOX_ASYNC_INGEST', True)
+    @mock.patch.object(inbox_queue, 'INBOX_QUEUE_SHED_DEPTH', 1)
+    def test_full_queue_sheds_with_503(self):
+        self.assertEqual(self.send(self.alice, 'd1').status_code, 202)
+        cache.delete('inbox_queue_depth')
+
+        response = self.send(self.alice, 'd2')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(inbox_queue.INBOX_SHED_RETRY_AFTER))
+
+
+class BatchDeliveryTests(APITestCase):
+    def setUp(self):
+        self.node = Node.objects.create(team_name='remote', host='http://remote.example/api/', username='node', password='secret', supports_batch_inbox=True)
+        self.remote_author = Author.objects.create(fqid='http://remote.example/api/authors/abc', host='http://remote.example/api/')
+        self.addCleanup(close_node_clients)
+
+    @mock.patch.object(requests.Session, 'request')
+    def test_node_with_batch_support_gets_one_request(self, session_request):
+        session_request.return_value = mock.Mock(status_code=200)
+        session_request.return_value.json.return_value = {'results': [{'index': 0, 'status': 201}, {'index': 1, 'status': 400}]}
+        outbox.enqueue(self.node, self.remote_author, 'follow', {'type': 'follow'})
+        outbox.enqueue(self.node, self.remote_author, 'like', {'type': 'like'})
+
+        self.assertEqual(outbox.deliver_batch(self.node, outbox.claim_batch(10)), 1)
+
+        self.assertEqual(session_request.call_count, 1)
+        self.assertEqual(session_request.call_args.args[1], 'http://remote.example/api/inbox/batch/')
+        sent = json.loads(session_request.call_args.kwargs['data'])
+        self.assertEqual([envelope['activity']['type'] for envelope in sent], ['follow', 'like'])
+        self.assertEqual(sorted(OutboxItem.objects.values_list('status', flat=True)), ['DEAD', 'DELIVERED'])
+
+    @mock.patch.object(requests.Session, 'request')
+    def test_node_without_batch_endpoint_falls_back_to_single_delivery(self, session_request):
+        Node.objects.filter(pk=self.node.pk).update(batch_inbox_url='http://remote.example/api/inbox/batch/')
+        self.node.refresh_from_db()
+        session_request.return_value = requests.Response()
+        session_request.return_value.status_code = 404
+        outbox.enqueue(self.node, self.remote_author, 'follow', {'type': 'follow'})
+
+        self.assertEqual(outbox.deliver_batch(self.node, outbox.claim_batch(10)), 0)
+
+        self.node.refresh_from_db()
+        self.assertEqual((self.node.supports_batch_inbox, self.node.batch_inbox_url), (False, ''))
+        item = OutboxItem.objects.get()
+        self.assertEqual((item.status, item.attempts), ('PENDING', 0))
+
+        session_request.return_value = mock.Mock(status_code=202, headers={})
+        self.assertEqual(outbox.deliver_claimed(mock.Mock(submit=lambda function, *args: mock.Mock(result=lambda: function(*args))), outbox.claim_batch(10)), 1)
+        self.assertEqual(session_request.call_args.args[1], 'http://remote.example/api/authors/abc/inbox')
+
+    @mock.patch.object(requests.Session, 'request')
+    def test_advertised_batch_url_is_used(self, session_request):
+        node = Node.objects.create(team_name='peer', host='http://peer.example/api/', username='node', password='secret')
+        author = Author.objects.create(fqid='http://peer.example/api/authors/def', host='http://peer.example/api/')
+        session_request.return_value = mock.Mock(status_code=201, headers={'X-Inbox-Batch': '/service/inbox/batch/'})
+        outbox.enqueue(node, author, 'follow', {'type': 'follow'})
+        outbox.deliver(outbox.claim_batch(10)[0])
+
+        node.refresh_from_db()
+        self.assertEqual((node.supports_batch_inbox, node.batch_inbox_url), (True, 'http://peer.example/service/inbox/batch/'))
+
+        session_request.return_value = mock.Mock(status_code=200)
+        session_request.return_value.json.return_value = {'results': [{'index': 0, 'status': 201}]}
+        outbox.enqueue(node, author, 'like', {'type': 'like'})
+        outbox.deliver_batch(node, outbox.claim_batch(10))
+        self.assertEqual(session_request.call_args.args[1], 'http://peer.example/service/inbox/batch/')
+
+    @mock.patch.object(requests.Session, 'request')
+    def test_batch_url_on_another_host_is_ignored(self, session_request):
+        node = Node.objects.create(team_name='peer', host='http://peer.example/api/', username='node', password='secret')
+        author = Author.objects.create(fqid='http://peer.example/api/authors/def', host='http://peer.example/api/')
+        for advertised in ('http://elsewhere.example/inbox/batch/', 'https://peer.example/api/inbox/batch/', '//elsewhere.example/batch/'):
+            session_request.return_value = mock.Mock(status_code=201, headers={'X-Inbox-Batch': advertised})
+            outbox.enqueue(node, author, 'follow', {'type': 'follow'})
+            self.assertTrue(outbox.deliver(outbox.claim_batch(10)[0]))
+
+        node.refresh_from_db()
+        self.assertEqual((node.supports_batch_inbox, node.batch_inbox_url), (False, ''))
@@ -0,0 +1,47 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from django.urls import reverse
+from ..models import Author, Follow, InboxFanoutJob, InboxItem, Post
+from ..utils import Inbox
+from .. import inbox_fanout
+
+
+class InboxFanoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.author = Author.objects.get(user=self.user)
+        self.post = Post.objects.create(author=self.author, title='Test Post', content='x', visibility='PUBLIC')
+
+        for i in range(5):
+            follower = Author.objects.create(display_name=f'follower{i}', fqid=f'http://remote.example/api/authors/{i}')
+            Follow.objects.create(user=follower, following=self.author)
+
+    def test_followers_get_one_item_each_in_bounded_queries(self):
+        ContentType.objects.get_for_model(Post)
+
+        # One follower query and three inserts of at most two rows
+        with self.assertNumQueries(4), mock.patch.object(inbox_fanout, 'INBOX_FANOUT_BATCH_SIZE', 2):
+            Inbox(self.user).add_post_to_followers_inbox(self.post)
+
+        self.assertEqual(InboxItem.objects.filter(object_id=self.post.id, sender=self.author).count(), 5)
+
+    def test_editing_twice_keeps_one_item_per_follower(self):
+        self.client.login(username='testuser', password='testpassword123')
+        Inbox(self.user).add_post_to_followers_inbox(self.post)
+
+        for title in ('Edited', 'Edited again'):
+            self.client.post(reverse('edit_post', args=[self.post.id]), {'title': title, 'content': 'x', 'visibility': 'PUBLIC'})
+
+        self.assertEqual(InboxItem.objects.filter(object_id=self.post.id).count(), 5)
+
+    def test_large_fanout_is_left_to_the_worker(self):
+        with mock.patch.object(inbox_fanout, 'INBOX_FANOUT_ASYNC_THRESHOLD', 3):
+            Inbox(self.user).add_post_to_followers_inbox(self.post)
+
+        self.assertFalse(InboxItem.objects.exists())
+        self.assertEqual(inbox_fanout.run_pending_fanouts(), 1)
+        self.assertEqual(InboxItem.objects.count(), 5)
+        self.assertIsNotNone(InboxFanoutJob.objects.get().completed_at)
+        self.assertEqual(inbox_fanout.run_pending_fanouts(), 0)
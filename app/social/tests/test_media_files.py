@@ -0,0 +1,94 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from ..models import Author, Post
+from .. import media_files
+import base64
+import json
+import os
+import shutil
+import tempfile
+
+
+class MediaFileTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        os.makedirs(os.path.join(media_root, 'videos'))
+        self.video = os.urandom(100 * 1024)
+        with open(os.path.join(media_root, 'videos', 'clip.mp4'), 'wb') as f:
+            f.write(self.video)
+        self.url = '/media/videos/clip.mp4'
+
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.author = Author.objects.get(user=self.user)
+        self.post = Post.objects.create(author=self.author, title='Clip', content='/media/videos/clip.mp4', contentType='image/png;base64', visibility='PUBLIC')
+
+    def test_file_is_streamed_with_validators(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Content-Length'], str(len(self.video)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), self.video)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-1999')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f"bytes 1000-1999/{len(self.video)}")
+        self.assertEqual(response['Content-Length'], '1000')
+        self.assertEqual(b''.join(response.streaming_content), self.video[1000:2000])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.video[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(self.video)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f"bytes */{len(self.video)}")
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_paths_outside_media_root_are_not_served(self):
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/videos/').status_code, 404)
+
+    def test_image_endpoint_streams_file(self):
+        url = reverse('public_post_image_serial', kwargs={'author_serial': self.author.id, 'post_serial': self.post.id})
+        response = self.client.get(url)
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(b''.join(response.streaming_content), self.video)
+
+    def test_base64_endpoint_streams_stored_encoding(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('public_post_image_fqid', kwargs={'post_fqid': self.post.fqid}))
+
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(base64.b64decode(data['base64_image']), self.video)
+        self.assertEqual(data['data_uri'], f"data:image/png;base64,{data['base64_image']}")
+
+    def test_image_endpoints_stay_inside_media_root(self):
+        self.client.force_authenticate(self.user)
+        serial_url = reverse('public_post_image_serial', kwargs={'author_serial': self.author.id, 'post_serial': self.post.id})
+        fqid_url = reverse('public_post_image_fqid', kwargs={'post_fqid': self.post.fqid})
+        Post.objects.filter(id=self.post.id).update(content='/media/../../etc/hostname')
+
+        self.assertEqual(self.client.get(serial_url).status_code, 404)
+        self.assertEqual(self.client.get(fqid_url).status_code, 404)
+
+    @mock.patch.object(media_files, 'MEDIA_SENDFILE', 'x-accel-redirect')
+    def test_front_end_sends_file_in_accel_mode(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response['X-Accel-Redirect'], '/media/videos/clip.mp4')
+        self.assertEqual(response.content, b'')
@@ -0,0 +1,201 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from ..models import Author, Follow, Node, NodeHealth, OutboxItem, Post
+from ..delivery import plan_deliveries, remote_followers
+from ..serializers import SinglePostSerializer
+from ..utils import send_post_to_remote_followers
+from .. import outbox
+from ..node_client import CircuitBreaker, close_node_clients, get_node_client, save_node_health
+import json
+import requests
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.author = Author.objects.get(user=self.user)
+        self.client.login(username='testuser', password='testpassword123')
+
+        self.node = Node.objects.create(team_name='remote', host='http://remote.example/api/', username='node', password='secret')
+        self.remote_author = Author.objects.create(
+            fqid='http://remote.example/api/authors/abc',
+            display_name='Remote Author',
+            host='http://remote.example/api/',
+        )
+        self.remote_post = Post.objects.create(author=self.remote_author, title='Remote Post', content='x', visibility='PUBLIC')
+        self.addCleanup(close_node_clients)
+
+    @mock.patch.object(requests.Session, 'request')
+    def test_like_is_queued_not_sent(self, session_request):
+        self.client.post(reverse('like_item', kwargs={'item_uuid': self.remote_post.id}))
+
+        session_request.assert_not_called()
+        item = OutboxItem.objects.get()
+        self.assertEqual(item.status, 'PENDING')
+        self.assertEqual(item.url, 'http://remote.example/api/authors/abc/inbox')
+        self.assertEqual(json.loads(item.body)['type'], 'like')
+
+    @mock.patch.object(requests.Session, 'request')
+    def test_worker_delivers_queued_items(self, session_request):
+        session_request.return_value.status_code = 202
+        session_request.return_value.headers = {}
+        outbox.enqueue(self.node, self.remote_author, 'follow', {'type': 'follow'})
+
+        items = outbox.claim_batch(10)
+        self.assertEqual([item.status for item in OutboxItem.objects.all()], ['SENDING'])
+        self.assertTrue(outbox.deliver(items[0]))
+
+        item = OutboxItem.objects.get()
+        self.assertEqual((item.status, item.attempts), ('DELIVERED', 1))
+        self.assertEqual(session_request.call_args.kwargs['auth'], ('node', 'secret'))
+
+    @mock.patch.object(requests.Session, 'request', side_effect=requests.exceptions.ConnectTimeout('down'))
+    def test_failed_delivery_is_retried_with_backoff(self, session_request):
+        outbox.enqueue(self.node, self.remote_author, 'follow', {'type': 'follow'})
+
+        self.assertFalse(outbox.deliver(outbox.claim_batch(10)[0]))
+        item = OutboxItem.objects.get()
+        self.assertEqual((item.status, item.attempts), ('PENDING', 1))
+        self.assertIn('down', item.last_error)
+        self.assertGreaterEqual(item.next_attempt_at, timezone.now() + timedelta(seconds=outbox.OUTBOX_RETRY_BASE / 2 - 1))
+        self.assertEqual(outbox.claim_batch(10), [])
+
+    @mock.patch.object(requests.Session, 'request', side_effect=requests.exceptions.ConnectTimeout('down'))
+    def test_exhausted_delivery_becomes_dead_letter_and_replays(self, session_request):
+        item = outbox.enqueue(self.node, self.remote_author, 'follow', {'type': 'follow'})
+        OutboxItem.objects.filter(id=item.id).update(attempts=outbox.OUTBOX_MAX_ATTEMPTS - 1)
+
+        outbox.deliver(outbox.claim_batch(10)[0])
+        self.assertEqual(OutboxItem.objects.get().status, 'DEAD')
+
+        self.assertEqual(outbox.replay_dead_letters(node=self.node), 1)
+        item = OutboxItem.objects.get()
+        self.assertEqual((item.status, item.attempts), ('PENDING', 0))
+        self.assertEqual(len(outbox.claim_batch(10)), 1)
+
+    def test_client_errors_are_not_retried(self):
+        error = requests.exceptions.HTTPError(response=mock.Mock(status_code=400))
+        self.assertFalse(outbox.is_retryable(error))
+        error = requests.exceptions.HTTPError(response=mock.Mock(status_code=503))
+        self.assertTrue(outbox.is_retryable(error))
+
+    def test_retry_delay_grows_and_is_capped(self):
+        self.assertLessEqual(outbox.retry_delay(1), outbox.OUTBOX_RETRY_BASE)
+        self.assertGreaterEqual(outbox.retry_delay(3), outbox.OUTBOX_RETRY_BASE * 2)
+        self.assertLessEqual(outbox.retry_delay(50), outbox.OUTBOX_RETRY_MAX)
+
+
+class DeliveryPlanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.author = Author.objects.get(user=self.user)
+        self.post = Post.objects.create(author=self.author, title='Test Post', content='x', visibility='PUBLIC')
+        self.node = Node.objects.create(team_name='remote', host='http://remote.example/api/', username='node', password='secret')
+
+        hosts = ['http://remote.example/api', 'http://remote.example/api/', 'http://unknown.example/api/']
+        for i, host in enumerate(hosts):
+            follower = Author.objects.create(display_name=f'follower{i}', fqid=f'http://remote.example/api/authors/{i}', host=host)
+            Follow.objects.create(user=follower, following=self.author)
+
+    def test_post_is_serialized_once_for_all_remote_followers(self):
+        request = RequestFactory().post('/create_post/')
+        request.user = self.user
+
+        with mock.patch('social.utils.SinglePostSerializer', wraps=SinglePostSerializer) as serializer, \
+                mock.patch('social.utils.messages'):
+            send_post_to_remote_followers(request, self.post, self.author)
+
+        self.assertEqual(serializer.call_count, 1)
+        items = OutboxItem.objects.order_by('url')
+        self.assertEqual([item.url for item in items], [
+            'http://remote.example/api/authors/0/inbox',
+            'http://remote.example/api/authors/1/inbox',
+        ])
+        self.assertEqual(len({item.body for item in items}), 1)
+        self.assertIn('src', json.loads(items[0].body)['likes'])
+
+    def test_slim_nodes_get_references_to_collections(self):
+        Node.objects.create(team_name='slim', host='http://slim.example/api/', username='node', password='secret', embed_collections=False)
+        follower = Author.objects.create(display_name='slim follower', fqid='http://slim.example/api/authors/0', host='http://slim.example/api/')
+        Follow.objects.create(user=follower, following=self.author)
+        request = RequestFactory().post('/create_post/')
+        request.user = self.user
+
+        with mock.patch('social.utils.SinglePostSerializer', wraps=SinglePostSerializer) as serializer, \
+                mock.patch('social.utils.messages'):
+            send_post_to_remote_followers(request, self.post, self.author)
+
+        self.assertEqual(serializer.call_count, 2)
+        bodies = {item.node.team_name: json.loads(item.body) for item in OutboxItem.objects.select_related('node')}
+        self.assertIn('src', bodies['remote']['likes'])
+        self.assertNotIn('src', bodies['slim']['likes'])
+
+    def test_plan_groups_recipients_by_node(self):
+        plan = plan_deliveries(remote_followers(self.author))
+
+        self.assertEqual(list(plan), [self.node])
+        self.assertEqual(sorted(author.display_name for author in plan[self.node]), ['follower0', 'follower1'])
+
+
+class NodeClientTests(TestCase):
+    def setUp(self):
+        self.addCleanup(close_node_clients)
+
+    def test_client_is_reused_until_credentials_change(self):
+        node = Node.objects.create(team_name='remote', host='http://remote.example/api/', username='node', password='secret')
+        client = get_node_client(node)
+
+        self.assertIs(get_node_client(Node.objects.get(pk=node.pk)), client)
+        self.assertEqual(client.url('authors/'), 'http://remote.example/api/authors/')
+
+        node.password = 'rotated'
+        node.save()
+        self.assertIsNot(get_node_client(node), client)
+
+    @mock.patch.object(requests.Session, 'request', side_effect=requests.exceptions.ConnectTimeout('down'))
+    def test_circuit_opens_and_short_circuits(self, session_request):
+        node = Node.objects.create(team_name='remote', host='http://remote.example/api/', username='node', password='secret')
+        client = get_node_client(node)
+        client.breaker = CircuitBreaker(threshold=2, reset_timeout=60)
+
+        for _ in range(2):
+            with self.assertRaises(requests.exceptions.ConnectTimeout):
+                client.get('authors/')
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            client.get('authors/')
+        self.assertEqual(session_request.call_count, 2)
+
+        save_node_health()
+        health = NodeHealth.objects.get(node=node)
+        self.assertEqual((health.state, health.consecutive_failures), ('OPEN', 2))
+
+    def test_unexpected_error_in_trial_does_not_wedge_circuit(self):
+        node = Node.objects.create(team_name='remote', host='http://remote.example/api/', username='node', password='secret')
+        client = get_node_client(node)
+        client.breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        client.breaker.record(False, error='down')
+
+        with mock.patch.object(requests.Session, 'request', side_effect=ValueError('bad header')):
+            with self.assertRaises(ValueError):
+                client.get('authors/')
+        self.assertFalse(client.breaker.trial_in_flight)
+
+        with mock.patch.object(requests.Session, 'request') as session_request:
+            session_request.return_value.status_code = 200
+            client.get('authors/')
+        self.assertEqual(client.breaker.state, 'CLOSED')
+
+    def test_half_open_trial_closes_circuit(self):
+        node = Node.objects.create(team_name='remote', host='http://remote.example/api/', username='node', password='secret')
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        breaker.record(False, error='down')
+        self.assertEqual(breaker.state, 'OPEN')
+
+        breaker.before_request(node)
+        self.assertEqual(breaker.state, 'HALF_OPEN')
+        breaker.record(True, 12.0)
+        self.assertEqual((breaker.state, breaker.latency_ms), ('CLOSED', 12.0))
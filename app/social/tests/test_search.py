@@ -0,0 +1,129 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from ..models import Author, Node, RemoteDirectoryState
+from .. import author_search, remote_authors
+from ..node_client import close_node_clients
+import requests
+import threading
+
+
+def listing_response(status_code=200, authors=(), headers=None):
+    response = mock.Mock(status_code=status_code, headers=headers or {}, content=b'{}')
+    response.json.return_value = {'type': 'authors', 'authors': list(authors)}
+    return response
+
+
+def remote_author(serial, name):
+    return {
+        'type': 'author',
+        'id': f'http://fast.example/api/authors/{serial}',
+        'host': 'http://fast.example/api/',
+        'displayName': name,
+        'github': '',
+        'profileImage': '',
+        'page': f'http://fast.example/authors/{serial}',
+    }
+
+
+class RemoteDirectoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.author = Author.objects.get(user=self.user)
+        self.client.login(username='testuser', password='testpassword123')
+
+        self.fast = Node.objects.create(team_name='fast', host='http://fast.example/api/', username='node', password='secret')
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        close_node_clients()
+
+    @mock.patch.object(requests.Session, 'request')
+    def test_refresh_upserts_and_sends_conditional_get(self, session_request):
+        session_request.return_value = listing_response(authors=[remote_author('abc', 'Fast Author')], headers={'ETag': '"v1"'})
+        self.assertEqual(remote_authors.refresh_directory(), 1)
+
+        session_request.return_value = listing_response(authors=[remote_author('abc', 'Renamed')], headers={'ETag': '"v2"'})
+        remote_authors.refresh_directory(force=True)
+        self.assertEqual(session_request.call_args.kwargs['headers']['If-None-Match'], '"v1"')
+        self.assertEqual(Author.objects.get(fqid='http://fast.example/api/authors/abc').display_name, 'Renamed')
+
+        session_request.return_value = listing_response(status_code=304)
+        self.assertEqual(remote_authors.refresh_directory(force=True), 0)
+        self.assertEqual(RemoteDirectoryState.objects.get(node=self.fast).etag, '"v2"')
+
+    @mock.patch.object(requests.Session, 'request')
+    def test_fresh_nodes_are_not_fetched(self, session_request):
+        session_request.return_value = listing_response(authors=[remote_author('abc', 'Fast Author')])
+        remote_authors.refresh_directory()
+        remote_authors.refresh_directory()
+
+        self.assertEqual(session_request.call_count, 1)
+
+    def test_slow_node_is_skipped_within_budget(self):
+        slow = Node.objects.create(team_name='slow', host='http://slow.example/api/', username='node', password='secret')
+
+        def fake_fetch(node, timeout, etag, last_modified):
+            if node == slow:
+                self.release.wait(5)
+            return remote_authors.Listing(False, [remote_author(node.team_name, node.team_name)], '', '')
+
+        with mock.patch.object(remote_authors, 'fetch_node_authors', side_effect=fake_fetch):
+            remote_authors.refresh_directory(budget=0.5)
+
+        self.assertTrue(Author.objects.filter(display_name='fast').exists())
+        self.assertIsNone(RemoteDirectoryState.objects.get(node=slow).refreshed_at)
+
+    @mock.patch.object(requests.Session, 'request')
+    def test_search_reads_only_the_local_directory(self, session_request):
+        remote_authors.upsert_authors([remote_author('abc', 'Fast Author')])
+
+        response = self.client.get(reverse('search_authors'), {'q': 'fast'})
+
+        session_request.assert_not_called()
+        self.assertEqual([author.display_name for author in response.context['authors']], ['Fast Author'])
+
+
+class AuthorSearchIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.login(username='testuser', password='testpassword123')
+
+        for username in ('alice_smith', 'API-node', 'test-bob'):
+            User.objects.create_user(username=username, password='testpassword123')
+
+    def search(self, query):
+        response = self.client.get(reverse('search_authors'), {'q': query})
+        return sorted(author.display_name for author in response.context['authors'])
+
+    def test_search_matches_names_and_hides_service_accounts(self):
+        self.assertEqual(self.search('SMITH'), ['alice_smith'])
+        self.assertEqual(self.search('al'), ['alice_smith'])
+        self.assertEqual(self.search('node'), [])
+        self.assertEqual(self.search('bob'), [])
+
+    def test_flags_and_search_text_follow_username(self):
+        user = User.objects.get(username='alice_smith')
+        user.username = 'carol'
+        user.save()
+
+        author = Author.objects.get(user=user)
+        self.assertEqual(author.search_text, 'alice_smith carol')
+        self.assertEqual(self.search('carol'), ['alice_smith'])
+        self.assertTrue(Author.objects.get(user__username='API-node').is_api_account)
+
+    def test_index_is_keyed_by_author_id(self):
+        # social_author's rowid is renumbered by VACUUM, the index must not depend on it
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT author_id FROM {author_search.SQLITE_SEARCH_TABLE}")
+            indexed = sorted(row[0] for row in cursor.fetchall())
+        self.assertEqual(indexed, sorted(author.id.hex for author in Author.objects.all()))
+
+        Author.objects.filter(user__username='alice_smith').update(display_name='Alice', search_text='alice carol')
+        self.assertEqual(self.search('smith'), [])
+        self.assertEqual(self.search('carol'), ['Alice'])
+        Author.objects.filter(user__username='alice_smith').delete()
+        self.assertEqual(self.search('carol'), [])
@@ -0,0 +1,269 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APITestCase
+from ..inbox_processing import process_inbox_activity
+from ..models import Author, Comment, Like, Post
+from ..json_stream import iter_json
+from .. import inbox_queue, post_cache, post_images, serializers
+from .activities import remote_like, remote_post
+import base64
+import json
+import math
+import os
+import shutil
+import tempfile
+import uuid
+
+
+class PostPayloadTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.author = Author.objects.get(user=self.user)
+        self.client.login(username='testuser', password='testpassword123')
+
+        self.post = Post.objects.create(author=self.author, title='Test Post', content='x', contentType='text/plain', visibility='PUBLIC')
+        self.comment = Comment.objects.create(author=self.author, post=self.post, comment='Nice', content_type='text/plain')
+        Like.objects.create(author=self.author, content_type=ContentType.objects.get_for_model(Post), object_id=self.post.id)
+        Like.objects.create(author=self.author, content_type=ContentType.objects.get_for_model(Comment), object_id=self.comment.id)
+        self.post.refresh_from_db()
+
+    def test_post_is_slim_by_default(self):
+        response = self.client.get(reverse('post_fqid', kwargs={'post_fqid': self.post.fqid})).json()
+
+        self.assertEqual(response['comments'], {'type': 'comments', 'id': f'{self.post.fqid}/comments', 'count': 1})
+        self.assertEqual(response['likes'], {'type': 'likes', 'id': f'{self.post.fqid}/likes', 'count': 1})
+
+    def test_include_embeds_collections(self):
+        response = self.client.get(reverse('post_fqid', kwargs={'post_fqid': self.post.fqid}), {'include': 'comments,likes'})
+
+        self.assertEqual(len(response.data['comments']['src']), 1)
+        self.assertEqual(response.data['comments']['src'][0]['likes']['count'], 1)
+        self.assertEqual(len(response.data['comments']['src'][0]['likes']['src']), 1)
+        self.assertEqual(len(response.data['likes']['src']), 1)
+
+        response = self.client.get(reverse('post_fqid', kwargs={'post_fqid': self.post.fqid}), {'include': 'comments'})
+        self.assertEqual(len(response.data['comments']['src']), 1)
+        self.assertNotIn('src', response.data['comments']['src'][0]['likes'])
+        self.assertNotIn('src', response.data['likes'])
+
+    def test_slim_push_keeps_stored_likes(self):
+        post = remote_post('r1', liked_by=['r1'])
+        fqid = post['id']
+        process_inbox_activity(self.author, post)
+
+        slim = {**post, 'title': 'Edited', 'comments': {'type': 'comments', 'id': f'{fqid}/comments', 'count': 0},
+                'likes': {'type': 'likes', 'id': f'{fqid}/likes', 'count': 1}}
+        process_inbox_activity(self.author, slim)
+
+        post = Post.objects.get(fqid=fqid)
+        self.assertEqual((post.title, post.likes.count(), post.like_count), ('Edited', 1, 1))
+
+    @mock.patch.object(serializers, 'SLIM_POST_PAYLOADS', False)
+    def test_slim_payloads_can_be_turned_off(self):
+        response = self.client.get(reverse('post_fqid', kwargs={'post_fqid': self.post.fqid}))
+
+        self.assertIn('src', response.data['likes'])
+
+    def test_fields_and_omit_narrow_the_post(self):
+        url = reverse('author-post-detail', kwargs={'author_serial': self.author.id, 'post_serial': self.post.id})
+
+        response = self.client.get(url, {'fields': 'title,likes'})
+        self.assertEqual(response.data, {'title': 'Test Post', 'likes': {'type': 'likes', 'id': f'{self.post.fqid}/likes', 'count': 1}})
+
+        response = self.client.get(url, {'omit': 'content,comments', 'embed': 'likes'})
+        self.assertNotIn('content', response.data)
+        self.assertNotIn('comments', response.data)
+        self.assertEqual(len(response.data['likes']['src']), 1)
+
+    def test_omitted_collections_are_not_queried(self):
+        url = reverse('recent_author_post', kwargs={'author_serial': self.author.id})
+        self.client.get(url)
+
+        with self.assertNumQueries(7):
+            response = self.client.get(url, {'fields': 'title,id', 'include': 'comments,likes'})
+        self.assertEqual(json.loads(b''.join(response.streaming_content))[0], {'title': 'Test Post', 'id': self.post.fqid})
+
+    def test_likes_count_only(self):
+        url = reverse('who_liked_this_post_serial', kwargs={'author_serial': self.author.id, 'post_serial': self.post.id})
+        response = self.client.get(url, {'fields': 'type,count'})
+
+        self.assertEqual(response.data, {'type': 'likes', 'count': 1})
+
+    def test_embedded_tree_does_not_refetch(self):
+        url = reverse('post_fqid', kwargs={'post_fqid': self.post.fqid})
+        params = {'include': 'comments,likes'}
+        self.client.get(url, params)
+
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url, params)
+        for i in range(3):
+            liker = Author.objects.create(display_name=f'liker{i}', fqid=f'http://remote.example/api/authors/{i}', host='http://remote.example/api/')
+            Like.objects.create(author=liker, content_type=ContentType.objects.get_for_model(Post), object_id=self.post.id)
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url, params)
+
+        self.assertEqual(len(response.data['likes']['src']), 4)
+        self.assertEqual(len(after), len(before))
+        self.assertFalse([query for query in after if 'FROM "social_post"' in query['sql'] and '"fqid" =' in query['sql']][1:])
+
+    def test_comment_likes_are_loaded_once_per_page(self):
+        url = reverse('comments_on_post', kwargs={'author_serial': self.author.id, 'post_serial': self.post.id})
+        params = {'include': 'likes'}
+        self.client.get(url, params)
+
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url, params)
+        for i in range(3):
+            comment = Comment.objects.create(author=self.author, post=self.post, comment=f'More {i}', content_type='text/plain')
+            Like.objects.create(author=self.author, content_type=ContentType.objects.get_for_model(Comment), object_id=comment.id)
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url, params)
+
+        self.assertEqual([comment['likes']['count'] for comment in response.data['src']], [1, 1, 1, 1])
+        self.assertEqual([len(comment['likes']['src']) for comment in response.data['src']], [1, 1, 1, 1])
+        self.assertEqual(len(after), len(before))
+
+
+    def test_prefetched_likes_are_limited_to_the_page(self):
+        comment_type = ContentType.objects.get_for_model(Comment)
+        now = timezone.now()
+        Like.objects.filter(object_id=self.comment.id).update(published=now)
+        for i in range(1, 4):
+            liker = Author.objects.create(display_name=f'liker{i}', fqid=f'http://remote.example/api/authors/{i}', host='http://remote.example/api/')
+            Like.objects.create(author=liker, content_type=comment_type, object_id=self.comment.id, published=now - timedelta(minutes=i))
+        objects = serializers.IdentityMap()
+        request = Request(RequestFactory().get('/', {'size': 2}))
+
+        with CaptureQueriesContext(connection) as queries:
+            objects.prefetch_likes([self.comment], 2, request)
+
+        page, number = objects.pages[('likes', comment_type.id, self.comment.id)]
+        self.assertEqual(([like.author.display_name for like in page], number), (['liker2', 'liker3'], 2))
+        self.assertEqual(len(queries), 1)
+        self.assertIn('ROW_NUMBER()', queries[0]['sql'])
+
+@mock.patch.object(post_cache, 'POST_CACHE_ENABLED', True)
+class PostCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.author = Author.objects.get(user=self.user)
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(author=self.author, title='Cached', content='x', contentType='text/plain', visibility='PUBLIC')
+        self.url = reverse('author-post-detail', kwargs={'author_serial': self.author.id, 'post_serial': self.post.id})
+
+    def test_hot_public_post_is_served_without_queries(self):
+        first = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+            by_fqid = self.client.get(reverse('post_fqid', kwargs={'post_fqid': self.post.fqid}))
+        self.assertEqual(response.content, first.content)
+        self.assertEqual(by_fqid.content, first.content)
+        self.assertEqual(response.json()['title'], 'Cached')
+
+    def test_likes_comments_and_edits_invalidate(self):
+        self.client.get(self.url)
+
+        Like.objects.create(author=self.author, content_type=ContentType.objects.get_for_model(Post), object_id=self.post.id)
+        Comment.objects.create(author=self.author, post=self.post, comment='Nice', content_type='text/plain')
+        response = self.client.get(self.url).json()
+        self.assertEqual((response['likes']['count'], response['comments']['count']), (1, 1))
+
+        self.post.title = 'Edited'
+        self.post.save()
+        self.assertEqual(self.client.get(self.url).json()['title'], 'Edited')
+
+    def test_visibility_change_is_not_served_from_cache(self):
+        url = reverse('post_fqid', kwargs={'post_fqid': self.post.fqid})
+        self.client.get(url)
+
+        self.post.visibility = 'FRIENDS'
+        self.post.save()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_worker_invalidates_cached_post(self):
+        self.client.get(self.url)
+        inbox_queue.enqueue(self.author, remote_like('r1', self.post.fqid))
+        self.assertTrue(inbox_queue.apply(inbox_queue.claim_batch(1)[0]))
+
+        self.assertEqual(self.client.get(self.url).json()['likes']['count'], 1)
+
+    def test_local_memory_cache_disables_fast_path(self):
+        with mock.patch.object(post_cache, 'POST_CACHE_ENABLED', False):
+            self.client.get(self.url)
+            self.assertIsNone(post_cache.cached_public(post_id=self.post.id))
+            self.assertEqual(self.client.get(self.url).json()['title'], 'Cached')
+
+    def test_sparse_requests_bypass_cache(self):
+        self.client.get(self.url)
+
+        self.assertEqual(self.client.get(self.url, {'fields': 'title'}).data, {'title': 'Cached'})
+
+
+class PostImageTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.image = os.urandom(200 * 1024)
+        with open(os.path.join(media_root, 'photo.png'), 'wb') as f:
+            f.write(self.image)
+
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.author = Author.objects.get(user=self.user)
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(author=self.author, title='Photo', content='/media/photo.png', contentType='image/png;base64', visibility='PUBLIC')
+
+    def get_json(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_image_is_encoded_once_and_streamed(self):
+        url = reverse('author-post-detail', kwargs={'author_serial': self.author.id, 'post_serial': self.post.id})
+
+        with mock.patch('social.post_images.base64.b64encode', wraps=base64.b64encode) as b64encode:
+            for _ in range(2):
+                self.assertEqual(base64.b64decode(self.get_json(url)['content']), self.image)
+        self.assertEqual(b64encode.call_count, math.ceil(len(self.image) / post_images.ENCODE_CHUNK_SIZE))
+
+    def test_post_list_streams_images(self):
+        Post.objects.create(author=self.author, title='Text', content='x', contentType='text/plain', visibility='PUBLIC')
+        data = self.get_json(reverse('recent_author_post', kwargs={'author_serial': self.author.id}))
+
+        self.assertEqual(base64.b64decode(data[1]['content']), self.image)
+        self.assertEqual(data[0]['content'], 'x')
+
+    def test_paths_outside_media_root_are_not_read(self):
+        outside = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside)
+        secret = os.path.join(outside, 'secret.png')
+        with open(secret, 'wb') as f:
+            f.write(b'secret')
+        self.post.content = secret
+        self.post.save()
+
+        data = self.client.get(reverse('post_fqid', kwargs={'post_fqid': self.post.fqid})).json()
+
+        self.assertEqual(data['content'], secret)
+        self.assertEqual(os.listdir(outside), ['secret.png'])
+
+    @mock.patch.object(post_images, 'POST_IMAGE_CONTENT', 'reference')
+    def test_reference_mode_sends_url(self):
+        data = self.get_json(reverse('post_fqid', kwargs={'post_fqid': self.post.fqid}))
+
+        self.assertEqual(data['content'], 'http://testserver/media/photo.png')
+
+    def test_stream_matches_renderer(self):
+        data = {'text': 'café   "quoted"', 'when': timezone.now(), 'id': uuid.uuid4(), 'items': [1, 2.5, None, True], 'nested': {}}
+
+        self.assertEqual(b''.join(iter_json(data)), JSONRenderer().render(data))
@@ -1,7 +1,10 @@
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
-from ..models import Author, FollowRequest, Follow, Post
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from ..models import Author, FollowRequest, Follow, Post, Comment, Like
 
 # Test to see that an authenticated user can access the stream.
 
@@ -123,3 +126,75 @@ class DashboardTests(APITestCase):
     #     self.assertContains(response, 'Test Friends Only Post')
         
     #     self.assertNotContains(response, 'Test Deleted Post')
+
+
+class StreamPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.author = Author.objects.get(user=self.user)
+        self.client.login(username='testuser', password='testpassword123')
+
+        for i in range(25):
+            Post.objects.create(author=self.author, title=f'Paged Post {i:02d}', content='x', contentType='text/plain', visibility='PUBLIC')
+
+    def test_first_page_is_bounded(self):
+        response = self.client.get(reverse('stream'))
+        self.assertEqual(len(response.context['posts']), 20)
+        self.assertIsNotNone(response.context['next_cursor'])
+        self.assertContains(response, 'Paged Post 24')
+        self.assertNotContains(response, 'Paged Post 04')
+
+    def test_next_page_fragment(self):
+        response = self.client.get(reverse('stream'))
+        cursor = response.context['next_cursor']
+
+        response = self.client.get(reverse('stream'), {'cursor': cursor}, HTTP_HX_REQUEST='true')
+        self.assertEqual(len(response.context['posts']), 5)
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertContains(response, 'Paged Post 00')
+        self.assertNotContains(response, 'Paged Post 05')
+        self.assertNotContains(response, '<html')
+
+    def test_invalid_cursor_starts_from_top(self):
+        response = self.client.get(reverse('stream'), {'cursor': 'not-a-cursor'})
+        self.assertContains(response, 'Paged Post 24')
+
+
+class PostCardQueryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.author = Author.objects.get(user=self.user)
+        self.client.login(username='testuser', password='testpassword123')
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(author=self.author, title=f'Post {i}', content='x', contentType='text/plain', visibility='PUBLIC')
+            comment = Comment.objects.create(author=self.author, post=post, comment='Nice', content_type='text/plain')
+            Like.objects.create(author=self.author, content_type=ContentType.objects.get_for_model(Post), object_id=post.id)
+            Like.objects.create(author=self.author, content_type=ContentType.objects.get_for_model(Comment), object_id=comment.id)
+
+    def count_queries(self, url_name, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(url_name, kwargs=kwargs))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_posts(self):
+        pages = [('stream', {}), ('my_posts', {}), ('view_profile', {}), ('author_profile', {'id': self.author.id})]
+
+        self.add_posts(2)
+        small = {name: self.count_queries(name, **kwargs) for name, kwargs in pages}
+
+        self.add_posts(8)
+        large = {name: self.count_queries(name, **kwargs) for name, kwargs in pages}
+
+        self.assertEqual(small, large)
+
+    def test_card_counts(self):
+        self.add_posts(1)
+        post = Post.objects.get()
+
+        response = self.client.get(reverse('single_post', kwargs={'post_id': post.id}))
+        self.assertEqual(response.context['post'].like_count, 1)
+        self.assertEqual(response.context['post'].comment_count, 1)
+        self.assertEqual(response.context['post'].post_comments.all()[0].like_count, 1)
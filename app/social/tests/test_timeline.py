@@ -0,0 +1,67 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from ..models import Author, Follow, Post, TimelineEntry
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        # Signals create the authors for local users
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.user2 = User.objects.create_user(username='testuser2', password='testpassword123')
+        self.author = Author.objects.get(user=self.user)
+        self.author2 = Author.objects.get(user=self.user2)
+
+        self.client.login(username='testuser', password='testpassword123')
+
+    def timeline_titles(self, author):
+        return set(TimelineEntry.objects.filter(viewer=author).values_list('post__title', flat=True))
+
+    def test_public_post_fans_out_to_local_authors(self):
+        Post.objects.create(author=self.author2, title='Public', content='x', visibility='PUBLIC')
+
+        self.assertEqual(self.timeline_titles(self.author), {'Public'})
+        self.assertEqual(self.timeline_titles(self.author2), {'Public'})
+
+    def test_follow_changes_unlisted_and_friends_visibility(self):
+        Post.objects.create(author=self.author2, title='Unlisted', content='x', visibility='UNLISTED')
+        Post.objects.create(author=self.author2, title='Friends', content='x', visibility='FRIENDS')
+        self.assertEqual(self.timeline_titles(self.author), set())
+
+        follow = Follow.objects.create(user=self.author, following=self.author2)
+        self.assertEqual(self.timeline_titles(self.author), {'Unlisted'})
+
+        Follow.objects.create(user=self.author2, following=self.author)
+        self.assertEqual(self.timeline_titles(self.author), {'Unlisted', 'Friends'})
+
+        follow.delete()
+        self.assertEqual(self.timeline_titles(self.author), set())
+
+    def test_edit_and_delete_update_timeline(self):
+        post = Post.objects.create(author=self.author2, title='Public', content='x', visibility='PUBLIC')
+
+        post.visibility = 'FRIENDS'
+        post.save()
+        self.assertEqual(self.timeline_titles(self.author), set())
+
+        post.visibility = 'PUBLIC'
+        post.save()
+        self.assertEqual(self.timeline_titles(self.author), {'Public'})
+
+        post.visibility = 'DELETED'
+        post.save()
+        self.assertEqual(self.timeline_titles(self.author), set())
+
+    def test_new_author_gets_existing_public_posts(self):
+        Post.objects.create(author=self.author, title='Public', content='x', visibility='PUBLIC')
+
+        user3 = User.objects.create_user(username='testuser3', password='testpassword123')
+        self.assertEqual(self.timeline_titles(Author.objects.get(user=user3)), {'Public'})
+
+    def test_stream_reads_timeline(self):
+        Post.objects.create(author=self.author2, title='Test Public Post', content='x', visibility='PUBLIC')
+        Post.objects.create(author=self.author2, title='Test Friends Post', content='x', visibility='FRIENDS')
+
+        response = self.client.get(reverse('stream'))
+        self.assertContains(response, 'Test Public Post')
+        self.assertNotContains(response, 'Test Friends Post')
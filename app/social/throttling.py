@@ -0,0 +1,103 @@
+from rest_framework.throttling import SimpleRateThrottle
+from .inbox_processing import parse_inbox_batch
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket kept in the cache: a rate of "600/min" holds up to 600
+    tokens, refilled evenly over the minute. Peers may burst up to the
+    bucket size and then sustain the rate. Rejected requests get 429 with
+    Retry-After set to when enough tokens will be back.
+
+    The bucket is approximated by a sliding window, the tokens used in the
+    current window plus the share of the previous window's that falls within
+    the last duration seconds. Counters only change through cache.incr and
+    cache.decr, which are atomic on Redis, Memcached and within one process,
+    so concurrent workers cannot spend the same token twice.
+    """
+
+    def get_cost(self, request, view):
+        return 1
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        return self.take(self.key, self.get_cost(request, view))
+
+    def take(self, key, cost):
+        """Take cost tokens from the bucket at key if it holds enough, else set wait_seconds."""
+        capacity = self.num_requests
+        window, elapsed = divmod(self.timer(), self.duration)
+        window_key = f"{key}:{int(window)}"
+        carried = self.cache.get(f"{key}:{int(window) - 1}", 0) * (1 - elapsed / self.duration)
+
+        # A request larger than the bucket can still pass once it is full
+        cost = min(cost, capacity)
+        # Spend first and check after, so racing requests see each other's tokens as gone
+        self.cache.add(window_key, 0, self.duration * 2)
+        try:
+            used = self.cache.incr(window_key, cost)
+        except ValueError:
+            # The counter expired between add and incr
+            self.cache.set(window_key, cost, self.duration * 2)
+            used = cost
+        if carried + used <= capacity:
+            return True
+
+        try:
+            self.cache.decr(window_key, cost)
+        except ValueError:
+            pass
+        self.wait_seconds = (carried + used - capacity) * self.duration / capacity
+        return False
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class NodeInboxThrottle(TokenBucketThrottle):
+    """Limits how fast one set of node credentials can push to local inboxes."""
+    scope = 'inbox_node'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class NodeBatchInboxThrottle(NodeInboxThrottle):
+    """Shares the node's bucket, every activity in a batch costs a token."""
+
+    def get_cost(self, request, view):
+        try:
+            return max(len(parse_inbox_batch(request)), 1)
+        except ValueError:
+            return 1
+
+
+class RecipientInboxThrottle(TokenBucketThrottle):
+    """Limits how fast any peers together can push to one local author's inbox."""
+    scope = 'inbox_recipient'
+
+    def get_cache_key(self, request, view):
+        author_serial = view.kwargs.get('author_serial')
+        if author_serial is None:
+            return None
+        return self.recipient_key(author_serial)
+
+    def recipient_key(self, author_serial):
+        return self.cache_format % {'scope': self.scope, 'ident': author_serial}
+
+    def allow_recipient(self, author):
+        """
+        Charge one token to author's bucket for an activity that came in a batch,
+        which the view-level check cannot see. Batches pay the same as single pushes.
+        """
+        if self.rate is None:
+            return True
+        return self.take(self.recipient_key(author.id), 1)
@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from .models import Author, Follow, Post, TimelineEntry
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Newest posts copied into a freshly created author's timeline
+TIMELINE_BACKFILL_LIMIT = getattr(settings, 'TIMELINE_BACKFILL_LIMIT', 1000)
+
+
+def get_friend_ids(author):
+    """Ids of authors that mutually follow author."""
+    following = Follow.objects.filter(user=author).values_list('following', flat=True)
+    return set(Follow.objects.filter(following=author, user__in=following).values_list('user', flat=True))
+
+
+def get_audience(post):
+    """
+    Local authors whose stream should show post.
+    Mirrors the stream rules: public for everyone, unlisted for followers,
+    friends-only for mutual followers, deleted for nobody.
+    """
+    local_authors = Author.objects.filter(user__isnull=False)
+
+    if post.visibility == 'PUBLIC':
+        return local_authors.values_list('id', flat=True)
+    elif post.visibility == 'UNLISTED':
+        followers = Follow.objects.filter(following=post.author_id).values_list('user', flat=True)
+        return local_authors.filter(id__in=followers).values_list('id', flat=True)
+    elif post.visibility == 'FRIENDS':
+        return local_authors.filter(id__in=get_friend_ids(post.author)).values_list('id', flat=True)
+    return []
+
+
+def visible_posts_q(viewer, author_ids=None):
+    """Q object matching the posts viewer may see in their stream."""
+    following = Follow.objects.filter(user=viewer).values_list('following', flat=True)
+    q = (
+        Q(visibility='PUBLIC') |
+        Q(visibility='FRIENDS', author__in=get_friend_ids(viewer)) |
+        Q(visibility='UNLISTED', author__in=following)
+    )
+    if author_ids is not None:
+        q &= Q(author__in=author_ids)
+    return q
+
+
+@transaction.atomic
+def fanout_post(post):
+    """Replace every timeline row of post with rows for its current audience."""
+    TimelineEntry.objects.filter(post=post).delete()
+
+    entries = [
+        TimelineEntry(viewer_id=viewer_id, post=post, published=post.published)
+        for viewer_id in get_audience(post)
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=500)
+    logger.info(f"Timeline fan-out for post {post.id}: {len(entries)} entries")
+
+
+@transaction.atomic
+def refresh_viewer_for_author(viewer, author):
+    """
+    Recompute which of author's non-public posts are on viewer's timeline.
+    Called when the follow relationship between the two changes.
+    """
+    if viewer.user_id is None:
+        return
+
+    TimelineEntry.objects.filter(viewer=viewer, post__author=author).exclude(post__visibility='PUBLIC').delete()
+
+    posts = Post.objects.filter(visible_posts_q(viewer, [author.id])).exclude(visibility='PUBLIC')
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(viewer=viewer, post=post, published=post.published) for post in posts.only('id', 'published')],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(viewer, limit=TIMELINE_BACKFILL_LIMIT):
+    """Fill viewer's timeline with the newest posts visible to them."""
+    posts = Post.objects.filter(visible_posts_q(viewer)).order_by('-published').only('id', 'published')
+    if limit is not None:
+        posts = posts[:limit]
+
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(viewer=viewer, post=post, published=post.published) for post in posts],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+def rebuild_timelines(limit=TIMELINE_BACKFILL_LIMIT):
+    """Drop and rebuild the timelines of every local author."""
+    TimelineEntry.objects.all().delete()
+    viewers = Author.objects.filter(user__isnull=False)
+    for viewer in viewers:
+        backfill_timeline(viewer, limit=limit)
+    return viewers.count()
@@ -67,6 +67,7 @@ urlpatterns = [
     # Inbox API
     path('api/authors/<uuid:author_serial>/inbox/', views.send_inbox, name='send_inbox'), # POST comment, like, post or follow to AUTHOR_SERIAL inbox
     path('api/authors/<uuid:author_serial>/inbox', views.send_inbox, name='send_inbox'), # POST comment, like, post or follow to AUTHOR_SERIAL inbox
+    path('api/inbox/batch/', views.inbox_batch, name='inbox_batch'), # POST many activities for local authors at once
 
 
     # Posts API
@@ -1,6 +1,6 @@
 from django.contrib.contenttypes.models import ContentType
 from .models import InboxItem, Follow, Post, Comment, Author, Node
-from .serializers import SinglePostSerializer, SingleLikeSerializer, SingleCommentSerializer, SingleFollowRequestSerializer
+from .serializers import SingleLikeSerializer, SingleCommentSerializer, SingleFollowRequestSerializer, SinglePostSerializer, federation_context
 from rest_framework import authentication, exceptions
 from django.contrib.auth.models import AnonymousUser
 from django.utils import timezone
@@ -23,6 +23,9 @@ from rest_framework.request import Request
 import logging
 from django.contrib import messages
 from django.shortcuts import render, redirect, get_object_or_404
+from . import outbox
+from .delivery import node_for, plan_deliveries, remote_followers
+from .inbox_fanout import fan_out_post
 
 
 logger = logging.getLogger(__name__)
@@ -36,17 +39,17 @@ class Inbox:
 
     def add_to_inbox(self, recipient, sender, instance):
         instance.save()  # Ensure the instance is saved before adding to the inbox
-        InboxItem.objects.create(
+        InboxItem.objects.get_or_create(
             recipient=recipient,
-            sender=sender,
             content_type=ContentType.objects.get_for_model(instance),
-            object_id=instance.id
+            object_id=instance.id,
+            defaults={'sender': sender},
         )
 
     def add_post_to_followers_inbox(self, post):
-        followers = Follow.objects.filter(following=post.author)
-        for follower in followers:
-            self.add_to_inbox(follower.user, post.author, post)
+        if post._state.adding:
+            post.save()
+        fan_out_post(post)
 
     def add_like_to_inbox(self, like):
         self.add_to_inbox(like.content_object.author, like.author, like)
@@ -82,74 +85,21 @@ def get_object_by_fqid(fqid):
 
 
 def send_post_to_remote_followers(request, post, author):
-    nodes = Node.objects.filter(is_active=True)
-
     logger.info(f"called send_post_to_remote_followers")
 
-    followers = Follow.objects.filter(following=author)
-
-    for node in nodes:
-        for follower in followers:
-
-            logger.info(f"sending Post to node {node.host}")
-
-            logger.info(f"follower user host: {follower.user.host}")
-            logger.info(f"node host: {node.host}")
-            if str(follower.user.host) == str(node.host):
-
-                logger.info(f"Matching node found: {node.host}")
-                
-                auth = (node.username, node.password)
-
-                if str(follower.user.host) == str(node.host):
-                    try:
-                        node_host = node.host.rstrip('/')  # Remove trailing slash if present
-
-                        logger.info(f"sending Post to node 1{node_host}")
-                        drf_request = Request(request)
-                        logger.info(f"drf_request {drf_request}")
-                        serializer = SinglePostSerializer(post, context={'request': drf_request})
-                        logger.info(f"past post serializer")
-                        post_data = serializer.data.copy()
-
-                        logger.info(f"past post serializer 1")
-
-
-                        author_serial = follower.user.fqid.rstrip('/')
-                        author_serial = author_serial.split('/')[-1]
-
-                        logger.info(f"Sending post to: {f"{node_host}/authors/{author_serial}/inbox"} \nPost data: {post_data}")
+    plan = plan_deliveries(remote_followers(author))
 
+    if plan:
+        # One serialization per representation, embedded or slim, shared by every remote inbox using it
+        drf_request = Request(request)
+        for embed in {node.embed_collections for node in plan}:
+            nodes = [node for node in plan if node.embed_collections == embed]
+            activity = SinglePostSerializer(post, context=federation_context(drf_request, nodes[0])).data
 
-                        
-                        # Send POST request to the node's inbox
-                        #if node.team_name == "bisque":
+            # Delivered by the run_federation_worker command
+            outbox.enqueue_many({node: plan[node] for node in nodes}, 'post', activity)
 
-                            # Send POST request to the node's inbox
-                            #response = requests.post(
-                                #f"{node_host}/authors/{author_serial}/inbox",
-                                #json=post_data,
-                                ##auth=auth,
-                                #timeout=10,
-                                #verify=False
-                            #)
-                        #else:
-                        
-                        # Send POST request to the node's inbox
-                        response = requests.post(
-                            f"{node_host}/authors/{author_serial}/inbox",
-                            json=post_data,
-                            auth=auth,
-                            timeout=10,
-                            verify=False
-                        )
-
-
-                        messages.success(request, "Post sent!")
-
-                    except requests.exceptions.RequestException as e:
-                        logger.error(f"Error sending Post to {node.host}: {e}")
-                        messages.error(request, f"Error sending Post to {node.host}")
+        messages.success(request, "Post queued for delivery!")
 
     return redirect('stream')  # Redirect to the stream page after creating the post
 
@@ -160,43 +110,17 @@ def send_post_to_remote_followers(request, post, author):
 def send_like_to_remote_nodes(request, author, like):
     logger.info(f"sending Like to host {author.host}")
 
-    nodes = Node.objects.filter(is_active=True)
-
-    for node in nodes:
-        
-        if author.host == node.host:
-
-            auth = (node.username, node.password)
-
-            try:
-                node_host = node.host.rstrip('/')  # Remove trailing slash if present
+    node = node_for(author)
 
-                logger.info(f"sending Like to node {node_host}")
-                drf_request = Request(request)
-                serializer = SingleLikeSerializer(like, context={'request': drf_request})
-                like = serializer.data
-                
-                author_serial = author.fqid.rstrip('/')
-                author_serial = author_serial.split('/')[-1]
+    if node is not None:
 
-                logger.info(f"Sending like to: {f"{node_host}/authors/{author_serial}/inbox"} \nLike data: {like}")
-                
+        drf_request = Request(request)
+        serializer = SingleLikeSerializer(like, context={'request': drf_request})
 
-                
-                # Send POST request to the node's inbox
-                response = requests.post(
-                    f"{node_host}/authors/{author_serial}/inbox",
-                    json=like,
-                    auth=auth,
-                    timeout=10,
-                    verify=False
-                )
+        # Delivered by the run_federation_worker command
+        outbox.enqueue(node, author, 'like', serializer.data)
 
-                messages.success(request, "Like sent!")
-
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error sending Like to {node.host}: {e}")
-                messages.error(request, f"Error sending Like to {node.host}")
+        messages.success(request, "Like queued for delivery!")
                     
     return redirect('stream')  # Redirect to the stream page after creating the post
 
@@ -206,54 +130,17 @@ def send_like_to_remote_nodes(request, author, like):
 def send_comment_to_remote_nodes(request, post_author, comment):
     logger.info(f"sending Comment to host {post_author.host}")
 
-    nodes = Node.objects.filter(is_active=True)
-
-    for node in nodes:
-        
-        if post_author.host == node.host:
-
-            auth = (node.username, node.password)
-
-            try:
-                node_host = node.host.rstrip('/')  # Remove trailing slash if present
-
-                logger.info(f"sending Comment to node {node_host}")
-                drf_request = Request(request)
-                serializer = SingleCommentSerializer(comment, context={'request': drf_request})
-                comment = serializer.data
-
-                author_serial = post_author.fqid.rstrip('/')
-                author_serial = author_serial.split('/')[-1]
-
-                logger.info(f"Sending Comment to: {f"{node_host}/authors/{author_serial}/inbox"} \nComment data: {comment}")
-                
-                # Send POST request to the node's inbox
-                #if node.team_name == "bisque":
-
-                    # Send POST request to the node's inbox
-                    #response = requests.post(
-                        #f"{node_host}/authors/{author_serial}/inbox",
-                        #json=comment,
-                        #auth=auth,
-                        #timeout=10,
-                        #verify=False
-                    #)
-                #else:
-                
-                # Send POST request to the node's inbox
-                response = requests.post(
-                    f"{node_host}/authors/{author_serial}/inbox",
-                    json=comment,
-                    auth=auth,
-                    timeout=10,
-                    verify=False
-                )
-
-                messages.success(request, "Comment sent!")
-
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error sending Comment to {node.host}: {e}")
-                messages.error(request, f"Error sending Comment to {node.host}")
+    node = node_for(post_author)
+
+    if node is not None:
+
+        drf_request = Request(request)
+        serializer = SingleCommentSerializer(comment, context=federation_context(drf_request, node))
+
+        # Delivered by the run_federation_worker command
+        outbox.enqueue(node, post_author, 'comment', serializer.data)
+
+        messages.success(request, "Comment queued for delivery!")
                     
     return redirect('stream')  # Redirect to the stream page after creating the post
 
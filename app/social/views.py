@@ -12,22 +12,23 @@ from urllib.parse import unquote, urlparse
 from django.core.files.base import ContentFile
 from django.core.files.storage import FileSystemStorage
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import logout
 from django.http import JsonResponse
 from django.utils import timezone
 from django.conf import settings
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import Q, Prefetch
 from rest_framework import viewsets, generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, throttle_classes
 from rest_framework.views import APIView
 from rest_framework.generics import RetrieveAPIView
 from rest_framework.pagination import PageNumberPagination
-from .models import Author, Follow, FollowRequest, Post, Like, Comment, InboxItem, Node, SiteSetting
-from .serializers import AuthorSerializer, PostSerializer, SingleAuthorSerializer, SinglePostSerializer, SingleCommentSerializer, SingleLikeSerializer, MultiLikeSerializer, SingleFollowRequestSerializer, SinglePostDeSerializer, SingleCommentDeSerializer, MultiCommentSerializer, get_default_profile_image
+from .models import Author, Follow, FollowRequest, Post, Like, Comment, InboxItem, Node, SiteSetting, TimelineEntry
+from .serializers import AuthorSerializer, PostSerializer, SingleAuthorSerializer, SinglePostSerializer, SingleCommentSerializer, SingleLikeSerializer, MultiLikeSerializer, SingleFollowRequestSerializer, SinglePostDeSerializer, SingleCommentDeSerializer, MultiCommentSerializer, get_default_profile_image, sparse_fieldsets
 from .forms import AuthorForm, PostForm
 from django.contrib.contenttypes.models import ContentType
 from rest_framework.permissions import IsAuthenticated
@@ -36,12 +37,25 @@ from rest_framework.authentication import SessionAuthentication, BasicAuthentica
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from requests.adapters import HTTPAdapter
 
 #from urllib3.util.retry import Retry
 
+from . import inbox_queue, outbox, post_cache
+from .node_client import get_http_session
+from .pagination import paginate_by_cursor, is_fragment_request
+from .authentication import NodeBasicAuthentication
+from .author_search import filter_authors
+from .json_stream import FileString, StreamingJSONResponse, accepts_json
+from .inbox_processing import INBOX_BATCH_MAX_ITEMS, parse_inbox_batch, process_inbox_activity, process_inbox_batch
+from .media_files import file_response
+from .post_images import encoded_file, image_file
+from .queries import post_cards
+from .throttling import NodeBatchInboxThrottle, NodeInboxThrottle, RecipientInboxThrottle
 from .utils import Inbox, get_object_by_fqid, send_post_to_remote_followers, send_like_to_remote_nodes, send_comment_to_remote_nodes
-from django.http import HttpResponseForbidden, HttpResponse
+from django.http import HttpResponseForbidden, HttpResponse, Http404
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
 
 class SrcPagination(PageNumberPagination):
     page_size = 100 
@@ -79,7 +93,7 @@ class AuthorListView(generics.ListAPIView):
     #permission_classes = [IsAuthenticated]
     authentication_classes = []  # Empty list to override global settings
     permission_classes = [AllowAny]  # Explicitly allow anyone
-    queryset = Author.objects.all().filter(is_approved=True).exclude(user__username__icontains="API")
+    queryset = Author.objects.all().filter(is_approved=True, is_api_account=False)
     serializer_class = AuthorSerializer
     pagination_class = CustomPageNumberPagination 
 
@@ -142,6 +156,12 @@ class PostDetailView(APIView):
         - Public posts: accessible to anyone.
         - Friends-only posts: only accessible to authenticated friends.
         """
+        if post_cache.can_serve(request):
+            # Hot public posts are answered from the cache without a database query
+            entry = post_cache.cached_public(post_id=post_serial)
+            if entry is not None and entry['author_id'] == str(author_serial):
+                return post_cache.response(entry['body'])
+
         author = get_object_or_404(Author, id=author_serial)
         post = get_object_or_404(Post, author=author, id=post_serial)
         
@@ -158,9 +178,8 @@ class PostDetailView(APIView):
                 # Use the are_friends function to check if the requester is a friend of the author
                 if not are_friends(request.user.author, post.author):
                     return Response({"error": "You are not authorized to view this post"}, status=status.HTTP_403_FORBIDDEN)
-            
-        serializer = SinglePostSerializer(post)
-        return Response(serializer.data)
+
+        return post_response(post, request)
     
     def put(self, request, author_serial, post_serial):
         """
@@ -245,39 +264,33 @@ def approve_user(request, author_id):
 
 @login_required
 def stream(request):
-    posts = Post.objects.all()  # Fetch all posts ordered by published date
-
-    # Query to find mutual followers (friends) of the author
-    author = Author.objects.get(user=request.user)
-    authors_following = Follow.objects.filter(user=author).values_list('following', flat=True)
-    authors_followers = Follow.objects.filter(following=author).values_list('user', flat=True)
-    mutual_followers_list = list(set(authors_following).intersection(set(authors_followers)))
-    
     author = Author.objects.get(user=request.user)
-    # Query to get all posts that are public, and friends-only/unlisted for friends only
-    combined_posts = Post.objects.filter(
-        Q(visibility='PUBLIC') |
-        Q(visibility='FRIENDS', author__in=mutual_followers_list) |
-        Q(visibility='UNLISTED', author__in=authors_following)
-    )
-    # Sort by most recent post publiction
-    posts = combined_posts.order_by('-published')
 
+    # Posts are fanned out to timelines on write (see social.timeline), so the
+    # stream is a range scan over this author's entries, most recent first
+    cursor = request.GET.get('cursor')
+    entries = TimelineEntry.objects.filter(viewer=author).prefetch_related(Prefetch('post', queryset=post_cards()))
+    entries, next_cursor = paginate_by_cursor(entries, cursor, id_field='post_id')
+    posts = [entry.post for entry in entries]
 
-    return render(request, 'stream.html', {'posts': posts, 'author': author})
+    context = {'posts': posts, 'author': author, 'cursor': cursor, 'next_cursor': next_cursor}
+    if is_fragment_request(request):
+        return render(request, 'stream_page.html', context)
+    return render(request, 'stream.html', context)
 
 
 @login_required
 def my_posts(request):
     author = Author.objects.get(user=request.user)
     # Query to get all posts that belong to the logged-in user
-    posts = Post.objects.filter(author=request.user.author)
+    posts = post_cards(Post.objects.filter(author=request.user.author))
 
     # If needed, apply any filtering based on visibility (e.g., 'PUBLIC' posts only)
     posts = posts.filter(Q(visibility='PUBLIC') | Q(visibility='FRIENDS') | Q(visibility='UNLISTED'))
 
-    # Sort the posts by the most recent
-    posts = posts.order_by('-published')
+    # One page of the most recent posts
+    cursor = request.GET.get('cursor')
+    posts, next_cursor = paginate_by_cursor(posts, cursor)
 
     # Generate a UUID for each post and add it to the context
     posts_with_uuids = []
@@ -285,12 +298,12 @@ def my_posts(request):
         # You can add additional processing here if needed
         id = get_id(post)  # Custom function to get UUID
         posts_with_uuids.append((post, id))
-        post.like_count = Like.objects.filter(
-            content_type=ContentType.objects.get_for_model(post)
-        ).count()
 
     # Render the template with the posts and their UUIDs
-    return render(request, 'my_posts.html', {'posts': posts_with_uuids, 'author': author})
+    context = {'posts': posts_with_uuids, 'author': author, 'cursor': cursor, 'next_cursor': next_cursor}
+    if is_fragment_request(request):
+        return render(request, 'my_posts_page.html', context)
+    return render(request, 'my_posts.html', context)
 
 
 @login_required
@@ -352,90 +365,53 @@ def toggle_follow(request, author_id):
                 object=target_author
             )
 
-            InboxItem.objects.create(
+            InboxItem.objects.get_or_create(
                     recipient=follow_request.object,
-                    sender=follow_request.actor,
                     content_type=ContentType.objects.get_for_model(follow_request),
-                    object_id=follow_request.id
+                    object_id=follow_request.id,
+                    defaults={'sender': follow_request.actor},
                 )
             
             nodes = Node.objects.filter(is_active=True)
             for node in nodes:
-                auth = (node.username, node.password)
-
-                logger.info(f"Sending follow USERNAME: {node.username} PASSWORD: {node.password}")
                 logger.info(f"Sending follow request to {node.host}")
                 logger.info(f"object host {follow_request.object.host}")
                 logger.info(f"node host {node.host}")
 
                 if str(follow_request.object.host.rstrip('/') ) == str(node.host.rstrip('/') ):
-                    try:
-                        node_host = node.host.rstrip('/')  # Remove trailing slash if present
-
-                        logger.info(f"sending follow request to node {node_host}")
-
-                        # Properly handle None values
-                        follow_data = {
-                            "type": "follow",
-                            "summary": f"{current_author.display_name} wants to follow {target_author.display_name}",
-                            "actor": {
-                                "type": "author",
-                                "id": current_author.fqid,
-                                "host": current_author.host,
-                                "displayName": current_author.display_name,
-                                "page": current_author.profile_url,
-                                "github": current_author.github if current_author.github else "",  # Empty string, not "null"
-                                "profileImage": current_author.profile_image_url if current_author.profile_image_url else ""
-                            },
-                            "object": {
-                                "type": "author",
-                                "id": target_author.fqid,
-                                "host": target_author.host,
-                                "displayName": target_author.display_name,
-                                "page": target_author.profile_url,
-                                "github": target_author.github if target_author.github else "",   # Empty string, not "null"
-                                "profileImage": target_author.profile_image_url if target_author.profile_image_url else ""  # Empty string, not "null"
-                            }
-                        }
-
-                        author_serial = target_author.fqid.rstrip('/')
-                        author_serial = author_serial.split('/')[-1]
-
-
-                        logger.info(f"follow data sent to {node_host}/authors/{author_serial}/inbox\n\n{follow_data}")
-
-                        if node.team_name == "bisque":
 
-                            # Send POST request to the node's inbox
-                            response = requests.post(
-                                f"{node_host}/authors/{author_serial}/inbox",
-                                json=follow_data,
-                                auth=auth,
-                                timeout=10,
-                                verify=False
-                            )
-                        else:
-                        
-                            # Send POST request to the node's inbox
-                            response = requests.post(
-                                f"{node_host}/authors/{author_serial}/inbox",
-                                json=follow_data,
-                                auth=auth,
-                                timeout=10,
-                                verify=False
-                            )
-
-                        messages.success(request, "Follow request sent!")
+                    # Properly handle None values
+                    follow_data = {
+                        "type": "follow",
+                        "summary": f"{current_author.display_name} wants to follow {target_author.display_name}",
+                        "actor": {
+                            "type": "author",
+                            "id": current_author.fqid,
+                            "host": current_author.host,
+                            "displayName": current_author.display_name,
+                            "page": current_author.profile_url,
+                            "github": current_author.github if current_author.github else "",  # Empty string, not "null"
+                            "profileImage": current_author.profile_image_url if current_author.profile_image_url else ""
+                        },
+                        "object": {
+                            "type": "author",
+                            "id": target_author.fqid,
+                            "host": target_author.host,
+                            "displayName": target_author.display_name,
+                            "page": target_author.profile_url,
+                            "github": target_author.github if target_author.github else "",   # Empty string, not "null"
+                            "profileImage": target_author.profile_image_url if target_author.profile_image_url else ""  # Empty string, not "null"
+                        }
+                    }
 
-                        #if response.status_code == 200 or :
+                    # Delivered by the run_federation_worker command
+                    outbox.enqueue(node, target_author, 'follow', follow_data)
 
-                        # Assumes sent follow request to remote nodes are accepted
-                        Follow.objects.create(user=current_author, following=target_author)
-                        follow_request.delete()
+                    messages.success(request, "Follow request sent!")
 
-                    except requests.exceptions.RequestException as e:
-                        logger.error(f"Error sending follow request to {node.host}: {e}")
-                        messages.error(request, f"Error sending follow request to {node.host}")
+                    # Assumes sent follow request to remote nodes are accepted
+                    Follow.objects.create(user=current_author, following=target_author)
+                    follow_request.delete()
 
         return redirect('author_profile', id=author_id)
     return redirect('author_profile', id=author_id)
@@ -514,7 +490,7 @@ def create_post(request):
         # Update the post with the generated URL
         post.post_url = post_url
         post.post_api_url = post_api_url
-        post.save()
+        post.save(update_fields=['post_url', 'post_api_url'])
 
         # Add the post to the followers' inboxes
         Inbox(request.user).add_post_to_followers_inbox(post)
@@ -615,13 +591,14 @@ def view_profile(request):
     else:
         form = AuthorForm(instance=author)
 
-    posts = Post.objects.filter(author=request.user.author)
+    posts = post_cards(Post.objects.filter(author=request.user.author))
 
     # Posts
     posts = posts.filter(Q(visibility='PUBLIC') | Q(visibility='FRIENDS') | Q(visibility='UNLISTED'))
 
-    # Sort the posts by the most recent
-    posts = posts.order_by('-published')
+    # One page of the most recent posts
+    cursor = request.GET.get('cursor')
+    posts, next_cursor = paginate_by_cursor(posts, cursor)
 
     # Generate a UUID for each post and add it to the context
     posts_with_uuids = []
@@ -629,10 +606,9 @@ def view_profile(request):
         # You can add additional processing here if needed
         id = get_id(post)  # Custom function to get UUID
         posts_with_uuids.append((post, id))
-        post.like_count = Like.objects.filter(
-            object_id=id
-        ).count()
-    context = {'form': form, 'author': author, 'posts': posts_with_uuids}
+    context = {'form': form, 'author': author, 'posts': posts_with_uuids, 'cursor': cursor, 'next_cursor': next_cursor}
+    if is_fragment_request(request):
+        return render(request, 'profile/view_profile_page.html', context)
     return render(request, 'profile/view_profile.html', context)
 
 
@@ -728,24 +704,21 @@ def add_comment(request, post_id):
     
 #@login_required
 def single_post(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(post_cards(), id=post_id)
     
     # Handle both authenticated and anonymous users
     if request.user.is_authenticated:
         author = Author.objects.get(user=request.user)
     else:
         author = None  # Or a default/guest author
-        
-    post.like_count = Like.objects.filter(
-        content_type=ContentType.objects.get_for_model(post)
-    ).count()
     
     return render(request, 'single_post.html', {'post': post, 'author': author})
 
 @login_required
 def author_profile(request, id):
     author = get_object_or_404(Author, id=id)
-    posts = Post.objects.filter(author=author, visibility="PUBLIC").order_by("-published")
+    cursor = request.GET.get('cursor')
+    posts, next_cursor = paginate_by_cursor(post_cards(Post.objects.filter(author=author, visibility="PUBLIC")), cursor)
     
     # Check follow status if user is authenticated
     is_following = False
@@ -761,7 +734,11 @@ def author_profile(request, id):
         "is_following": is_following,
         "request_pending": request_pending,
         "is_current_user": request.user.is_authenticated and request.user.author == author,
+        "cursor": cursor,
+        "next_cursor": next_cursor,
     }
+    if is_fragment_request(request):
+        return render(request, "author_profile_page.html", context)
     return render(request, "author_profile.html", context)
 
 @login_required
@@ -961,9 +938,20 @@ def specific_follower_details(request, author_serial, foreign_author_fqid):
 
 
 
+def shed_inbox_request():
+    """503 for peers while the inbound queue is over INBOX_QUEUE_SHED_DEPTH."""
+    logger.warning(f"Inbound queue over {inbox_queue.INBOX_QUEUE_SHED_DEPTH}, shedding inbox request")
+    return Response(
+        {"error": "Inbox is busy, retry later"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(inbox_queue.INBOX_SHED_RETRY_AFTER)},
+    )
+
+
 @api_view(['POST'])
-@authentication_classes([BasicAuthentication, SessionAuthentication])
+@authentication_classes([NodeBasicAuthentication, SessionAuthentication])
 @permission_classes([IsAuthenticated])
+@throttle_classes([NodeInboxThrottle, RecipientInboxThrottle])
 #@permission_classes([AllowAny])
 def send_inbox(request, author_serial):
     """
@@ -980,129 +968,54 @@ def send_inbox(request, author_serial):
     if request.method == "POST":
         #decoded_fqid = unquote(author_fqid)
         author = get_object_or_404(Author, id=author_serial)
-        data = request.data.copy()
-
-        # "if the type is "comment" then add that comment to AUTHOR_SERIAL's inbox"
-        if data['type'] == 'comment':
-
-            logger.info(f"Comment data send_inbox: {data}")
-            serializer = SingleCommentSerializer(data=data, context={'request': request})
-
-            if serializer.is_valid():
-                comment = serializer.save()
-                
-                logger.info(f"Comment data send_inbox: Valid data")
-
-                # Add the comment to the author's inbox
-                InboxItem.objects.create(
-                    recipient = author,
-                    sender = comment.author,
-                    content_type = ContentType.objects.get_for_model(comment),
-                    object_id=comment.id
-                )
-
-                post = comment.post
-
-                #logger.info(f"Sending post to remote nodes")
-                #logger.info(f"post: {post}")
-                #logger.info(f"author: {author}")
-                #send_post_to_remote_followers(request, post, author)
-
-                return Response({"message": "Comment added to Inbox"}, status=status.HTTP_201_CREATED)
-            
-            else:
-                logger.error(f"Validation errors: {serializer.errors}")
-                return Response({"error": "Invalid Comment type"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # "if the type is "Like" then add that like to AUTHOR_SERIAL's inbox"
-        elif data['type'] == 'like':
-
-            # Extract the object being liked from the like data
-            object_fqid = data.get('object')
-            if not object_fqid:
-                return Response({"error": "Missing 'object' field in Like"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Find the target object (Post or Comment)
-            target_object, content_type = get_object_by_fqid(object_fqid)
-            if not target_object:
-                return Response({"error": f"Object with fqid '{object_fqid}' not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-            # Add object info to the data
-            data['object_id'] = target_object.id
-            data['content_type'] = content_type.model
-
-            serializer = SingleLikeSerializer(data=data)
-            if serializer.is_valid():
-                like = serializer.save()
-
-                # Add the like to the author's inbox
-                InboxItem.objects.create(
-                    recipient=author,
-                    sender=like.author,
-                    content_type=ContentType.objects.get_for_model(like),
-                    object_id=like.id
-                )
-
-                if like.content_type.model == 'post':
-                    post = like.content_object
-                else:
-                    post = like.content_object.post
-
+        # Tells peers they may send several activities at once to the batch endpoint
+        headers = {'X-Inbox-Batch': reverse('inbox_batch')}
+
+        if inbox_queue.INBOX_ASYNC_INGEST:
+            if inbox_queue.is_overloaded():
+                return shed_inbox_request()
+
+            # Only the envelope is checked here, run_inbox_worker does the rest
+            error = inbox_queue.check_envelope(request.data)
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+            if inbox_queue.is_repeat(author, request.data):
+                return Response({"message": "Already received"}, status=status.HTTP_200_OK, headers=headers)
+            inbox_queue.enqueue(author, request.data, request.user.username)
+            return Response({"message": "Activity queued"}, status=status.HTTP_202_ACCEPTED, headers=headers)
+
+        response_status, body = process_inbox_activity(author, request.data.copy(), request)
+        return Response(body, status=response_status, headers=headers)
+    else:
+        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
-                #logger.info(f"Sending post to remote nodes")
-                #logger.info(f"post: {post}")
-                #logger.info(f"author: {author}")
-                #send_post_to_remote_followers(request, post, author)
+@api_view(['POST'])
+@authentication_classes([NodeBasicAuthentication, SessionAuthentication])
+@permission_classes([IsAuthenticated])
+@throttle_classes([NodeBatchInboxThrottle])
+def inbox_batch(request):
+    """
+    POST [remote]: deliver many activities, for one or many local authors, in one request
+    Body is a JSON array (or NDJSON) of {"recipient": AUTHOR_FQID or inbox URL, "activity": {...}}
+    Response has one {"index", "status", ...} result per activity
 
-                return Response({"message": "Like added to Inbox"}, status=status.HTTP_201_CREATED)
-            
-            else:
-                logger.error(f"Validation errors: {serializer.errors}")
-                return Response({"error": "Invalid Like type"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # "if the type is "follow" then add that follow is added to AUTHOR_SERIAL's inbox to approve later"
-        elif data['type'] == 'follow':
-            serializer = SingleFollowRequestSerializer(data=data)
-            if serializer.is_valid():
-                follow_request = serializer.save()
-
-                # Add the follow request to the author's inbox
-                InboxItem.objects.create(
-                    recipient=follow_request.object,
-                    sender=follow_request.actor,
-                    content_type=ContentType.objects.get_for_model(follow_request),
-                    object_id=follow_request.id
-                )
-                return Response({"message": "Follow request added to Inbox"}, status=status.HTTP_201_CREATED)
-            
-            else:
-                logger.error(f"Validation errors: {serializer.errors}")
-                return Response({"error": "Invalid Follow type"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # "if the type is "post" then add that post to AUTHOR_SERIAL's inbox"
-        elif data['type'] == 'post':
-
-            logger.info(f"Post data send_inbox: {data}")
-            serializer = SinglePostSerializer(data=data, context={'request': request})
-            if serializer.is_valid():
-                post = serializer.save()
-
-                # Add the post to the author's inbox
-                InboxItem.objects.create(
-                    recipient=author,
-                    sender=post.author,
-                    content_type=ContentType.objects.get_for_model(post),
-                    object_id=post.id
-                )
-                return Response({"message": "Post added to Inbox"}, status=status.HTTP_201_CREATED)
-            
-            else:
-                logger.error(f"Post Validation errors: {serializer.errors}")
-                return Response({"error": "Invalid Post type"}, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            return Response({"error": "Invalid type"}, status=status.HTTP_400_BAD_REQUEST)
+    api/inbox/batch/
+    """
+    try:
+        envelopes = parse_inbox_batch(request)
+    except ValueError as e:
+        return Response({"error": f"Invalid batch: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(envelopes) > INBOX_BATCH_MAX_ITEMS:
+        return Response({"error": f"At most {INBOX_BATCH_MAX_ITEMS} activities per batch"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    if inbox_queue.INBOX_ASYNC_INGEST:
+        if inbox_queue.is_overloaded():
+            return shed_inbox_request()
+        results = inbox_queue.enqueue_batch(envelopes, request.user.username, RecipientInboxThrottle())
     else:
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        results = process_inbox_batch(envelopes, request, RecipientInboxThrottle())
+    return Response({"type": "inbox-batch", "results": results}, status=status.HTTP_200_OK)
 
 @login_required
 def accept_follow_request(request, request_id):
@@ -1158,12 +1071,17 @@ def post_fqid(request, post_fqid):
         # Ensure request is not None
         if request is None:
             return Response({"error": "Invalid request object"}, status=status.HTTP_400_BAD_REQUEST)
-        
+
+        if post_cache.can_serve(request):
+            # Hot public posts are answered from the cache without a database query
+            entry = post_cache.cached_public(fqid=decoded_fqid)
+            if entry is not None:
+                return post_cache.response(entry['body'])
+
         post = get_object_or_404(Post, fqid=decoded_fqid)
 
         if post.visibility == 'PUBLIC':
-            serializer = SinglePostSerializer(post, context={'request': request})
-            return Response(serializer.data)
+            return post_response(post, request)
             #return Response({"Public Post": "No available post."}, status=status.HTTP_404_NOT_FOUND)
         
         # Ensure verification for Friends only posts
@@ -1173,17 +1091,44 @@ def post_fqid(request, post_fqid):
             
             if not are_friends(request.user.author, post.author):
                 return Response({"error": "You are not authorized to view this post"}, status=status.HTTP_403_FORBIDDEN)
-            
-            serializer = SinglePostSerializer(post, context={'request': request})
-            return Response(serializer.data)
+
+            return post_response(post, request)
            
         else:
             return Response({"error": "No available post."}, status=status.HTTP_404_NOT_FOUND)
 
 
+def serialize_posts(posts, request, stream_images=False):
+    """
+    posts as a list of post objects, reusing cached representations when the request allows.
+    With stream_images, image bodies are FileStrings for StreamingJSONResponse to copy from disk.
+    """
+    context = {'request': request, 'stream_images': stream_images}
+    if post_cache.is_default_representation(request):
+        return [
+            SinglePostSerializer(post, context=context).data if image_file(post) else post_cache.data(post, request)
+            for post in posts
+        ]
+    return SinglePostSerializer(posts, many=True, context=context, **sparse_fieldsets(request)).data
+
+
+def post_response(post, request):
+    """
+    The response to a GET of post: streamed when it inlines an image from disk,
+    the cached JSON bytes when the default representation is asked for.
+    """
+    if accepts_json(request) and image_file(post) is not None:
+        serializer = SinglePostSerializer(post, context={'request': request, 'stream_images': True}, **sparse_fieldsets(request))
+        return StreamingJSONResponse(serializer.data)
+    if post_cache.can_serve(request):
+        return post_cache.response(post_cache.representation(post, request))
+    serializer = SinglePostSerializer(post, context={'request': request}, **sparse_fieldsets(request))
+    return Response(serializer.data)
+
+
 #TODO: IMPLEMENT POST IMAGES Be aware that Posts can be images that need base64 decoding. posts can also hyperlink to images that are public
 @api_view(['GET','POST'])
-@authentication_classes([SessionAuthentication, BasicAuthentication])
+@authentication_classes([SessionAuthentication, NodeBasicAuthentication])
 @permission_classes([IsAuthenticated])
 def recent_author_post(request, author_serial):
     """
@@ -1222,12 +1167,13 @@ def recent_author_post(request, author_serial):
         # Apply pagination
         paginator = CustomPageNumberPagination()
         paginated_posts = paginator.paginate_queryset(posts, request)
+        # Image bodies are copied from disk while the response is written, one at a time
+        stream = accepts_json(request)
         if paginated_posts is not None:
-            serializer = SinglePostSerializer(paginated_posts, many=True, context={'request': request})
-            return paginator.get_paginated_response(serializer.data)
+            response = paginator.get_paginated_response(serialize_posts(paginated_posts, request, stream))
         else:
-            serializer = SinglePostSerializer(posts, many=True, context={'request': request})
-            return Response(serializer.data)
+            response = Response(serialize_posts(posts, request, stream))
+        return StreamingJSONResponse(response.data) if stream else response
         
     # POST [local] create a new post but generate a new ID
     elif request.method == 'POST':
@@ -1295,112 +1241,18 @@ def search_authors(request):
             'label': f"{node.team_name or 'Unknown'} ({node.host.split('//')[1].split('/')[0]})"
         })
 
-    local_authors = []
-    remote_authors = []
+    # Remote authors are cached locally by refresh_remote_directory, so this never leaves the database
+    local_authors = Author.objects.select_related('user').filter(is_api_account=False, is_test_account=False)
 
-    local_authors = Author.objects.all().exclude(user__username__icontains="API").exclude(user__username__icontains="test-") 
-    
     # Search local authors
     if query:
-        local_authors = local_authors.filter(
-            Q(display_name__icontains=query) | 
-            Q(user__username__icontains=query)
-        ).exclude(id=request.user.author.id) # Exclude the current user
+        local_authors = filter_authors(local_authors, query)
 
     if selected_host:
         local_authors = local_authors.filter(host=selected_host)
-    
-    # Search remote nodes
-    #if query:
-    # Get all active nodes
-    nodes = Node.objects.filter(is_active=True)
 
-    for node in nodes:
-        node_host = node.host.rstrip('/')
-        try:
-            
-            if node.team_name == "dodger-blue":
-                node_url = node_host + f'/authors'
-            else:
-                node_url = node_host + f'/authors/'
-
-
-            logger.info("node_url = " + node_url)
-            auth = (node.username, node.password)
+    local_authors = local_authors.exclude(id=request.user.author.id) # Exclude the current user
 
-            if node.team_name == "dodger-blue" or node.team_name == "salmon":
-                response = requests.get(
-                node_url,
-                #auth=auth,
-                timeout=10,  # 10 second timeout
-                verify=False  # Only if certificate verification is causing issues
-                )
-            elif node.team_name == "bisque":
-                response = requests.get(
-                node_url + "?size=100",
-                #auth=auth,
-                timeout=10,  # 10 second timeout
-                verify=False  # Only if certificate verification is causing issues
-                )
-            else:
-                response = requests.get(
-                    node_url,
-                    auth=auth,
-                    timeout=10,  # 10 second timeout
-                    verify=False  # Only if certificate verification is causing issues
-                )
-            
-            if response.status_code == 200:
-                try:
-
-                    if response.content.strip():
-                        logger.error(f"\n\nresponse: {response}\n\n")
-                        
-                        data = response.json()
-                        logger.error(f"\n\nresponse data: {data}\n\n")
-                        # Process the response data - adjust according to the API format
-                        if 'authors' in data:
-                            for author_data in data['authors']:
-                                logger.error(f"\n\nauthor_data: {author_data}\n\n")
-                                # Create or update remote author in local database
-                                serializer = SingleAuthorSerializer(data=author_data)
-                                if serializer.is_valid():
-                                    remote_author = serializer.save()
-                                    remote_authors.append(remote_author)
-                                else:
-                                    logger.error(f"\n\ninvalid author: {serializer.errors}\n\n")
-                except ValueError as e:
-                    logger.error(f"Invalid JSON response: {e}")
-        except requests.exceptions.ConnectionError as e:
-            logger.error(f"Connection error: {e}")
-            # Gracefully handle the network error
-            # Consider adding a flag to indicate the remote API is unavailable
-        except requests.exceptions.Timeout:
-            logger.error("Request timed out")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request error: {e}")
-
-
-    # Combine local and remote results
-    current_author_id = request.user.author.id 
-
-    local_author_ids = {author.id for author in local_authors}
-    unique_remote_authors = [author for author in remote_authors if author.id not in local_author_ids]
-    all_authors = list(local_authors) + unique_remote_authors
-
-    # If there's a search query, apply it to the final combined list
-    if query:
-        all_authors = [author for author in {author.id: author for author in all_authors}.values() 
-                    if author.id != current_author_id and 
-                    (query.lower() in (author.display_name or '').lower() or
-                    query.lower() in (getattr(author, 'name', '') or '').lower() or
-                    query.lower() in (getattr(author.user, 'username', '') or '').lower() if hasattr(author, 'user') and author.user else False)]
-    else:
-        # Original line without query filtering
-        all_authors = [author for author in {author.id: author for author in all_authors}.values() 
-                    if author.id != current_author_id]
-    
-    
     context = {
         'authors': local_authors,
         'query': query,
@@ -1436,12 +1288,15 @@ def public_post_image_serial(request, author_serial, post_serial):
         file_path = file_path[len('/media/'):]
         
         
-    # Construct the full path to the file
-    full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+    # Construct the full path to the file, which must stay inside MEDIA_ROOT
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, file_path)
+    except SuspiciousFileOperation:
+        return Response({"error": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
         
         
     # Check if the file exists
-    if not os.path.exists(full_path):
+    if not os.path.isfile(full_path):
         return Response({"error": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
         
     # Determine the content type based on the file extension
@@ -1452,13 +1307,8 @@ def public_post_image_serial(request, author_serial, post_serial):
     else:
         content_type = 'application/octet-stream'  # Generic binary data
         
-    # Open the file and read its content
-    with open(full_path, 'rb') as image_file:
-        image_data = image_file.read()
-
-
-    # Return the image as a response
-    return HttpResponse(image_data, content_type=content_type)
+    # Stream the file, or have the front end send it, with conditional and Range support
+    return file_response(request, full_path, content_type)
     
     
 # NOTE: THis base 64 handeling is from GPT
@@ -1504,11 +1354,23 @@ def public_post_image_fqid(request, post_fqid):
             elif file_path.startswith('media/'):
                 file_path = file_path[len('media/'):]
                 
-            full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+            try:
+                full_path = safe_join(settings.MEDIA_ROOT, file_path)
+            except SuspiciousFileOperation:
+                return Response({"error": "Image file not found"}, status=status.HTTP_404_NOT_FOUND)
             
             if not os.path.exists(full_path):
                 return Response({"error": "Image file not found"}, status=status.HTTP_404_NOT_FOUND)
-                
+
+            # Copy the stored encoding into the response rather than reading and encoding the image
+            encoded = encoded_file(full_path)
+            if encoded is not None and accepts_json(request):
+                return StreamingJSONResponse({
+                    "base64_image": FileString(encoded),
+                    "content_type": content_type,
+                    "data_uri": FileString(encoded, prefix=f"data:{mime_type};base64,"),
+                })
+
             with open(full_path, 'rb') as image_file:
                 image_data = image_file.read()
         
@@ -1559,6 +1421,21 @@ def public_post_image_fqid(request, post_fqid):
                       status=status.HTTP_400_BAD_REQUEST)
     
 
+@require_safe
+def serve_media(request, path):
+    """
+    GET an uploaded file under MEDIA_ROOT, with conditional GET and byte ranges
+    so videos can be seeked. Routed at MEDIA_URL in socialNetwork/urls.py.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Media file not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Media file not found")
+    return file_response(request, full_path)
+
+
 
 # Done (simple testing only)
 @api_view(['GET'])
@@ -1572,7 +1449,7 @@ def comments_on_post(request, author_serial, post_serial):
     if request.method == "GET":
         author = get_object_or_404(Author, id=author_serial)
         post = get_object_or_404(Post, id=post_serial, author=author)
-        serializer = MultiCommentSerializer(post, context={'request': request})
+        serializer = MultiCommentSerializer(post, context={'request': request}, **sparse_fieldsets(request))
 
         if serializer.data:
             return Response(serializer.data)
@@ -1584,7 +1461,7 @@ def comments_on_post(request, author_serial, post_serial):
 
 # Done (simple testing only)
 @api_view(['GET'])
-@authentication_classes([SessionAuthentication, BasicAuthentication])
+@authentication_classes([SessionAuthentication, NodeBasicAuthentication])
 @permission_classes([IsAuthenticated])
 def comments_on_post_fqid(request, post_fqid):
     """
@@ -1619,7 +1496,7 @@ def get_comment(request, author_serial, post_serial, remote_comment_fqid):
         post = get_object_or_404(Post, id=post_serial, author=author)
         comment = get_object_or_404(Comment, fqid=remote_comment_fqid, post=post)
 
-        serializer = SingleCommentSerializer(comment, context={'request': request})
+        serializer = SingleCommentSerializer(comment, context={'request': request}, **sparse_fieldsets(request))
 
         if serializer.data:
             return Response(serializer.data)
@@ -1649,7 +1526,7 @@ def comment_author_post_serial(request, author_serial):
     if request.method == 'GET':  
         author = get_object_or_404(Author, id=author_serial)
 
-        serializer = MultiCommentSerializer(author, context={'request': request})
+        serializer = MultiCommentSerializer(author, context={'request': request}, **sparse_fieldsets(request))
 
         if serializer.data:
             return Response(serializer.data)
@@ -1697,7 +1574,7 @@ def comment_author_post_fqid(request, author_fqid):
         decoded_fqid = unquote(author_fqid)
         author = get_object_or_404(Author, fqid=decoded_fqid)
         comment = get_object_or_404(Comment, author=author)
-        serializer = SingleCommentSerializer(comment, context={'request': request})
+        serializer = SingleCommentSerializer(comment, context={'request': request}, **sparse_fieldsets(request))
 
         if serializer.data:
             return Response(serializer.data)
@@ -1719,7 +1596,7 @@ def specific_author_comments(request, author_serial, comment_serial):
     if request.method == 'GET':
         author = get_object_or_404(Author, id=author_serial)
         comment = get_object_or_404(Comment, id=comment_serial, author=author)
-        serializer = SingleCommentSerializer(comment, context={'request': request})
+        serializer = SingleCommentSerializer(comment, context={'request': request}, **sparse_fieldsets(request))
 
         if serializer.data:
             return Response(serializer.data)
@@ -1740,7 +1617,7 @@ def specific_author_comment(request, comment_fqid):
     if request.method == 'GET':
         decoded_fqid = unquote(comment_fqid)
         comment = get_object_or_404(Comment, fqid=decoded_fqid)
-        serializer = SingleCommentSerializer(comment, context={'request': request})
+        serializer = SingleCommentSerializer(comment, context={'request': request}, **sparse_fieldsets(request))
 
         if serializer.data:
             return Response(serializer.data)
@@ -1770,7 +1647,7 @@ def who_liked_this_post_serial(request, author_serial, post_serial):
     if request.method == 'GET':
         author = get_object_or_404(Author, id=author_serial)
         post = get_object_or_404(Post, id=post_serial, author=author)
-        serializer = SinglePostSerializer(post, context={'request': request})
+        serializer = MultiLikeSerializer(post, context={'request': request}, **sparse_fieldsets(request))
 
         if serializer.data:
             return Response(serializer.data)
@@ -1795,7 +1672,7 @@ def who_liked_this_post_fqid(request, post_fqid):
 
         post = get_object_or_404(Post, fqid=decoded_fqid)
 
-        serializer = MultiLikeSerializer(post, context={'request': request})
+        serializer = MultiLikeSerializer(post, context={'request': request}, **sparse_fieldsets(request))
 
         if serializer.data:
             return Response(serializer.data)
@@ -1821,7 +1698,7 @@ def who_liked_this_comment(request, author_serial, post_serial, comment_fqid):
 
         comment = get_object_or_404(Comment, fqid=decoded_fqid)
 
-        serializer = MultiLikeSerializer(comment, context={'request': request})
+        serializer = MultiLikeSerializer(comment, context={'request': request}, **sparse_fieldsets(request))
 
         if serializer.data:
             return Response(serializer.data)
@@ -1959,8 +1836,8 @@ def proxy_image(request, url):
     from urllib.parse import unquote
     url = unquote(url)
     
-    # Get the image from the remote server
-    response = requests.get(url)
+    # Get the image from the remote server over a pooled connection
+    response = get_http_session().get(url, timeout=10)
     
     # Return the image data with appropriate content type
     return HttpResponse(
@@ -128,6 +128,23 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Inbox rate-limit buckets and the queue depth live here. The default local-memory cache
+# is per process, so with several gunicorn workers each keeps its own buckets and the
+# limits are per worker. Point CACHE_BACKEND at a shared cache in production, e.g.
+# django.core.cache.backends.db.DatabaseCache with CACHE_LOCATION=cache_table (after
+# manage.py createcachetable) or django.core.cache.backends.redis.RedisCache.
+# The post cache (social/post_cache.py) is only used with such a shared backend.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -181,6 +198,9 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT =  os.path.join(BASE_DIR, 'media')
 
+# 'x-accel-redirect' lets the Caddy front end send media files, see the Caddyfile
+MEDIA_SENDFILE = os.environ.get("MEDIA_SENDFILE", "")
+
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static')
 ]
@@ -224,9 +244,14 @@ LOGGING = {
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'social.authentication.NodeBasicAuthentication',  # Basic auth without a password hash per request
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Token buckets for the inbox endpoints, see social/throttling.py
+    'DEFAULT_THROTTLE_RATES': {
+        'inbox_node': os.environ.get("INBOX_NODE_RATE", "600/min"),
+        'inbox_recipient': os.environ.get("INBOX_RECIPIENT_RATE", "120/min"),
+    },
 }
\ No newline at end of file